@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Benchmark of the stages of the optimisation and analysis of the teams.
+
+The pipeline of 'main.py' is run stage by stage on the data of the
+workshop for several horizons (number of time steps) and numbers of teams.
+For every team the wall time and the peak memory (resident set size) after
+each stage are recorded:
+
+    read_time_series     time series (binary cache, see
+                         'time_series_store')
+    read_parameters      design and general parameters of the team
+    build_energy_system  oemof objects (create_energy_system)
+    build_model          Pyomo model (solph.Model)
+    solve                solver, see 'solver_backend'
+    process_results      solph.processing.results and meta_results
+    store                results file of the team (results_format)
+    restore              read the results file again
+    convert_keys         string keyed results (oemof format only)
+    analysis             annual sums and KPIs of the team
+
+Every case runs in a fresh process, so the peak memory of a case is not
+raised by the cases before it. The results files are written to a
+temporary folder, the results of the workshop are not touched. The
+measurements are written as JSON to 'results/benchmarks'.
+
+Run from the folder 'src':
+
+    python benchmark.py [--horizons 168 2190 8760] [--teams 1 8]
+
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import oemof.solph as solph
+import pandas as pd
+import pyomo
+import yaml
+
+import kpi
+from model_energy_system import create_energy_system, load_parameters
+import result_extraction
+import results_store
+import solver_backend
+import time_series_store
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+benchmark_path = abs_path + '/results/benchmarks'
+
+stages = ['read_time_series', 'read_parameters', 'build_energy_system',
+          'build_model', 'solve', 'process_results', 'store', 'restore',
+          'convert_keys', 'analysis']
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024
+
+
+@contextlib.contextmanager
+def _stage(name, measurements):
+    start = time.perf_counter()
+    yield
+    measurements[name] = {'time': time.perf_counter() - start,
+                          'peak_rss_mb': peak_rss_mb()}
+
+
+def _benchmark_team(cfg, team_number, number_of_time_steps):
+    measurements = {}
+    results_format = cfg.get('results_format', 'oemof')
+
+    with _stage('read_time_series', measurements):
+        data = time_series_store.read_time_series(
+            abs_path + '/data/' + cfg['time_series_file_name'])
+
+    with _stage('read_parameters', measurements):
+        param_value = load_parameters(cfg, team_number)
+
+    with _stage('build_energy_system', measurements):
+        energysystem = create_energy_system(param_value, data,
+                                            number_of_time_steps)
+
+    with _stage('build_model', measurements):
+        model = solph.Model(energysystem)
+
+    with _stage('solve', measurements):
+        solver_backend.solve(model, cfg['solver'],
+                             cfg.get('solver_backend', 'shell'))
+
+    with _stage('process_results', measurements):
+        # Like 'model_energy_system.store_results'
+        if results_format == 'columnar':
+            results = result_extraction.extract_results(model)
+        else:
+            results = solph.processing.results(model)
+        meta = solph.processing.meta_results(model)
+
+    with _stage('store', measurements):
+        results_store.store_results(energysystem, results, meta, team_number,
+                                    results_format)
+    del model, energysystem, results
+
+    with _stage('restore', measurements):
+        if results_format == 'columnar':
+            string_results = results_store.ColumnarResults(
+                results_store.results_file_path(team_number, 'columnar'))
+        else:
+            restored = solph.EnergySystem()
+            restored.restore(
+                dpath=results_store.dump_path,
+                filename=results_store.results_file_name(team_number))
+
+    with _stage('convert_keys', measurements):
+        if results_format != 'columnar':
+            string_results = solph.views.convert_keys_to_strings(
+                restored.results['main'])
+
+    with _stage('analysis', measurements):
+        kpi.compute_kpis(design=kpi.design_matrix([param_value]),
+                         sums=kpi.annual_sums(string_results)[np.newaxis],
+                         param_value=param_value)
+
+    return measurements
+
+
+def run_case(config_path, number_of_time_steps, number_of_teams,
+             results_format, dump_path):
+    """Benchmark one case, return its measurements.
+
+    Meant to run in a process of its own, see 'run_benchmark'.
+    """
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+    if results_format is not None:
+        cfg['results_format'] = results_format
+    if number_of_teams > len(cfg['design_parameters_file_name']):
+        raise ValueError('The configuration has design parameters for {0} '
+                         'teams, not {1}.'.format(
+                             len(cfg['design_parameters_file_name']),
+                             number_of_teams))
+
+    # The results files of the benchmark must not replace the ones of the
+    # workshop
+    results_store.dump_path = dump_path
+
+    start = time.perf_counter()
+    teams = []
+    for team_number in range(number_of_teams):
+        teams.append({'team': team_number + 1,
+                      'stages': _benchmark_team(cfg, team_number,
+                                                number_of_time_steps)})
+
+    return {
+        'number_of_time_steps': number_of_time_steps,
+        'number_of_teams': number_of_teams,
+        'results_format': cfg.get('results_format', 'oemof'),
+        'solver': cfg['solver'],
+        'solver_backend': cfg.get('solver_backend', 'shell'),
+        'wall_time': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {name: sum(team['stages'][name]['time'] for team in teams)
+                   for name in stages},
+        'teams': teams}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=abs_path, capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(config_path, horizons, team_counts, results_format=None,
+                  output_file_path=None):
+    """Run all cases and write the measurements to a JSON file.
+
+    Returns the measurements and the path of the JSON file.
+    """
+    created = datetime.datetime.now()
+    benchmark = {
+        'created': created.isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'packages': {'oemof.solph': solph.__version__,
+                         'pyomo': pyomo.version.version,
+                         'pandas': pd.__version__,
+                         'numpy': np.__version__}},
+        'cases': []}
+
+    # A new process for every case, the peak memory is per process
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as dump_path:
+        for number_of_time_steps in horizons:
+            for number_of_teams in team_counts:
+                print('Benchmark: {0} time steps, {1} teams'.format(
+                    number_of_time_steps, number_of_teams))
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=1, mp_context=context) as executor:
+                    case = executor.submit(
+                        run_case, config_path, number_of_time_steps,
+                        number_of_teams, results_format, dump_path).result()
+                benchmark['cases'].append(case)
+
+    if output_file_path is None:
+        os.makedirs(benchmark_path, exist_ok=True)
+        output_file_path = os.path.join(
+            benchmark_path,
+            'benchmark_{0}.json'.format(created.strftime('%Y%m%d_%H%M%S')))
+    with open(output_file_path, 'w') as f:
+        json.dump(benchmark, f, indent=2)
+
+    return benchmark, output_file_path
+
+
+def summary(benchmark):
+    """Return the stage times of all cases as a DataFrame."""
+    rows = []
+    for case in benchmark['cases']:
+        row = {'time steps': case['number_of_time_steps'],
+               'teams': case['number_of_teams']}
+        row.update(case['stages'])
+        row['wall time'] = case['wall_time']
+        row['peak RSS [MB]'] = case['peak_rss_mb']
+        rows.append(row)
+    return pd.DataFrame(rows).set_index(['time steps', 'teams'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the stages of the optimisation and analysis.')
+    parser.add_argument('--config', default='../experiment_config/config.yml',
+                        help='configuration file (default: %(default)s)')
+    parser.add_argument('--horizons', type=int, nargs='+',
+                        default=[168, 2190, 8760],
+                        help='numbers of time steps (default: %(default)s)')
+    parser.add_argument('--teams', type=int, nargs='+', default=[1, 8],
+                        help='numbers of teams (default: %(default)s)')
+    parser.add_argument('--results-format', choices=['oemof', 'columnar'],
+                        help='results format (default: from the config)')
+    parser.add_argument('--output', help='JSON file of the measurements '
+                        '(default: results/benchmarks/benchmark_<date>.json)')
+    args = parser.parse_args()
+
+    benchmark, output_file_path = run_benchmark(
+        config_path=os.path.abspath(args.config), horizons=args.horizons,
+        team_counts=args.teams, results_format=args.results_format,
+        output_file_path=args.output)
+
+    with pd.option_context('display.width', 200,
+                           'display.max_columns', None,
+                           'display.precision', 2):
+        print(summary(benchmark))
+    print('Measurements written to {0}'.format(output_file_path))
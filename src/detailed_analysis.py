@@ -1,38 +1,121 @@
 ###############################################################################
 # imports
 ###############################################################################
-import oemof.solph as solph
-import oemof.tools.economics as eco
-
+import instrumentation
+import kpi
+import logging
+import numpy as np
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import yaml
+import results_store
+import run_context
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+results_table_path = abs_path + '/results/optimisation_results/tables/results.csv'
+
+
+class ResultsTable:
+    """results.csv, written row by row while the teams are analysed.
+
+    The KPI rows are kept as a list of records. Each row is appended to
+    results.csv as soon as its team is analysed, so the table is readable
+    while other teams are still solved. 'finish' writes the table sorted
+    by team.
+    """
+
+    def __init__(self, file_path=results_table_path):
+        self.file_path = file_path
+        self.records = []
+        self.team_numbers = []
+        self.columns = None
+
+    def __contains__(self, team_number):
+        return team_number in self.team_numbers
+
+    def append(self, row):
+        """Add the KPI row of a team, see 'analyse_energy_system'."""
+        team_number = row.index[0]
+        if team_number in self.team_numbers:
+            # A team that was analysed again replaces its row
+            i = self.team_numbers.index(team_number)
+            del self.team_numbers[i], self.records[i]
+            self.columns = None
+        self.team_numbers.append(team_number)
+        self.records.append(row.iloc[0].to_dict())
+
+        if self.columns is not None and set(row.columns) <= set(self.columns):
+            row.reindex(columns=self.columns).to_csv(
+                self.file_path, mode='a', header=False)
+        else:
+            self._write(self.dataframe(sort=False))
+
+    def dataframe(self, sort=True):
+        """Return the table, by default sorted by team."""
+        df = pd.DataFrame.from_records(self.records, index=self.team_numbers)
+        if sort:
+            df = df.sort_index()
+        return df
+
+    def finish(self):
+        """Write the complete table sorted by team and return it."""
+        df = self.dataframe()
+        self._write(df)
+        return df
+
+    def _write(self, df):
+        df.to_csv(self.file_path)
+        self.columns = list(df.columns)
+
+
+def analyse_team(config_path, team_number, results_table, plot_results=False):
+    """Add the KPI row of a team to results_table, e.g. right after its solve.
+
+    If plot_results is True, a preview of the plot is drawn again with the
+    teams analysed so far.
+    """
+    logging.info('Analyse the results of team {0}'.format(team_number+1))
+    results_table.append(analyse_energy_system(config_path=config_path,
+                                               team_number=team_number))
+    if plot_results:
+        plot_team_results(
+            config_path=config_path,
+            df_basic_results_and_team_decision=results_table.dataframe(),
+            preview=True)
 
 
-def my_detailed_analysis(config_file_path, plot_results=True):
+def my_detailed_analysis(config_file_path, plot_results=True,
+                         team_numbers=None, results_table=None):
+    """Analyse the teams, write results.csv and the plot.
 
-    with open(config_file_path, 'r') as ymlfile:
-        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+    Teams that are already in results_table (streamed while solving, see
+    'analyse_team') are not analysed again.
+    """
+    cfg = run_context.get(config_file_path).cfg
 
-    for n in range(cfg['number_of_teams']):
-        if n == 0:
-            teamdata = analyse_energy_system(
-                config_path=config_file_path, team_number=n)
-        else:
-            teamdata_aux = analyse_energy_system(
-                config_path=config_file_path, team_number=n)
-            teamdata = pd.concat(
-                [teamdata, teamdata_aux])
+    # By default all teams are analysed
+    if team_numbers is None:
+        team_numbers = range(cfg['number_of_teams'])
+    if results_table is None:
+        results_table = ResultsTable()
+
+    for n in team_numbers:
+        if n not in results_table:
+            results_table.append(analyse_energy_system(
+                config_path=config_file_path, team_number=n))
+
+    print('S i m u l a t i o n  f i n i s h e d !')
 
-        if n == cfg['number_of_teams']-1:
-            print('S i m u l a t i o n  f i n i s h e d !')
+    if not results_table.records:
+        return
 
-    teamdata.to_csv('../results/optimisation_results/tables/results.csv')
+    teamdata = results_table.finish()
 
     if plot_results:
             plot_team_results(config_path=config_file_path,
                               df_basic_results_and_team_decision=teamdata)
+    if plot_results and cfg.get('plot_dispatch', False):
+        plot_team_dispatch(config_file_path,
+                           sorted(results_table.team_numbers))
 
     return
 
@@ -41,21 +124,14 @@ def analyse_energy_system(config_path, team_number):
     ########################################
     #         Mange Paths and Files        #
     ########################################
-    with open(config_path, 'r') as ymlfile:
-        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
-
-    abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
-
-    file_name_param_01 = cfg['design_parameters_file_name'][team_number]
-    file_name_param_02 = cfg['parameters_file_name']
-    file_path_param_01 = (abs_path + '/data/'
-                          + file_name_param_01)
-    file_path_param_02 = (abs_path + '/data/'
-                          + file_name_param_02)
-    param_df_01 = pd.read_csv(file_path_param_01, index_col=1)
-    param_df_02 = pd.read_csv(file_path_param_02, index_col=1)
-    param_df = pd.concat([param_df_01, param_df_02], sort=True)
-    param_value = param_df['value']
+    context = run_context.get(config_path)
+    cfg = context.cfg
+
+    # Timers of the analysis, see 'instrumentation'
+    instrumentation.start_team()
+
+    with instrumentation.timer('analysis: read parameters'):
+        param_value = context.parameters(team_number)
 
     ########################################
     #       Compute Number of Components   #
@@ -68,200 +144,32 @@ def analyse_energy_system(config_path, team_number):
     number_of_daydemand_capacity_th = param_value['capacity_thermal_storage']
     area_pv = param_value['area_PV']
     area_solar_th = param_value['area_solar_th']
-    number_of_pv_pp = param_value['number_of_PV_pp']
 
     ########################################
     #      Extract Data From Solution      #
     ########################################
-    energysystem = solph.EnergySystem()
-    abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
-    energysystem.restore(
-        dpath=abs_path + "/results/optimisation_results/dumps",
-        filename="model_team_{0}.oemof".format(team_number+1))
-
-    string_results = solph.views.convert_keys_to_strings(
-        energysystem.results['main'])
-    shortage_electricity = string_results[
-        'shortage_bel', 'electricity']['sequences']
-    shortage_heat = string_results[
-        'shortage_bth', 'heat']['sequences']
-    excess_electricity = string_results[
-        'electricity', 'excess_bel']['sequences']
-    excess_heat = string_results[
-        'heat', 'excess_bth']['sequences']
-    gas_consumption = string_results[
-        'rgas', 'natural_gas']['sequences']
-    heat_demand = string_results[
-        'heat', 'demand_th']['sequences']
-    el_demand = string_results[
-        'electricity', 'demand_el']['sequences']
-    if number_of_windturbines > 0:
-        el_from_wind = string_results[
-        'wind_turbine', 'electricity']['sequences']
-    if area_pv > 0:
-        el_from_pv = string_results[
-            'PV', 'electricity']['sequences']
-    if number_of_pv_pp > 0:
-        el_from_pv_pp = string_results[
-            'PV_pp', 'electricity']['sequences']
-    if area_solar_th > 0:
-        heat_from_solar = string_results[
-        'solar_thermal', 'heat']['sequences']
-    if number_of_chps > 0:
-        el_from_chp = string_results[
-            'chp', 'electricity']['sequences']
-        heat_from_chp = string_results[
-        'chp', 'heat']['sequences']
-        fuel_to_chp = string_results[
-            'natural_gas', 'chp']['sequences']
-    if number_of_boilers > 0:
-        heat_from_boiler = string_results[
-        'boiler', 'heat']['sequences']
-        fuel_to_boiler = string_results[
-            'natural_gas', 'boiler']['sequences']
-    if number_of_heat_pumps > 0:
-        heat_from_hp = string_results[
-            'heat_pump', 'heat']['sequences']
-        el_to_hp = string_results[
-            'electricity', 'heat_pump']['sequences']
-        
-    ########################################
-    #         Compute KPI Cost             #
-    ########################################
-    capex_chp = (number_of_chps * param_value['invest_cost_chp'])
-    capex_boiler = (number_of_boilers * param_value['invest_cost_boiler'])
-    capex_wind = (number_of_windturbines * param_value['invest_cost_wind'])
-    capex_hp = (number_of_heat_pumps * param_value['invest_cost_heatpump'])
-    capex_storage_el = (number_of_daydemand_capacity_el
-                        * param_value['invest_cost_storage_el'])
-    capex_storage_th = (number_of_daydemand_capacity_th
-                        * param_value['invest_cost_storage_th'])
-    capex_pv = area_pv * param_value['invest_cost_pv']
-    capex_solarthermal = (area_solar_th
-                          * param_value['invest_cost_solarthermal'])
-    capex_PV_pp = (number_of_pv_pp
-                   * param_value['invest_cost_PV_pp']
-                   * param_value['PV_pp_surface_area'])
-
-    annuity_chp = eco.annuity(
-        capex_chp,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_boiler = eco.annuity(
-        capex_boiler,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_wind = eco.annuity(
-        capex_wind,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_hp = eco.annuity(
-        capex_hp,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_storage_el = eco.annuity(
-        capex_storage_el,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_storage_th = eco.annuity(
-        capex_storage_th,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_pv = eco.annuity(
-        capex_pv,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_solar_th = eco.annuity(
-        capex_solarthermal,
-        param_value['lifetime'],
-        param_value['wacc'])
-    annuity_PV_pp = eco.annuity(
-        capex_PV_pp,
-        param_value['lifetime'],
-        param_value['wacc'])
-
-    total_annuity = (annuity_chp + annuity_boiler + annuity_wind
-                     + annuity_hp + annuity_storage_el
-                     + annuity_storage_th + annuity_pv
-                     + annuity_solar_th + annuity_PV_pp
-                     )
-
-    var_costs_gas = gas_consumption.flow.sum()*param_value['var_costs_gas']
-    var_costs_el_import = (shortage_electricity.flow.sum()
-                           * param_value['var_costs_shortage_bel'])
-    var_costs_heat_import = (shortage_heat.flow.sum()
-                             * param_value['var_costs_shortage_bth'])
-    var_costs_es = var_costs_gas + var_costs_el_import + var_costs_heat_import
-
-    ########################################
-    #         Compute Sum of Energy        #
-    ########################################
-    if number_of_chps > 0:
-        el_from_chp_sum = el_from_chp.flow.sum()
-        heat_from_chp_sum = heat_from_chp.flow.sum()
-        fuelconsump_chp = fuel_to_chp.flow.sum()
-    else:
-        el_from_chp_sum = 0
-        heat_from_chp_sum = 0
-        fuelconsump_chp = 0
-
-    if number_of_boilers > 0:
-        heat_from_boiler_sum = heat_from_boiler.flow.sum()
-        fuelconsump_boiler = fuel_to_boiler.flow.sum()
-    else:
-        heat_from_boiler_sum = 0
-        fuelconsump_boiler = 0
-
-    if (area_pv > 0) & (number_of_pv_pp > 0):
-        el_from_PV_sum = (el_from_pv.flow.sum() + el_from_pv_pp.flow.sum())
-    elif area_pv > 0:
-        el_from_PV_sum = el_from_pv.flow.sum()
-    elif number_of_pv_pp > 0:
-        el_from_PV_sum = el_from_pv_pp.flow.sum()
-    else:
-        el_from_PV_sum = 0
-
-    if area_solar_th > 0:
-        heat_from_solar_sum = heat_from_solar.flow.sum()
-    else:
-        heat_from_solar_sum = 0
-
-    if number_of_windturbines > 0:
-        el_from_wind_sum = el_from_wind.flow.sum()
-    else:
-        el_from_wind_sum = 0
-
-    if number_of_heat_pumps > 0:
-        heat_from_hp_sum = heat_from_hp.flow.sum()
-        el_consumption_hp = el_to_hp.flow.sum()
-    else:
-        heat_from_hp_sum = 0
-        el_consumption_hp = 0
-
-    el_consumption_incl_heatpump = el_demand.flow.sum() + el_consumption_hp
-    el_from_grid = shortage_electricity.flow.sum()
-    heat_from_grid = shortage_heat.flow.sum()
-    heat_demand_sum = heat_demand.flow.sum()
+    with instrumentation.timer('analysis: restore results'):
+        string_results = results_store.load_string_results(cfg, team_number)
 
+    # Annual sums of the flows, see 'kpi.flows'
+    with instrumentation.timer('analysis: annual sums'):
+        sums = kpi.annual_sums(string_results)
 
     ########################################
-    #       Compute KPI Sufficiency        #
+    #     Compute KPI Cost, Emission and   #
+    #            Sufficiency               #
     ########################################
-    coverage_el = ((el_demand.flow.sum() - shortage_electricity.flow.sum())
-                       /el_demand.flow.sum())
-    coverage_heat = ((heat_demand.flow.sum() - shortage_heat.flow.sum())
-                      / heat_demand.flow.sum())
-    selfsufficiency = (coverage_el + coverage_heat)/2
+    with instrumentation.timer('analysis: kpis'):
+        kpis = kpi.compute_kpis(design=kpi.design_matrix([param_value]),
+                                sums=sums[np.newaxis],
+                                param_value=param_value)
+    kpis = {name: values[0] for name, values in kpis.items()}
 
-    ########################################
-    #         Compute Emission Details     #
-    ########################################
-    emissions_el_import = el_from_grid*param_value['emission_el']
-    emissions_heat_import = heat_from_grid*param_value['emission_heat']
-    emissions_chp = fuelconsump_chp*param_value['emission_gas']  
-    emissions_boiler = fuelconsump_boiler*param_value['emission_gas']
-    
-    em_co2 = emissions_el_import + emissions_heat_import + emissions_chp + emissions_boiler
+    # The self-sufficiency of the results table does not include the
+    # electrical consumption of the heat pumps
+    coverage_el = kpis['coverage_el_without_heat_pump']
+    coverage_heat = kpis['coverage_heat']
+    selfsufficiency = kpis['selfsufficiency_without_heat_pump']
 
     ########################################
     #         Setup Return Data            #
@@ -269,8 +177,8 @@ def analyse_energy_system(config_path, team_number):
     markersize = max([float(selfsufficiency), .03])
     basic_results_and_team_decision = {
                  'team name': cfg['team_names'][team_number],
-                 'costs': [(var_costs_es+total_annuity)/1e6],
-                 'emissions': [em_co2/1e3],
+                 'costs': [kpis['total_costs']/1e6],
+                 'emissions': [kpis['emissions']/1e3],
                  'selfsufficiency': markersize*100, #Autarkie in Prozent gestellt mit *100
                  'chps': number_of_chps,
                  'boilers': number_of_boilers,
@@ -280,22 +188,28 @@ def analyse_energy_system(config_path, team_number):
                  'TES': number_of_daydemand_capacity_th,
                  'PV': area_pv,
                  'solarthermal': area_solar_th,
-                 'selfsufficiency electric': coverage_el,                 
-                 'selfsufficiency heat': coverage_heat,                 
-                 'emissions production': [(emissions_chp + emissions_boiler)/1e3],                 
-                 'emissions purchase': [(emissions_el_import + emissions_heat_import)/1e3], 
-                 'cost invest': [total_annuity/1e6], 
-                 'cost operation': [var_costs_es/1e6],
-                 'total el demand': el_consumption_incl_heatpump,
-                 'total el production': el_from_chp_sum + el_from_PV_sum + el_from_wind_sum,
-                 'total el purchase': el_from_grid,
-                 'total el excess': excess_electricity.flow.sum(),
-                 'total heat demand': heat_demand_sum,
-                 'total heat production': heat_from_chp_sum + heat_from_boiler_sum + heat_from_solar_sum + heat_from_hp_sum,
-                 'total heat purchase': heat_from_grid,
-                 'total heat excess': excess_heat.flow.sum()
+                 'selfsufficiency electric': coverage_el,
+                 'selfsufficiency heat': coverage_heat,
+                 'emissions production': [kpis['emissions_production']/1e3],
+                 'emissions purchase': [kpis['emissions_purchase']/1e3],
+                 'cost invest': [kpis['annuity']/1e6],
+                 'cost operation': [kpis['var_costs']/1e6],
+                 'total el demand': kpis['el_consumption'],
+                 'total el production': kpis['el_production'],
+                 'total el purchase': kpis['el_purchase'],
+                 'total el excess': kpis['el_excess'],
+                 'total heat demand': kpis['heat_demand'],
+                 'total heat production': kpis['heat_production'],
+                 'total heat purchase': kpis['heat_purchase'],
+                 'total heat excess': kpis['heat_excess']
                  }
 
+    # Stage times, LP size and solver iterations of the optimisation and
+    # the stage times of the analysis
+    basic_results_and_team_decision.update(
+        instrumentation.read_stats(team_number))
+    basic_results_and_team_decision.update(instrumentation.stats())
+
     ########################################
     #              Return Data             #
     ########################################
@@ -308,67 +222,27 @@ def analyse_energy_system(config_path, team_number):
     return df_basic_results_and_team_decision
 
 
-def plot_team_results(config_path, df_basic_results_and_team_decision):
-
-    with open(config_path, 'r') as ymlfile:
-        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
-
-    red_beuth = (227/255, 35/255, 37/255)
-    beuth_col_1 = (223/255, 242/255, 243/255)
-    beuth_col_2 = (178/255, 225/255, 227/255)
-    beuth_col_3 = (0/255, 152/255, 161/255)
-
-    plt.figure(figsize=(8, 6)) #default figsize=(8, 6)
-    plt.style.use('ggplot')
-    plt.rcParams['axes.facecolor'] = beuth_col_3
-    plt.ylabel('CO2-Emissionen in t/a', fontsize=14)
-    plt.xlabel('Kosten in Mio. €/a', fontsize=14)
-    plt.axis([0, 50, 0, 40000]) 
-    #plt.axis([0, 30, 0, 30000]) #alternative settings
-
-    plt.title(
-            'Jährliche Emissionen und Kosten der Energieversorgung',
-            fontsize=14)
-    plt.suptitle(cfg['workshop_title'],
-                    fontsize=10)
-    plt.tick_params(axis='both', which='major', labelsize=12)
-    labels_list = []
-    for tn in cfg['team_names']:
-            # new_name = 'Team ' + tn
-            new_name = tn
-            labels_list.append(new_name)
-    labels = labels_list
-    plt.scatter(
-            df_basic_results_and_team_decision['costs'],
-            df_basic_results_and_team_decision['emissions'],
-            marker='o',
-            c=[red_beuth],
-            s=df_basic_results_and_team_decision['selfsufficiency'] * 10, #default *1000
-            edgecolors=beuth_col_2,
-            linewidths=1.0,
-            alpha=1,
-            cmap=plt.get_cmap('Spectral'))
-    plt.text(1, 2000, 'Copyright ©, Berliner Hochschule für '
-                 + 'Technik, 2022. All rights reserved.',
-                 fontsize=11.5, color=beuth_col_1,
-                 ha='left', va='top', alpha=0.5)
- 
-    for label, x, y in zip(
-                    labels,
-                    df_basic_results_and_team_decision['costs'],
-                    df_basic_results_and_team_decision['emissions']):
-                plt.annotate(
-                    label,
-                    xy=(x, y),
-                    xytext=(75, 40),
-                    textcoords='offset points',
-                    ha='right',  # horizontal alignment
-                    va='bottom',  # vertical alignment 'bottom'
-                    bbox=dict(
-                        boxstyle='round,pad=0.5',
-                        fc=beuth_col_1,
-                        alpha=0.5),
-                    arrowprops=dict(
-                        arrowstyle='->',
-                        connectionstyle='arc3,rad=0'))
-    plt.savefig('../results/plots/results.png', dpi=300)
+def plot_team_results(config_path, df_basic_results_and_team_decision,
+                      preview=False):
+    """Draw the costs and emissions of the teams, return the plot file.
+
+    With preview the plot is saved with the lower resolution for live
+    screens, see 'plotting'.
+    """
+    # matplotlib is slow to import, it is only needed for the plots
+    import plotting
+
+    cfg = run_context.get(config_path).cfg
+    return plotting.plot_results(df_basic_results_and_team_decision, cfg,
+                                 preview=preview)
+
+
+def plot_team_dispatch(config_path, team_numbers, preview=False):
+    """Draw the dispatch of every team, return the plot files."""
+    import plotting
+
+    cfg = run_context.get(config_path).cfg
+    return plotting.plot_dispatch(
+        cfg, team_numbers,
+        lambda n: results_store.load_string_results(cfg, n),
+        preview=preview)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Timers, counters and profiles of the stages of a team.
+
+The stages of 'run_model', 'display_results' and 'analyse_energy_system'
+are wrapped in 'timer'. The time of every stage is logged and added to the
+statistics of the team, together with the size of the linear program and
+the solver iterations (see 'solver_backend.solve'). The statistics of the
+optimisation are written next to the results file of the team
+('model_team_<n>.stats.json'), so they also reach the main process when
+the teams are solved by worker processes. 'analyse_energy_system' adds
+them as columns to results.csv.
+
+With 'profile_teams' in config.yml the optimisation of every team is run
+under cProfile. The profiles are written to
+'results/optimisation_results/profiles' and can be read with pstats or
+e.g. snakeviz.
+
+"""
+
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import time
+
+import results_store
+import run_context
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+profile_path = abs_path + '/results/optimisation_results/profiles'
+
+# Statistics of the team that is optimised in this process
+_stats = {}
+
+# Results of 'solver_backend.solve' that are kept in the statistics
+solve_stats = {'solve_time': 'solver time [s]',
+               'variables': 'LP variables',
+               'constraints': 'LP constraints',
+               'nonzeros': 'LP nonzeros',
+               'iterations': 'solver iterations'}
+
+
+def start_team():
+    """Reset the statistics for the next team."""
+    _stats.clear()
+
+
+def stats():
+    """Return the statistics of the current team."""
+    return dict(_stats)
+
+
+@contextlib.contextmanager
+def timer(stage):
+    """Time a stage, log the time and add it to the statistics."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        name = 'time {0} [s]'.format(stage)
+        _stats[name] = _stats.get(name, 0) + duration
+        logging.info('Stage {0}: {1:.3f} s'.format(stage, duration))
+
+
+def count(name, value=1):
+    """Add value to the counter name of the statistics."""
+    _stats[name] = _stats.get(name, 0) + value
+
+
+def record_solve(solve_info):
+    """Add the LP size and the solver iterations of a solve."""
+    for key, name in solve_stats.items():
+        _stats[name] = solve_info.get(key)
+
+
+def stats_file_path(team_number):
+    return results_store.dump_path + '/model_team_{0}.stats.json'.format(
+        team_number+1)
+
+
+def write_stats(team_number):
+    with open(stats_file_path(team_number), 'w') as f:
+        json.dump(_stats, f, indent=2)
+
+
+def read_stats(team_number):
+    """Return the statistics of the last optimisation of a team.
+
+    Returns an empty dict if there are none, e.g. for results of an older
+    version.
+    """
+    try:
+        with open(stats_file_path(team_number), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@contextlib.contextmanager
+def profile(team_number, enabled=True):
+    """Run the block under cProfile and dump the profile of the team."""
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(profile_path, exist_ok=True)
+        file_path = profile_path + '/model_team_{0}.prof'.format(
+            team_number+1)
+        profiler.dump_stats(file_path)
+        logging.info('Profile of team {0} written to {1}'.format(
+            team_number+1, file_path))
+
+
+def run_team(run, config_path, team_number):
+    """Optimise a team with run, time it and write its statistics.
+
+    run is 'run_model' or 'run_persistent_model'. The statistics are only
+    written if the optimisation succeeds.
+    """
+    cfg = run_context.get(config_path).cfg
+
+    start_team()
+    with profile(team_number, cfg.get('profile_teams', False)):
+        with timer('total'):
+            run(config_path=config_path, team_number=team_number)
+    write_stats(team_number)
+    logging.info('Statistics of team {0}: {1}'.format(team_number+1, _stats))
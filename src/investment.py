@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Investment optimisation: find the cost-optimal design with one solve.
+
+Instead of solving one guessed design after the other, the capacities of
+the technologies (see 'experiment_config/investment.yml') are decision
+variables of the optimisation model. Their costs are the annuities of the
+investment costs ('invest_cost_*', 'lifetime', 'wacc'), the same costs as
+in 'kpi.compute_kpis', so the objective is the total annual cost of the
+energy system. Unit counts can be restricted to whole units and every
+technology can be bounded. The optimal design is written in the format of
+the design parameter files of the teams, e.g. as reference solution.
+
+With 'time_series_aggregation' in config.yml the model is built on
+typical periods (see 'time_series_aggregation'), which makes the mixed
+integer problem of whole units much faster to solve.
+
+Run from the folder 'src':
+
+    python investment.py [path of the investment specification]
+
+"""
+
+import logging
+import os
+import sys
+
+import numpy as np
+import oemof.solph as solph
+from oemof.tools import logger
+import pandas as pd
+from pyomo.environ import Constraint, NonNegativeIntegers, Var
+import yaml
+
+import kpi
+from model_energy_system import (create_energy_system, flow_sums,
+                                 get_number_of_time_steps, load_parameters)
+import run_context
+import solver_backend
+import time_series_aggregation
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+
+# Flow (source, target) or storage (label, None) of the capacity of each
+# technology in the energy system
+capacity_labels = {
+    'number_of_windturbines': ('wind_turbine', 'electricity'),
+    'number_of_chps': ('chp', 'heat'),
+    'number_of_boilers': ('boiler', 'heat'),
+    'number_of_PV_pp': ('PV_pp', 'electricity'),
+    'number_of_heat_pumps': ('heat_pump', 'heat'),
+    'area_PV': ('PV', 'electricity'),
+    'area_solar_th': ('solar_thermal', 'heat'),
+    'capacity_electr_storage': ('storage_el', None),
+    'capacity_thermal_storage': ('storage_th', None)}
+
+
+def unit_capacities(param_value):
+    """Return the capacity of one unit of every design parameter.
+
+    In the unit of the nominal values of 'create_energy_system': MW of
+    the wind turbines (the wind power is given in kW per unit) and of the
+    heat output of the converters, m² of the solar technologies and MWh of
+    the storages.
+    """
+    return {
+        'number_of_windturbines': 0.001,
+        'number_of_chps': 0.5,
+        'number_of_boilers': 3,
+        'number_of_PV_pp': param_value['PV_pp_surface_area'] * 10000,
+        'number_of_heat_pumps': param_value['heatpump_heat_output'],
+        'area_PV': 10000,
+        'area_solar_th': 10000,
+        'capacity_electr_storage': param_value['daily_demand_el'],
+        'capacity_thermal_storage': param_value['daily_demand_th']}
+
+
+def investments(param_value, technologies):
+    """Return the 'solph.Investment' of the capacity of each technology.
+
+    technologies maps design parameters to their settings of the
+    specification ('minimum', 'maximum' in design units).
+    """
+    units = unit_capacities(param_value)
+    invest_costs = dict(kpi.technologies)
+    result = {}
+    for name, settings in technologies.items():
+        if name not in units:
+            raise ValueError('{0} is not a design parameter, use one of '
+                             '{1}.'.format(name, ', '.join(units)))
+        settings = settings or {}
+        # Investment costs of one unit, per hectare for the open field PV
+        # power plant
+        invest_cost = param_value[invest_costs[name]]
+        if name == 'number_of_PV_pp':
+            invest_cost = invest_cost * param_value['PV_pp_surface_area']
+        ep_costs = float(kpi.annuity(invest_cost, param_value['lifetime'],
+                                     param_value['wacc'])) / units[name]
+        result[name] = solph.Investment(
+            ep_costs=ep_costs,
+            minimum=settings.get('minimum', 0) * units[name],
+            maximum=settings.get('maximum', float('inf')) * units[name])
+    return result
+
+
+def invest_variables(model):
+    """Return the investment variable of every optimised technology."""
+    variables = {}
+    labels = {label: name for name, label in capacity_labels.items()}
+    if hasattr(model, 'InvestmentFlowBlock'):
+        for o, i, p in model.InvestmentFlowBlock.invest:
+            name = labels.get((str(o), str(i)))
+            if name is not None:
+                variables[name] = model.InvestmentFlowBlock.invest[o, i, p]
+    if hasattr(model, 'GenericInvestmentStorageBlock'):
+        block = model.GenericInvestmentStorageBlock
+        for n, p in block.invest:
+            name = labels.get((str(n), None))
+            if name is not None:
+                variables[name] = block.invest[n, p]
+    return variables
+
+
+def add_integer_units(model, param_value, names):
+    """Only allow whole units of the technologies names."""
+    units = unit_capacities(param_value)
+    variables = invest_variables(model)
+    model.investment_units = Var(names, within=NonNegativeIntegers)
+
+    def _whole_units_rule(m, name):
+        return variables[name] == m.investment_units[name] * units[name]
+    model.investment_units_constr = Constraint(names,
+                                               rule=_whole_units_rule)
+
+
+def optimal_design(model, param_value, technologies):
+    """Return the optimised design parameters of a solved model."""
+    units = unit_capacities(param_value)
+    variables = invest_variables(model)
+    design = {}
+    for name, settings in technologies.items():
+        value = max(variables[name].value or 0, 0) / units[name]
+        if (settings or {}).get('integer', False):
+            value = round(value)
+        design[name] = value
+    return pd.Series(design)
+
+
+def build_model(param_value, data, number_of_time_steps, technologies,
+                aggregation=None):
+    """Build the investment model of a design, return the model.
+
+    aggregation are the typical periods of 'time_series_aggregation' to
+    build the model on, data their time series.
+    """
+    energysystem = create_energy_system(
+        param_value, data, number_of_time_steps,
+        investment=investments(param_value, technologies))
+    if aggregation is None:
+        model = solph.Model(energysystem)
+    else:
+        model = time_series_aggregation.create_model(energysystem,
+                                                     aggregation)
+    integer_names = [name for name, settings in technologies.items()
+                     if (settings or {}).get('integer', False)]
+    if integer_names:
+        add_integer_units(model, param_value, integer_names)
+    return model
+
+
+def write_design(design, base_design_file_path, file_path):
+    """Write a design in the format of the design parameter files."""
+    param_df = pd.read_csv(base_design_file_path)
+    for name, value in design.items():
+        param_df.loc[param_df['var_name'] == name, 'value'] = value
+    param_df.to_csv(file_path, index=False)
+
+
+def prepare(config_path, spec):
+    """Return the inputs of the investment model of a specification.
+
+    A dict with the configuration, the parameter values of the base
+    design, the time series, the number of time steps, the typical periods
+    (None without 'time_series_aggregation') and the weights of the time
+    steps (None for the full time series).
+    """
+    context = run_context.get(config_path)
+    # The base design takes the place of the design of team 1
+    cfg = dict(context.cfg,
+               design_parameters_file_name=[spec['base_design_file_name']])
+    inputs = {'cfg': cfg,
+              'param_value': load_parameters(cfg, 0),
+              'data': context.data,
+              'number_of_time_steps': get_number_of_time_steps(cfg),
+              'aggregation': None,
+              'weights': None}
+
+    aggregation_settings = time_series_aggregation.settings(cfg)
+    if aggregation_settings is not None:
+        aggregation = time_series_aggregation.aggregate(
+            inputs['data'], inputs['number_of_time_steps'],
+            *aggregation_settings)
+        inputs.update(data=aggregation['data'],
+                      number_of_time_steps=len(aggregation['data']),
+                      aggregation=aggregation,
+                      weights=aggregation['weights'])
+    return inputs
+
+
+def design_kpis(model, inputs, technologies):
+    """Return the optimal design of a solved model and its KPIs."""
+    param_value = inputs['param_value']
+    design = optimal_design(model, param_value, technologies)
+    optimal_param_value = param_value.copy()
+    for name, value in design.items():
+        optimal_param_value[name] = value
+    kpis = kpi.compute_kpis(
+        design=kpi.design_matrix([optimal_param_value]),
+        sums=kpi.sums_vector(flow_sums(model, inputs['weights']))[
+            np.newaxis],
+        param_value=optimal_param_value)
+    return design, {name: float(values[0]) for name, values in kpis.items()}
+
+
+def optimise(config_path, spec_path):
+    """Find the cost-optimal design of a specification.
+
+    Returns the optimal design parameters and their KPIs.
+    """
+    with open(spec_path, 'r', encoding='utf-8') as ymlfile:
+        spec = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    logger.define_logging(logfile='investment.log',
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    inputs = prepare(config_path, spec)
+    cfg = inputs['cfg']
+    technologies = spec['technologies']
+
+    logging.info('Build the investment model of {0} technologies'.format(
+        len(technologies)))
+    model = build_model(inputs['param_value'], inputs['data'],
+                        inputs['number_of_time_steps'], technologies,
+                        inputs['aggregation'])
+    solve_info = solver_backend.solve(model, cfg['solver'],
+                                      cfg.get('solver_backend', 'shell'),
+                                      cfg['solver_verbose'])
+    if solve_info['termination'] != 'optimal':
+        raise RuntimeError('The optimisation ended with termination '
+                           'condition {0}.'.format(solve_info['termination']))
+
+    design, kpis = design_kpis(model, inputs, technologies)
+
+    file_path = (abs_path + '/results/optimisation_results/tables/'
+                 + spec['results_file_name'])
+    write_design(design, abs_path + '/data/' + spec['base_design_file_name'],
+                 file_path)
+
+    logging.info('Optimal design: {0}'.format(
+        ', '.join('{0} {1:g}'.format(name, value)
+                  for name, value in design.items())))
+    logging.info('Total costs {0:.2f} Mio. €/a, emissions {1:.2f} t/a, '
+                 'written to {2}'.format(kpis['total_costs'] / 1e6,
+                                         kpis['emissions'] / 1000,
+                                         file_path))
+    return design, kpis
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        investment_spec_path = os.path.abspath(sys.argv[1])
+    else:
+        investment_spec_path = os.path.abspath(
+            '../experiment_config/investment.yml')
+    optimise(config_path=os.path.abspath('../experiment_config/config.yml'),
+             spec_path=investment_spec_path)
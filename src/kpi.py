@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Key performance indicators (KPI) of the energy systems of the teams.
+
+All KPIs are computed with NumPy array operations for many energy systems
+at once. The inputs are
+
+* a design matrix with one row per energy system and one column per
+  technology (see 'technologies'), e.g. the number of CHPs,
+* a flow matrix with one row per energy system and one column per flow
+  (see 'flows'), holding the annual sum of the flow in MWh,
+* the general parameters. A parameter can be a scalar or an array with
+  one value per energy system, e.g. to evaluate a sweep over 'wacc' or
+  'invest_cost_wind' without solving the models again.
+
+The results are returned in EUR/a, kg/a and MWh/a.
+
+"""
+
+import numpy as np
+
+# Design parameter of each technology and its investment cost parameter.
+# The order is the order of the columns of the design matrix.
+technologies = [
+    ('number_of_chps', 'invest_cost_chp'),
+    ('number_of_boilers', 'invest_cost_boiler'),
+    ('number_of_windturbines', 'invest_cost_wind'),
+    ('number_of_heat_pumps', 'invest_cost_heatpump'),
+    ('capacity_electr_storage', 'invest_cost_storage_el'),
+    ('capacity_thermal_storage', 'invest_cost_storage_th'),
+    ('area_PV', 'invest_cost_pv'),
+    ('area_solar_th', 'invest_cost_solarthermal'),
+    ('number_of_PV_pp', 'invest_cost_PV_pp'),
+]
+
+# Name and (source, target) label of the flows of the flow matrix
+flows = [
+    ('gas', ('rgas', 'natural_gas')),
+    ('el_shortage', ('shortage_bel', 'electricity')),
+    ('heat_shortage', ('shortage_bth', 'heat')),
+    ('el_excess', ('electricity', 'excess_bel')),
+    ('heat_excess', ('heat', 'excess_bth')),
+    ('el_demand', ('electricity', 'demand_el')),
+    ('heat_demand', ('heat', 'demand_th')),
+    ('el_wind', ('wind_turbine', 'electricity')),
+    ('el_pv', ('PV', 'electricity')),
+    ('el_pv_pp', ('PV_pp', 'electricity')),
+    ('heat_solar', ('solar_thermal', 'heat')),
+    ('el_chp', ('chp', 'electricity')),
+    ('heat_chp', ('chp', 'heat')),
+    ('gas_chp', ('natural_gas', 'chp')),
+    ('heat_boiler', ('boiler', 'heat')),
+    ('gas_boiler', ('natural_gas', 'boiler')),
+    ('heat_hp', ('heat_pump', 'heat')),
+    ('el_hp', ('electricity', 'heat_pump')),
+]
+
+_flow_column = {name: i for i, (name, _) in enumerate(flows)}
+
+
+def design_matrix(param_values):
+    """Return the design matrix of a list of parameter value Series."""
+    return np.array([[param_value[name] for name, _ in technologies]
+                     for param_value in param_values], dtype=float)
+
+
+def annual_sums(string_results):
+    """Return the annual sum of every flow of a string keyed result dict.
+
+    Flows of technologies that are not part of the energy system are 0.
+    """
+    sums = np.zeros(len(flows))
+    for i, (_, label) in enumerate(flows):
+        if label in string_results:
+            sums[i] = string_results[label]['sequences']['flow'].sum()
+    return sums
+
+
+def sums_vector(flow_sums):
+    """Return the flow matrix row of a dict of (source, target) sums."""
+    return np.array([flow_sums.get(label, 0) for _, label in flows],
+                    dtype=float)
+
+
+def annuity(capex, lifetime, wacc):
+    """Vectorised form of 'oemof.tools.economics.annuity'."""
+    lifetime = np.asarray(lifetime, dtype=float)
+    wacc = np.asarray(wacc, dtype=float)
+    if np.any(lifetime < 1) or np.any((wacc < 0) | (wacc > 1)):
+        raise ValueError("Input arguments for 'annuity' out of bounds!")
+    return (capex * (wacc * (1 + wacc) ** lifetime)
+            / ((1 + wacc) ** lifetime - 1))
+
+
+def compute_kpis(design, sums, param_value):
+    """Compute the KPIs of many energy systems at once.
+
+    design is the design matrix (energy systems x technologies), sums the
+    flow matrix (energy systems x flows) and param_value the general
+    parameters. Returns a dict of arrays with one value per energy system.
+    """
+    design = np.atleast_2d(np.asarray(design, dtype=float))
+    sums = np.atleast_2d(np.asarray(sums, dtype=float))
+    flow = {name: sums[:, i] for name, i in _flow_column.items()}
+
+    def value(name):
+        return np.asarray(param_value[name], dtype=float)
+
+    ###########################################################################
+    # Costs
+    ###########################################################################
+    # Summed up technology by technology to get the same floating point
+    # result as the scalar calculation
+    capex = np.zeros(len(design))
+    total_annuity = np.zeros(len(design))
+    for i, (name, cost) in enumerate(technologies):
+        capex_technology = design[:, i] * value(cost)
+        # The cost of the open field PV power plant is given per hectare
+        if name == 'number_of_PV_pp':
+            capex_technology = (capex_technology
+                                * value('PV_pp_surface_area'))
+        capex = capex + capex_technology
+        total_annuity = total_annuity + annuity(
+            capex_technology, value('lifetime'), value('wacc'))
+
+    var_costs = (flow['gas'] * value('var_costs_gas')
+                 + flow['el_shortage'] * value('var_costs_shortage_bel')
+                 + flow['heat_shortage'] * value('var_costs_shortage_bth'))
+
+    ###########################################################################
+    # CO2-Emissions
+    ###########################################################################
+    emissions_el_import = flow['el_shortage'] * value('emission_el')
+    emissions_heat_import = flow['heat_shortage'] * value('emission_heat')
+    emissions_chp = flow['gas_chp'] * value('emission_gas')
+    emissions_boiler = flow['gas_boiler'] * value('emission_gas')
+
+    emissions = (emissions_el_import + emissions_heat_import
+                 + emissions_chp + emissions_boiler)
+
+    ###########################################################################
+    # Self-Sufficiency
+    ###########################################################################
+    # The electrical consumption of the heat pumps is not included in the
+    # electrical demand
+    el_consumption = flow['el_demand'] + flow['el_hp']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage_el = ((el_consumption - flow['el_shortage'])
+                       / el_consumption)
+        coverage_el_without_heat_pump = (
+            (flow['el_demand'] - flow['el_shortage']) / flow['el_demand'])
+        coverage_heat = ((flow['heat_demand'] - flow['heat_shortage'])
+                         / flow['heat_demand'])
+
+    return {
+        'capex': capex,
+        'annuity': total_annuity,
+        'var_costs': var_costs,
+        'total_costs': var_costs + total_annuity,
+        'emissions_production': emissions_chp + emissions_boiler,
+        'emissions_purchase': emissions_el_import + emissions_heat_import,
+        'emissions': emissions,
+        'coverage_el': coverage_el,
+        'coverage_el_without_heat_pump': coverage_el_without_heat_pump,
+        'coverage_heat': coverage_heat,
+        'selfsufficiency': (coverage_el + coverage_heat) / 2,
+        'selfsufficiency_without_heat_pump': (
+            (coverage_el_without_heat_pump + coverage_heat) / 2),
+        'el_consumption': el_consumption,
+        'el_production': (flow['el_chp']
+                          + (flow['el_pv'] + flow['el_pv_pp'])
+                          + flow['el_wind']),
+        'el_purchase': flow['el_shortage'],
+        'el_excess': flow['el_excess'],
+        'heat_demand': flow['heat_demand'],
+        'heat_production': (flow['heat_chp'] + flow['heat_boiler']
+                            + flow['heat_solar'] + flow['heat_hp']),
+        'heat_purchase': flow['heat_shortage'],
+        'heat_excess': flow['heat_excess'],
+    }
@@ -16,35 +16,97 @@ Licence: GPL-3.0
 
 """
 
+import argparse
+import logging
 import os
-from model_energy_system import run_model
-from basic_analysis import display_results
-from detailed_analysis import my_detailed_analysis
-import yaml
 
+# The plot is only saved to a file, no window is opened. Chosen before
+# matplotlib is imported.
+os.environ.setdefault('MPLBACKEND', 'Agg')
 
-def main():
+import run_context
+
+
+def main(watch=False, watch_interval=1.0):
     # Choose configuration file to run model with
     exp_cfg_file_name = 'config.yml'
     config_file_path = os.path.abspath(
         '../experiment_config/' + exp_cfg_file_name)
-    with open(config_file_path, 'r') as ymlfile:
-        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+    # Configuration, time series and general parameters of the run, shared
+    # by all teams and stages
+    cfg = run_context.get(config_file_path).cfg
+
+    # Solve a team whenever its parameter file is saved, see 'watch'
+    if watch:
+        import watch as watch_mode
+        watch_mode.watch(config_file_path, interval=watch_interval)
+        return
+
+    # Only the stale stages and teams, see 'pipeline'
+    if cfg.get('incremental_pipeline', False):
+        import pipeline
+        pipeline.run(config_file_path)
+        return
+
+    team_numbers = list(range(cfg['number_of_teams']))
+
+    # The modules of the stages are imported only if the stage is enabled,
+    # oemof.solph, Pyomo and matplotlib take seconds to import
+    results_table = None
+    if cfg['run_detailed_analysis']:
+        from detailed_analysis import (ResultsTable, analyse_team,
+                                       my_detailed_analysis)
+        results_table = ResultsTable()
 
-    # global teamdata
     if cfg['run_model']:
-        for n in range(cfg['number_of_teams']):
-            run_model(config_path=config_file_path, team_number=n)
+        from parallel_execution import number_of_workers, run_models
+        workers = number_of_workers(cfg.get('parallel_workers', 1),
+                                    len(team_numbers))
+
+        # Every team is added to results.csv as soon as it is solved
+        def on_team_done(n):
+            analyse_team(config_file_path, n, results_table,
+                         plot_results=cfg.get('stream_plot', False))
+
+        failed_teams = run_models(config_path=config_file_path,
+                                  team_numbers=team_numbers,
+                                  workers=workers,
+                                  persistent=cfg.get('persistent_model',
+                                                     False),
+                                  on_team_done=(on_team_done
+                                                if results_table is not None
+                                                else None))
+        # Do not analyse outdated dumps of teams whose optimisation (or
+        # streamed analysis) failed
+        for n in failed_teams:
+            logging.warning('Team {0} ({1}) is skipped in the analysis, '
+                            'its optimisation or analysis failed.'.format(
+                                n+1, cfg['team_names'][n]))
+        team_numbers = [n for n in team_numbers if n not in failed_teams]
 
     # Basic analysis
     if cfg['display_results']:
-        for n in range(cfg['number_of_teams']):
+        from basic_analysis import display_results
+        for n in team_numbers:
                 display_results(config_path=config_file_path, team_number=n)
 
     if cfg['run_detailed_analysis']:
-        my_detailed_analysis(config_file_path=config_file_path)
+        my_detailed_analysis(config_file_path=config_file_path,
+                             team_numbers=team_numbers,
+                             results_table=results_table)
 
 
-main()
+# The guard is required for the worker processes of the parallel mode
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Optimise and analyse the energy systems of the teams.')
+    parser.add_argument('--watch', action='store_true',
+                        help='solve a team again whenever its parameter '
+                             'file is saved, until stopped with Ctrl+C')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='polling interval of the watch mode in seconds '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+    main(watch=args.watch, watch_interval=args.interval)
 
 
@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Merit order dispatch: simulate the energy system of a design without a
+solver.
+
+The hourly dispatch of the components of 'create_energy_system' is
+simulated with NumPy for many designs at once. Every hour the demand that
+the fixed feed-in (wind, PV, solar thermal) leaves is covered in this
+order:
+
+1. electricity surplus -> heat pumps (heat is needed)
+2. discharge of the thermal and the electrical storage
+3. CHPs, for the remaining electricity demand and, if there are heat
+   pumps, for the heat demand together with the heat pumps
+4. the remaining heat demand by the cheapest of heat pumps with purchased
+   electricity, boilers and purchased heat (see the variable costs in
+   general_parameters.csv)
+5. surplus -> charge the storages -> excess, remaining demand ->
+   purchase (shortage)
+
+The conversion factors, storage efficiencies, losses and capacities and
+the gas budget ('full_load_time_max_gas') are the ones of the LP. If the
+gas budget is too small for the dispatch, it goes to the hours in which
+the gas saves the most costs per MWh. The storages shift surplus energy:
+they are charged with the surplus and not discharged below their initial
+level. Their charge is limited so they can get back to the initial level
+by the end of the time series, losses below it are made up from the
+surplus or the purchase. So the storages end at their initial level like
+the balanced storages of the LP and the costs of the dispatch are an
+upper bound of the optimum, unless the losses of a storage exceed its
+charging power. 'compare_with_lp' reports the difference of the costs and
+the deviation from the initial level at the end.
+
+The simulation is meant for screening and live previews, not for the
+results of the workshop. On the full year the costs of the teams with
+small storages are 3-6% above the LP optimum. Large thermal storages (30
+and more daily demands) are used seasonally by the LP: charged in summer
+and emptied in winter, far below their initial level. The simulation only
+uses their upper half day by day, the costs of such designs are up to 35%
+above the optimum.
+
+The results have the layout of 'solph.processing.results' with string
+labels, so they are stored with 'results_store' and analysed like the
+results of a solve. Set 'dispatch_engine: merit_order' in config.yml to
+use it instead of the LP. Designs without converters and storages have a
+fixed dispatch, for them the simulation is the optimum and is always used
+instead of the LP (see 'has_fixed_dispatch').
+
+Run from the folder 'src' to compare it with the LP:
+
+    python merit_order.py [team number ...]
+
+"""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import run_context
+
+# Storages, by label: bus, design parameter, demand parameter of the
+# capacity and suffix of the storage parameters
+storages = {
+    'storage_el': ('electricity', 'capacity_electr_storage',
+                   'daily_demand_el', 'el'),
+    'storage_th': ('heat', 'capacity_thermal_storage', 'daily_demand_th',
+                   'th')}
+
+# Components of 'create_energy_system' that are left out without units, by
+# label
+_design_parameter = {
+    'wind_turbine': 'number_of_windturbines',
+    'PV_pp': 'number_of_PV_pp',
+    'PV': 'area_PV',
+    'solar_thermal': 'area_solar_th',
+    'chp': 'number_of_chps',
+    'heat_pump': 'number_of_heat_pumps',
+    'boiler': 'number_of_boilers',
+    'storage_th': 'capacity_thermal_storage',
+    'storage_el': 'capacity_electr_storage'}
+
+# Flows of the results, (source, target)
+flows = [
+    ('rgas', 'natural_gas'),
+    ('shortage_bel', 'electricity'),
+    ('shortage_bth', 'heat'),
+    ('electricity', 'excess_bel'),
+    ('heat', 'excess_bth'),
+    ('electricity', 'demand_el'),
+    ('heat', 'demand_th'),
+    ('wind_turbine', 'electricity'),
+    ('PV', 'electricity'),
+    ('PV_pp', 'electricity'),
+    ('solar_thermal', 'heat'),
+    ('natural_gas', 'chp'),
+    ('chp', 'electricity'),
+    ('chp', 'heat'),
+    ('electricity', 'heat_pump'),
+    ('heat_pump', 'heat'),
+    ('natural_gas', 'boiler'),
+    ('boiler', 'heat'),
+    ('electricity', 'storage_el'),
+    ('storage_el', 'electricity'),
+    ('heat', 'storage_th'),
+    ('storage_th', 'heat')]
+
+
+def _parameter(param_values, name):
+    return np.array([float(param_value[name])
+                     for param_value in param_values])
+
+
+def _storage_parameters(param_values, storage):
+    _, capacity, demand, suffix = storages[storage]
+    size = (_parameter(param_values, capacity)
+            * _parameter(param_values, demand))
+    return {
+        'size': size,
+        'power': size / _parameter(param_values,
+                                   'charge_time_storage_' + suffix),
+        'loss': _parameter(param_values, 'capacity_loss_storage_' + suffix),
+        'eta_in': _parameter(param_values,
+                             'inflow_conv_factor_storage_' + suffix),
+        'eta_out': _parameter(param_values,
+                              'outflow_conv_factor_storage_' + suffix),
+        'initial': size * _parameter(param_values,
+                                     'init_capacity_storage_' + suffix)}
+
+
+def _dispatch(el_residual, heat_residual, p, gas_left, heat_order):
+    """Dispatch all hours of all designs without storage (2d arrays).
+
+    gas_left is the gas that may be used per hour. Returns the flows by
+    (source, target) and the heat of the heat pumps run with purchased
+    electricity.
+    """
+    cop = p['cop']
+    heat_need = np.maximum(heat_residual, 0)
+    heat_surplus = np.maximum(-heat_residual, 0)
+    el_need = np.maximum(el_residual, 0)
+    el_surplus = np.maximum(-el_residual, 0)
+
+    # 1. Surplus electricity to the heat pumps
+    hp_heat = np.minimum(np.minimum(p['hp'], heat_need), el_surplus * cop)
+    el_surplus = el_surplus - hp_heat / cop
+    heat_need = heat_need - hp_heat
+
+    # 2. CHPs for the electricity demand and, with the heat pumps, for the
+    # heat demand (CHP heat q, its electricity drives the heat pumps). If
+    # the heat pumps are too small, the CHPs only run them at full load.
+    hp_room = p['hp'] - hp_heat
+    r = p['chp_el_per_heat']
+    q_heat = (heat_need + cop * el_need) / (1 + cop * r)
+    q_heat = np.where(cop * (r * q_heat - el_need) <= hp_room, q_heat,
+                      (el_need + hp_room / cop) / r)
+    q_heat = np.where(hp_room > 0, q_heat, 0)
+    chp_heat = np.minimum(np.minimum(p['chp'], np.maximum(el_need / r,
+                                                          q_heat)),
+                          gas_left * p['chp_heat_per_gas'])
+    chp_heat = np.maximum(chp_heat, 0)
+    chp_gas = chp_heat / p['chp_heat_per_gas']
+    chp_el = r * chp_heat
+
+    used = np.minimum(chp_heat, heat_need)
+    heat_need = heat_need - used
+    heat_surplus = heat_surplus + chp_heat - used
+    used = np.minimum(chp_el, el_need)
+    el_need = el_need - used
+    el_extra = chp_el - used
+    hp_chp = np.minimum(np.minimum(hp_room, heat_need), el_extra * cop)
+    hp_heat = hp_heat + hp_chp
+    heat_need = heat_need - hp_chp
+    el_surplus = el_surplus + el_extra - hp_chp / cop
+
+    # 3. The remaining heat demand, cheapest first
+    boiler_heat = np.zeros_like(heat_need)
+    hp_purchased = np.zeros_like(heat_need)
+    for option in heat_order:
+        if option == 'heat_pump':
+            hp_purchased = np.minimum(p['hp'] - hp_heat, heat_need)
+            hp_heat = hp_heat + hp_purchased
+            el_need = el_need + hp_purchased / cop
+            heat_need = heat_need - hp_purchased
+        elif option == 'boiler':
+            boiler_heat = np.maximum(np.minimum(
+                np.minimum(p['boiler'], heat_need),
+                (gas_left - chp_gas) * p['boiler_eff']), 0)
+            heat_need = heat_need - boiler_heat
+        else:
+            break
+    boiler_gas = boiler_heat / p['boiler_eff']
+
+    return {
+        ('rgas', 'natural_gas'): chp_gas + boiler_gas,
+        ('shortage_bel', 'electricity'): el_need,
+        ('shortage_bth', 'heat'): heat_need,
+        ('electricity', 'excess_bel'): el_surplus,
+        ('heat', 'excess_bth'): heat_surplus,
+        ('natural_gas', 'chp'): chp_gas,
+        ('chp', 'electricity'): chp_el,
+        ('chp', 'heat'): chp_heat,
+        ('electricity', 'heat_pump'): hp_heat / cop,
+        ('heat_pump', 'heat'): hp_heat,
+        ('natural_gas', 'boiler'): boiler_gas,
+        ('boiler', 'heat'): boiler_heat}, hp_purchased
+
+
+def _operate_storage(s, surplus, need, minimum, maximum):
+    """Charge a storage with the surplus and discharge it for the need.
+
+    surplus and need are sequences of the hours, of floats (one design,
+    minimum and maximum are the builtins) or of arrays of designs (NumPy
+    functions). The storage ends at its initial level, like the balanced
+    storages of the LP:
+
+    * it is not discharged below its initial level. If the losses take it
+      below, it is charged back up, from the purchase if there is no
+      surplus,
+    * it is not charged above the level it can still be discharged from
+      in the remaining hours, and it is discharged (into the excess if
+      nothing is needed) when it would stay above it.
+
+    Returns the charged and discharged energy on the side of the bus and
+    the contents.
+    """
+    size, power, initial = s['size'], s['power'], s['initial']
+    kept_share, eta_in, eta_out = 1 - s['loss'], s['eta_in'], s['eta_out']
+    # Largest decrease of the content per hour
+    drain = power / eta_out
+    remaining = len(surplus)
+    content = initial
+    charged, discharged, contents = [], [], [content]
+    for surplus_t, need_t in zip(surplus, need):
+        remaining -= 1
+        kept = content * kept_share
+        # Highest content from which the remaining hours get back to the
+        # initial level
+        ceiling = initial + remaining * drain
+        discharge = minimum(maximum(minimum(power, need_t),
+                                    maximum(kept - ceiling, 0) * eta_out),
+                            maximum(kept - initial, 0) * eta_out)
+        charge = maximum(minimum(minimum(minimum(power, surplus_t),
+                                         (size - kept) / eta_in),
+                                 (ceiling - kept + discharge / eta_out)
+                                 / eta_in), 0)
+        # Losses below the initial level are made up
+        charge = maximum(charge, minimum(power, (initial - kept) / eta_in))
+        content = kept + charge * eta_in - discharge / eta_out
+        charged.append(charge)
+        discharged.append(discharge)
+        contents.append(content)
+    return charged, discharged, contents
+
+
+def _storage_operation(s, surplus, need):
+    """Run '_operate_storage' for all designs, return 2d arrays."""
+    if len(surplus) < 16:
+        # Few designs: Python floats are much faster than small arrays
+        operations = [_operate_storage(
+            {name: float(value[i]) for name, value in s.items()},
+            surplus[i].tolist(), need[i].tolist(), min, max)
+            for i in range(len(surplus))]
+        return tuple(np.array([operation[j] for operation in operations])
+                     for j in range(3))
+    return tuple(np.array(values).T for values in _operate_storage(
+        s, surplus.T, need.T, np.minimum, np.maximum))
+
+
+def _displace(results, amount, key, *linked):
+    """Reduce the flow key by up to amount, return the rest of amount.
+
+    The linked flows are reduced by the same share, e.g. the fuel of a
+    converter.
+    """
+    flow = results[key]
+    reduced = np.minimum(flow, amount)
+    share = np.divide(reduced, flow, out=np.zeros_like(flow),
+                      where=flow > 0)
+    results[key] = flow - reduced
+    for linked_key in linked:
+        results[linked_key] = results[linked_key] * (1 - share)
+    return amount - reduced
+
+
+def simulate(param_values, data, number_of_time_steps):
+    """Simulate the dispatch of several designs.
+
+    param_values is a list of parameter Series, one per design. The general
+    parameters decide the order of the heat options, they are taken from
+    the first design. Returns the flows by (source, target) and the storage
+    contents by storage label as arrays with one row per design; a storage
+    content has one value more than time steps (the content at the end).
+    """
+    n = number_of_time_steps
+    first = param_values[0]
+    p = {'cop': _parameter(param_values, 'COP_heat_pump')[:, np.newaxis],
+         'chp': _parameter(param_values, 'number_of_chps')[:, np.newaxis]
+         * 0.5,
+         'hp': (_parameter(param_values, 'number_of_heat_pumps')
+                * _parameter(param_values,
+                             'heatpump_heat_output'))[:, np.newaxis],
+         'boiler': _parameter(param_values, 'number_of_boilers')[
+             :, np.newaxis] * 3,
+         'boiler_eff': _parameter(param_values,
+                                  'conversion_factor_boiler')[:, np.newaxis],
+         'chp_heat_per_gas': _parameter(
+             param_values, 'conversion_factor_bth_chp')[:, np.newaxis],
+         'chp_el_per_heat': (
+             _parameter(param_values, 'conversion_factor_bel_chp')
+             / _parameter(param_values,
+                          'conversion_factor_bth_chp'))[:, np.newaxis]}
+
+    # Options for the remaining heat demand by their costs per MWh heat,
+    # purchased heat ends the list
+    heat_costs = {
+        'heat_pump': first['var_costs_shortage_bel'] / first['COP_heat_pump'],
+        'boiler': first['var_costs_gas'] / first['conversion_factor_boiler'],
+        'shortage': first['var_costs_shortage_bth']}
+    heat_order = sorted(heat_costs, key=heat_costs.get)
+
+    # Fixed feed-in [MWh]
+    pv_yield = run_context.solar_yield(data, first, 'eta_PV').to_numpy()[:n]
+    feed_in = {
+        ('wind_turbine', 'electricity'): np.outer(
+            0.001 * _parameter(param_values, 'number_of_windturbines'),
+            data['Wind_power [kW/unit]'].to_numpy()[:n]),
+        ('PV', 'electricity'): np.outer(
+            _parameter(param_values, 'area_PV') * 10000, pv_yield),
+        ('PV_pp', 'electricity'): np.outer(
+            _parameter(param_values, 'PV_pp_surface_area') * 10000
+            * (_parameter(param_values, 'number_of_PV_pp') > 0), pv_yield),
+        ('solar_thermal', 'heat'): np.outer(
+            _parameter(param_values, 'area_solar_th') * 10000,
+            run_context.solar_yield(data, first,
+                                    'eta_solar_th').to_numpy()[:n])}
+    demand_el = np.broadcast_to(data['Demand_el [MWh]'].to_numpy()[:n],
+                                (len(param_values), n))
+    demand_th = np.broadcast_to(data['Demand_th [MWh]'].to_numpy()[:n],
+                                (len(param_values), n))
+    el_residual = (demand_el - feed_in['wind_turbine', 'electricity']
+                   - feed_in['PV', 'electricity']
+                   - feed_in['PV_pp', 'electricity'])
+    heat_residual = demand_th - feed_in['solar_thermal', 'heat']
+
+    # Without storage the hours do not depend on each other, all hours of
+    # all designs are dispatched at once
+    results, hp_purchased = _dispatch(el_residual, heat_residual, p, np.inf,
+                                      heat_order)
+
+    # Gas budget: it goes to the hours in which the gas saves the most
+    # costs per MWh, compared with the dispatch of the hour without gas
+    gas_budget = (_parameter(param_values, 'nom_val_gas')
+                  * _parameter(param_values, 'full_load_time_max_gas'))
+    gas = results['rgas', 'natural_gas']
+    if (gas.sum(axis=1) > gas_budget).any():
+        without_gas, _ = _dispatch(el_residual, heat_residual, p, 0,
+                                   heat_order)
+        savings = (_hourly_costs(without_gas, param_values)
+                   - _hourly_costs(results, param_values))
+        value = np.divide(savings, gas, out=np.zeros_like(gas),
+                          where=gas > 0)
+        order = np.argsort(-value, axis=1, kind='stable')
+        gas_left = np.empty_like(gas)
+        np.put_along_axis(gas_left, order, np.diff(np.minimum(
+            np.cumsum(np.take_along_axis(gas, order, axis=1), axis=1),
+            gas_budget[:, np.newaxis]), prepend=0, axis=1), axis=1)
+        results, hp_purchased = _dispatch(el_residual, heat_residual, p,
+                                          gas_left, heat_order)
+
+    # The storages shift surplus heat and electricity to the hours with
+    # the most expensive supply. The thermal storage goes first, it can
+    # replace heat pumps run with purchased electricity.
+    contents = {}
+    for storage, (bus, _, _, _) in sorted(storages.items(), reverse=True):
+        s = _storage_parameters(param_values, storage)
+        if not s['size'].any():
+            contents[storage] = np.tile(s['initial'][:, np.newaxis],
+                                        (1, n + 1))
+            results[bus, storage] = np.zeros((len(param_values), n))
+            results[storage, bus] = np.zeros((len(param_values), n))
+            continue
+
+        excess_key = (bus, 'excess_bel' if bus == 'electricity'
+                      else 'excess_bth')
+        shortage_key = ('shortage_bel' if bus == 'electricity'
+                        else 'shortage_bth', bus)
+        need = results[shortage_key]
+        if bus == 'heat':
+            # Boilers and heat pumps run with purchased electricity can be
+            # replaced as well
+            need = need + results['boiler', 'heat'] + hp_purchased
+        charged, discharged, contents[storage] = _storage_operation(
+            s, results[excess_key], need)
+
+        results[bus, storage] = charged
+        results[storage, bus] = discharged
+        # The charge beyond the surplus is purchased, the discharge beyond
+        # the need goes to the excess
+        from_surplus = np.minimum(charged, results[excess_key])
+        used = np.minimum(discharged, need)
+        results[excess_key] = (results[excess_key] - from_surplus
+                               + discharged - used)
+        results[shortage_key] = results[shortage_key] + charged - from_surplus
+        rest = used
+        if bus == 'heat':
+            for option in reversed(heat_order):
+                if option == 'shortage':
+                    rest = _displace(results, rest, shortage_key)
+                elif option == 'boiler':
+                    rest = _displace(results, rest, ('boiler', 'heat'),
+                                     ('natural_gas', 'boiler'))
+                else:
+                    reduced = np.minimum(hp_purchased, rest)
+                    hp_purchased = hp_purchased - reduced
+                    rest = rest - reduced
+                    results['heat_pump', 'heat'] = (
+                        results['heat_pump', 'heat'] - reduced)
+                    results['electricity', 'heat_pump'] = (
+                        results['electricity', 'heat_pump'] - reduced
+                        / p['cop'])
+                    results['shortage_bel', 'electricity'] = (
+                        results['shortage_bel', 'electricity'] - reduced
+                        / p['cop'])
+            results['rgas', 'natural_gas'] = (results['natural_gas', 'chp']
+                                              + results['natural_gas',
+                                                        'boiler'])
+        else:
+            _displace(results, rest, shortage_key)
+
+    results = {key: np.broadcast_to(value, (len(param_values), n))
+               for key, value in results.items()}
+    results.update(feed_in)
+    results['electricity', 'demand_el'] = demand_el
+    results['heat', 'demand_th'] = demand_th
+    return results, contents
+
+
+def _hourly_costs(results, param_values):
+    """Return the variable costs of every hour of the simulated designs."""
+    costs = {('rgas', 'natural_gas'): 'var_costs_gas',
+             ('shortage_bel', 'electricity'): 'var_costs_shortage_bel',
+             ('shortage_bth', 'heat'): 'var_costs_shortage_bth',
+             ('electricity', 'excess_bel'): 'var_costs_excess_bel',
+             ('heat', 'excess_bth'): 'var_costs_excess_bth'}
+    return sum(results[key] * _parameter(param_values, name)[:, np.newaxis]
+               for key, name in costs.items())
+
+
+def objectives(results, param_values):
+    """Return the variable costs of the simulated designs (LP objective)."""
+    return _hourly_costs(results, param_values).sum(axis=1)
+
+
+def end_level_deviation(contents, param_values):
+    """Return the largest deviation of a storage from its initial level at
+    the end, in % of its size, for every design."""
+    deviation = np.zeros(len(param_values))
+    for storage, content in contents.items():
+        s = _storage_parameters(param_values, storage)
+        deviation = np.maximum(deviation, np.divide(
+            np.abs(content[:, -1] - s['initial']) * 100, s['size'],
+            out=np.zeros(len(param_values)), where=s['size'] > 0))
+    return deviation
+
+
+def flow_sums(results, design):
+    """Return the annual sums of the flows of one simulated design."""
+    return {key: float(value[design].sum()) for key, value in results.items()}
+
+
+def has_component(param_value, label):
+    """Return True if create_energy_system adds the component of label."""
+    name = _design_parameter.get(label)
+    return name is None or param_value[name] > 0
+
+
+def string_results(results, contents, param_value, design,
+                   number_of_time_steps):
+    """Return the results of one design like solph.processing.results.
+
+    The keys are (source, target) labels, only the components of the design
+    are included. Like in oemof, the sequences have one row more than time
+    steps, the flows are NaN in the last row.
+    """
+    n = number_of_time_steps
+    index = pd.date_range('1/1/2030', periods=n + 1, freq='H')
+    string_keyed = {}
+    for (source, target), value in results.items():
+        if has_component(param_value, source) and has_component(param_value,
+                                                                target):
+            string_keyed[source, target] = {
+                'sequences': pd.DataFrame(
+                    {'flow': np.append(value[design], np.nan)}, index=index),
+                'scalars': pd.Series(dtype=float)}
+    for storage, content in contents.items():
+        if has_component(param_value, storage):
+            loss = _storage_parameters([param_value], storage)['loss'][0]
+            string_keyed[storage, None] = {
+                'sequences': pd.DataFrame(
+                    {'storage_content': content[design],
+                     'storage_losses': np.append(
+                         content[design][:-1] * loss, np.nan)},
+                    index=index),
+                'scalars': pd.Series(dtype=float)}
+    return string_keyed
+
+
+def has_fixed_dispatch(param_value):
+    """Return True if the design leaves nothing to optimise.
+
+    Without CHPs, heat pumps, boilers and storages every flow follows from
+    the demand and the fixed feed-in, the residual is purchased or excess.
+    The merit order dispatch is the optimum then, unless the variable
+    costs of purchase and excess of a bus add up to less than 0 (the LP
+    would buy and dump energy).
+    """
+    if any(param_value[name] > 0 for name in (
+            'number_of_chps', 'number_of_heat_pumps', 'number_of_boilers',
+            'capacity_electr_storage', 'capacity_thermal_storage')):
+        return False
+    return (param_value['var_costs_shortage_bel']
+            + param_value['var_costs_excess_bel'] >= 0
+            and param_value['var_costs_shortage_bth']
+            + param_value['var_costs_excess_bth'] >= 0)
+
+
+def run(param_value, data, number_of_time_steps):
+    """Simulate one design, return its results and meta results.
+
+    The meta results have the objective and, like a solve (see
+    'solver_backend.solve'), the solve info under 'solve'. For a design
+    with a fixed dispatch (see 'has_fixed_dispatch') the results are the
+    optimum, the backend is 'closed_form' and the termination 'optimal'.
+    """
+    start = time.perf_counter()
+    results, contents = simulate([param_value], data, number_of_time_steps)
+    objective = float(objectives(results, [param_value])[0])
+    solve_time = time.perf_counter() - start
+    if has_fixed_dispatch(param_value):
+        backend, termination = 'closed_form', 'optimal'
+        logging.info('The design has a fixed dispatch, computed in {0:.3f} '
+                     's, costs {1:.2f}'.format(solve_time, objective))
+    else:
+        backend, termination = 'merit_order', 'simulated'
+        logging.info('Dispatch simulated by merit order in {0:.3f} s, costs '
+                     '{1:.2f}'.format(solve_time, objective))
+    meta = {'objective': objective,
+            'solve': {'backend': backend, 'solver': None,
+                      'solve_time': solve_time, 'termination': termination}}
+    return string_results(results, contents, param_value, 0,
+                          number_of_time_steps), meta
+
+
+def node_keyed_results(string_keyed, energysystem):
+    """Replace the labels of string keyed results by the nodes."""
+    nodes = {str(node.label): node for node in energysystem.nodes}
+    return {(nodes[source], None if target is None else nodes[target]): value
+            for (source, target), value in string_keyed.items()}
+
+
+def compare_with_lp(config_path, team_numbers):
+    """Simulate and solve the teams, return the deviation of the costs.
+
+    The LP is solved with the solver of config.yml. The deviation of the
+    storages from their initial level at the end (see
+    'end_level_deviation') shows if the simulated dispatch breaks the
+    balance of the storages of the LP.
+    """
+    import oemof.solph as solph
+
+    from model_energy_system import (create_energy_system, flow_sums as
+                                     lp_flow_sums, get_number_of_time_steps)
+    import solver_backend
+
+    context = run_context.get(config_path)
+    cfg = context.cfg
+    number_of_time_steps = get_number_of_time_steps(cfg)
+
+    rows = []
+    for n in team_numbers:
+        param_value = context.parameters(n)
+        start = time.perf_counter()
+        results, contents = simulate([param_value], context.data,
+                                     number_of_time_steps)
+        simulation_time = time.perf_counter() - start
+        simulated = float(objectives(results, [param_value])[0])
+
+        model = solph.Model(create_energy_system(param_value, context.data,
+                                                 number_of_time_steps))
+        solve_info = solver_backend.solve(model, cfg['solver'],
+                                          cfg.get('solver_backend', 'shell'))
+        optimum = model.objective()
+
+        # Largest deviation of the annual sum of a flow
+        simulated_sums = flow_sums(results, 0)
+        deviation = {key: abs(simulated_sums.get(key, 0) - value)
+                     for key, value in lp_flow_sums(model).items()}
+        key = max(deviation, key=deviation.get)
+        end_level = end_level_deviation(contents, [param_value])[0]
+        rows.append({'team': n+1, 'simulated costs': simulated,
+                     'LP optimum': optimum,
+                     'deviation [%]': (simulated - optimum)
+                     / abs(optimum) * 100 if optimum else np.nan,
+                     'largest flow deviation [MWh]': deviation[key],
+                     'flow': '{0} -> {1}'.format(*key),
+                     'end level deviation [%]': end_level,
+                     'end level violated': end_level > 1e-6,
+                     'simulation time [s]': simulation_time,
+                     'solve time [s]': solve_info['solve_time']})
+
+    comparison = pd.DataFrame(rows).set_index('team')
+    logging.info('Merit order dispatch compared with the LP:\n{0}'.format(
+        comparison.to_string()))
+    return comparison
+
+
+if __name__ == '__main__':
+    from oemof.tools import logger
+
+    logger.define_logging(logfile='merit_order.log',
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+    config_path = os.path.abspath('../experiment_config/config.yml')
+    teams = [int(team) - 1 for team in sys.argv[1:]]
+    compare_with_lp(config_path, teams or range(
+        run_context.get(config_path).cfg['number_of_teams']))
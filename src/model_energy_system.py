@@ -14,52 +14,60 @@ Author: Christoph Pels Leusden, Jakob Wolf
 # Default logger of oemof
 import oemof.solph as solph
 from oemof.solph import helpers
+import instrumentation
 from oemof.tools import logger
 import logging
+import merit_order
 import os
 import pandas as pd
-import yaml
-
-
-def run_model(config_path, team_number):
-
-    with open(config_path, 'r') as ymlfile:
-        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
-
+import result_cache
+import result_extraction
+import results_store
+import rolling_horizon
+import run_context
+import solver_backend
+import time_series_aggregation
+
+
+# Design parameters of the teams. They are read from the team specific
+# parameter files, all other parameters are the same for every team.
+design_parameter_names = [
+    'number_of_windturbines',
+    'number_of_chps',
+    'number_of_boilers',
+    'number_of_PV_pp',
+    'number_of_heat_pumps',
+    'area_PV',
+    'area_solar_th',
+    'capacity_electr_storage',
+    'capacity_thermal_storage']
+
+
+def get_number_of_time_steps(cfg):
     if cfg['debug']:
-        number_of_time_steps = 3
-    else:
-        number_of_time_steps = 8760
+        return 3
+    return cfg.get('number_of_time_steps', 8760)
 
-    solver = cfg['solver']
-    debug = cfg['debug']
-    solver_verbose = cfg['solver_verbose']  # show/hide solver output
-
-    # initiate the logger (see the API docs for more information)
-    logger.define_logging(logfile='model_team_{0}.log'.format(team_number+1),
-                          screen_level=logging.INFO,
-                          file_level=logging.INFO)
 
-    logging.info('Initialize the energy system')
-    date_time_index = pd.date_range('1/1/2030', periods=number_of_time_steps,
-                                    freq='H')
+def get_dispatch_engine(cfg, param_value):
+    """Return 'lp' or 'merit_order', the engine of the dispatch of a design.
 
-    energysystem = solph.EnergySystem(timeindex=date_time_index, infer_last_interval=True)
+    Designs without converters and storages have nothing to optimise,
+    their dispatch is computed in closed form by 'merit_order'.
+    """
+    dispatch_engine = cfg.get('dispatch_engine', 'lp')
+    if dispatch_engine not in ('lp', 'merit_order'):
+        raise ValueError("'dispatch_engine' must be 'lp' or 'merit_order', "
+                         "not {0}.".format(dispatch_engine))
+    if merit_order.has_fixed_dispatch(param_value):
+        return 'merit_order'
+    return dispatch_engine
 
-    ##########################################################################
-    # Read time series and parameter values from data files
-    ##########################################################################
 
+def load_parameters(cfg, team_number):
+    """Return the merged design and general parameter values of a team."""
     abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
 
-    file_path_ts = abs_path + '/data/' + cfg[
-        'time_series_file_name']
-    data = pd.read_csv(file_path_ts)
-
-    # file_path_weather_ts = abs_path + '/data_preprocessed/' + cfg[
-    #     'weather_time_series']
-    # weather_data = pd.read_csv(file_path_weather_ts)
-
     file_name_param_01 = cfg['design_parameters_file_name'][team_number]
     file_name_param_02 = cfg['parameters_file_name']
     file_path_param_01 = (abs_path + '/data/'
@@ -69,11 +77,37 @@ def run_model(config_path, team_number):
     param_df_01 = pd.read_csv(file_path_param_01, index_col=1)
     param_df_02 = pd.read_csv(file_path_param_02, index_col=1)
     param_df = pd.concat([param_df_01, param_df_02], sort=True)
-    param_value = param_df['value']
+    return param_df['value']
 
-    ##########################################################################
-    # Create oemof object
-    ##########################################################################
+
+def create_energy_system(param_value, data, number_of_time_steps,
+                         all_technologies=False, investment=None,
+                         hours_per_time_step=1):
+    """Create the oemof energy system of a team design.
+
+    Technologies with zero units are left out, unless all_technologies is
+    True. The persistent model uses this to build one model structure that
+    fits the design of every team.
+
+    investment maps design parameters to a 'solph.Investment' of the
+    capacity of their technology (see 'investment'). These technologies
+    are always added and their capacity is optimised instead of taken from
+    the design.
+
+    hours_per_time_step is the length of the time steps of data, e.g. 24
+    for daily means (see 'rolling_horizon').
+    """
+    if investment is None:
+        investment = {}
+
+    def include(name):
+        return (all_technologies or name in investment
+                or param_value[name] > 0)
+
+    date_time_index = pd.date_range('1/1/2030', periods=number_of_time_steps,
+                                    freq='{0}H'.format(hours_per_time_step))
+
+    energysystem = solph.EnergySystem(timeindex=date_time_index, infer_last_interval=True)
 
     logging.info('Create oemof objects')
 
@@ -108,12 +142,14 @@ def run_model(config_path, team_number):
             full_load_time_max=param_value['full_load_time_max_gas'],
             variable_costs=param_value['var_costs_gas'])}))
 
-    if param_value['number_of_windturbines'] > 0:
+    if include('number_of_windturbines'):
         energysystem.add(solph.components.Source(
         label='wind_turbine',
         outputs={bel: solph.Flow(
             fix=data['Wind_power [kW/unit]'],
-            nominal_value = 0.001 * param_value['number_of_windturbines']
+            nominal_value=investment.get(
+                'number_of_windturbines',
+                0.001 * param_value['number_of_windturbines'])
             )},))
 
     energysystem.add(solph.components.Sink(
@@ -129,131 +165,351 @@ def run_model(config_path, team_number):
             nominal_value=1)}))
 
     # Open-field photovoltaic power plant
-    if param_value['number_of_PV_pp'] > 0:
+    if include('number_of_PV_pp'):
         energysystem.add(solph.components.Source(
             label='PV_pp',
             outputs={bel: solph.Flow(
-                fix=(data['Sol_irradiation [Wh/sqm]'] * 0.000001
-                              * param_value['eta_PV']),  # [MWh/m²]
-                nominal_value=param_value['PV_pp_surface_area']*10000  # [m²]
+                fix=run_context.solar_yield(data, param_value,
+                                            'eta_PV'),  # [MWh/m²]
+                nominal_value=investment.get(
+                    'number_of_PV_pp',
+                    param_value['PV_pp_surface_area']*10000)  # [m²]
                 )}))
 
     # Rooftop photovoltaic
-    if param_value['area_PV'] > 0:
+    if include('area_PV'):
         energysystem.add(solph.components.Source(
             label='PV',
             outputs={bel: solph.Flow(
-                fix=(data['Sol_irradiation [Wh/sqm]'] * 0.000001
-                              * param_value['eta_PV']),  # [MWh/m²]
-                nominal_value=param_value['area_PV']*10000  # [m²]
+                fix=run_context.solar_yield(data, param_value,
+                                            'eta_PV'),  # [MWh/m²]
+                nominal_value=investment.get(
+                    'area_PV', param_value['area_PV']*10000)  # [m²]
                 )}))
 
     # Rooftop solar thermal
-    if param_value['area_solar_th'] > 0:
+    if include('area_solar_th'):
         energysystem.add(solph.components.Source(
             label='solar_thermal',
             outputs={bth: solph.Flow(
-                fix=(data['Sol_irradiation [Wh/sqm]'] * 0.000001
-                              * param_value['eta_solar_th']),  # [MWh/m²]
-                nominal_value=param_value['area_solar_th']*10000  # [m²]
+                fix=run_context.solar_yield(data, param_value,
+                                            'eta_solar_th'),  # [MWh/m²]
+                nominal_value=investment.get(
+                    'area_solar_th',
+                    param_value['area_solar_th']*10000)  # [m²]
                 )}))
 
-    if param_value['number_of_chps'] > 0:
+    if include('number_of_chps'):
         energysystem.add(solph.components.Converter(
             label='chp',
             inputs={
                 bgas: solph.Flow()},
             outputs={
                 bth: solph.Flow(
-                    nominal_value=param_value['number_of_chps']*0.5),  # [MW]
+                    nominal_value=investment.get(
+                        'number_of_chps',
+                        param_value['number_of_chps']*0.5)),  # [MW]
                 bel: solph.Flow()},
             conversion_factors={
                 bth: param_value['conversion_factor_bth_chp'],
                 bel: param_value['conversion_factor_bel_chp']}))
 
-    if param_value['number_of_heat_pumps'] > 0:
+    if include('number_of_heat_pumps'):
         energysystem.add(solph.components.Converter(
             label='heat_pump',
             inputs={bel: solph.Flow()},
             outputs={bth: solph.Flow(
-                nominal_value=(param_value['number_of_heat_pumps']
-                               * param_value['heatpump_heat_output']))},  # [MW]
+                nominal_value=investment.get(
+                    'number_of_heat_pumps',
+                    (param_value['number_of_heat_pumps']
+                     * param_value['heatpump_heat_output'])))},  # [MW]
             conversion_factors={bth: param_value['COP_heat_pump']}))
 
-    if param_value['number_of_boilers'] > 0:
+    if include('number_of_boilers'):
         energysystem.add(solph.components.Converter(
             label='boiler',
             inputs={bgas: solph.Flow()},
             outputs={bth: solph.Flow(
-                nominal_value=param_value['number_of_boilers']*3)},  # [MW]
+                nominal_value=investment.get(
+                    'number_of_boilers',
+                    param_value['number_of_boilers']*3))},  # [MW]
             conversion_factors={bth: param_value['conversion_factor_boiler']}))
 
-    if param_value['capacity_thermal_storage'] > 0:
-        storage_th = solph.components.GenericStorage(
-            nominal_storage_capacity=(param_value['capacity_thermal_storage']
-                              * param_value['daily_demand_th']),
-            label='storage_th',
-            inputs={bth: solph.Flow(
-                nominal_value=(param_value['capacity_thermal_storage']
-                               * param_value['daily_demand_th']
-                               / param_value['charge_time_storage_th']))},
-            outputs={bth: solph.Flow(
-                nominal_value=(param_value['capacity_thermal_storage']
-                               * param_value['daily_demand_th']
-                               / param_value['charge_time_storage_th']))},
-            loss_rate=param_value['capacity_loss_storage_th'],
-            initial_storage_level=param_value['init_capacity_storage_th'],
-            inflow_conversion_factor=param_value[
-                'inflow_conv_factor_storage_th'],
-            outflow_conversion_factor=param_value[
-                'outflow_conv_factor_storage_th'])
-        energysystem.add(storage_th)
-
-    if param_value['capacity_electr_storage'] > 0:
-        storage_el = solph.components.GenericStorage(
-            nominal_storage_capacity=(param_value['capacity_electr_storage']
-                              * param_value['daily_demand_el']),
-            label='storage_el',
-            inputs={bel: solph.Flow(
-                nominal_value=(param_value['capacity_electr_storage']
-                               * param_value['daily_demand_el']
-                               / param_value['charge_time_storage_el']))},
-            outputs={bel: solph.Flow(
-                nominal_value=(param_value['capacity_electr_storage']
-                               * param_value['daily_demand_el']
-                               / param_value['charge_time_storage_el']))},
-            loss_rate=param_value['capacity_loss_storage_el'],
-            initial_storage_level=param_value['init_capacity_storage_el'],
+    for label, name, bus, suffix in [
+            ('storage_th', 'capacity_thermal_storage', bth, 'th'),
+            ('storage_el', 'capacity_electr_storage', bel, 'el')]:
+        if not include(name):
+            continue
+        daily_demand = param_value['daily_demand_' + suffix]
+        charge_time = param_value['charge_time_storage_' + suffix]
+        if name in investment:
+            # The power of the storage follows its capacity by the charge
+            # time
+            capacity = investment[name]
+            investment_relations = {
+                'invest_relation_input_capacity': 1 / charge_time,
+                'invest_relation_output_capacity': 1 / charge_time}
+            inflow = solph.Flow(nominal_value=solph.Investment())
+            outflow = solph.Flow(nominal_value=solph.Investment())
+        else:
+            capacity = param_value[name] * daily_demand
+            investment_relations = {}
+            inflow = solph.Flow(nominal_value=(param_value[name]
+                                               * daily_demand / charge_time))
+            outflow = solph.Flow(nominal_value=(param_value[name]
+                                                * daily_demand / charge_time))
+        energysystem.add(solph.components.GenericStorage(
+            nominal_storage_capacity=capacity,
+            label=label,
+            inputs={bus: inflow},
+            outputs={bus: outflow},
+            loss_rate=param_value['capacity_loss_storage_' + suffix],
+            initial_storage_level=param_value[
+                'init_capacity_storage_' + suffix],
             inflow_conversion_factor=param_value[
-                'inflow_conv_factor_storage_el'],
+                'inflow_conv_factor_storage_' + suffix],
             outflow_conversion_factor=param_value[
-                'outflow_conv_factor_storage_el'])
-        energysystem.add(storage_el)
+                'outflow_conv_factor_storage_' + suffix],
+            **investment_relations))
+
+    return energysystem
+
+
+def flow_sums(model, weights=None):
+    """Return the sum over all time steps of every flow of a solved model.
+
+    The sums are keyed by the (source, target) labels. This is much faster
+    than 'solph.processing.results' if only annual sums are needed. weights
+    are the weights of the time steps of an aggregated model.
+    """
+    if weights is None:
+        weights = [1] * len(model.TIMESTEPS)
+    return {(str(o), str(i)): sum((model.flow[o, i, t].value or 0)
+                                  * weights[t] for t in model.TIMESTEPS)
+            for o, i in model.FLOWS}
+
+
+def dispatch_settings(cfg, param_value):
+    """Return the dispatch engine, aggregation and rolling horizon settings.
+
+    The settings of 'time_series_aggregation' and 'rolling_horizon' are
+    None if they are off or not used for the dispatch engine of the
+    design.
+    """
+    aggregation_settings = time_series_aggregation.settings(cfg)
+    rolling_horizon_settings = rolling_horizon.settings(cfg)
+    if aggregation_settings and rolling_horizon_settings:
+        raise ValueError('Time series aggregation and rolling horizon '
+                         'cannot be used together.')
+    dispatch_engine = get_dispatch_engine(cfg, param_value)
+    if dispatch_engine == 'merit_order':
+        # The whole year is simulated in milliseconds
+        aggregation_settings = rolling_horizon_settings = None
+    return dispatch_engine, aggregation_settings, rolling_horizon_settings
+
+
+def design_cache_key(cfg, param_value, file_path_ts):
+    """Return the key of the result cache of a design, see 'result_cache'."""
+    dispatch_engine, aggregation_settings, rolling_horizon_settings = (
+        dispatch_settings(cfg, param_value))
+    return result_cache.cache_key(param_value, file_path_ts, cfg['solver'],
+                                  get_number_of_time_steps(cfg),
+                                  aggregation=aggregation_settings,
+                                  rolling_horizon=rolling_horizon_settings,
+                                  dispatch_engine=dispatch_engine,
+                                  solver_backend=cfg.get('solver_backend',
+                                                         'shell'))
+
+
+def model_results(model, results_format='oemof', aggregation=None):
+    """Return the results and meta results of a solved model.
+
+    The results of a model on typical periods are expanded to the full year
+    first. For the columnar format the results are taken from the variable
+    values in bulk, see 'result_extraction', without the DataFrames of
+    'solph.processing'.
+    """
+    if results_format == 'columnar' and model.dual is None:
+        results = result_extraction.extract_results(model)
+    else:
+        results = solph.processing.results(model)
+    if aggregation is not None:
+        results = time_series_aggregation.expand_results(results,
+                                                         aggregation)
+
+    meta = solph.processing.meta_results(model)
+    # Backend and time of the solve, see 'solver_backend.solve'
+    if hasattr(model, 'solve_info'):
+        meta['solve'] = model.solve_info
+    return results, meta
+
+
+def store_results(energysystem, model, team_number, results_format='oemof',
+                  aggregation=None):
+    """Store the results of the solved model of a team.
+
+    See 'results_store' for the available results formats and
+    'model_results' for the results.
+    """
+    logging.info('Store the energy system with the results.')
+
+    results, meta = model_results(model, results_format, aggregation)
+    results_store.store_results(
+        energysystem,
+        results=results,
+        meta=meta,
+        team_number=team_number,
+        results_format=results_format)
+
+
+def solve_design(cfg, param_value, data, results_format='oemof',
+                 team_number=None):
+    """Optimise the dispatch of a design in memory.
+
+    The dispatch engine, time series aggregation and rolling horizon are
+    taken from cfg like in 'run_model'. Returns the energy system, the
+    results and the meta results as 'results_store.store_results' takes
+    them. The energy system is None if the dispatch is simulated by merit
+    order and the results are columnar, the results are string keyed then.
+    team_number only names the LP file of the debug mode.
+    """
+    number_of_time_steps = get_number_of_time_steps(cfg)
+    solver = cfg['solver']
+    solver_verbose = cfg['solver_verbose']  # show/hide solver output
+    backend = cfg.get('solver_backend', 'shell')
+
+    dispatch_engine, aggregation_settings, rolling_horizon_settings = (
+        dispatch_settings(cfg, param_value))
+
+    # Dispatch by merit order instead of an optimisation
+    if dispatch_engine == 'merit_order':
+        with instrumentation.timer('solve'):
+            results, meta = merit_order.run(param_value, data,
+                                            number_of_time_steps)
+        instrumentation.record_solve(meta['solve'])
+        energysystem = None
+        if results_format == 'oemof':
+            # The dump holds the energy system with the results
+            energysystem = create_energy_system(param_value, data,
+                                                number_of_time_steps)
+            results = merit_order.node_keyed_results(results, energysystem)
+        return energysystem, results, meta
+
+    # Long time series are solved window by window
+    if rolling_horizon_settings is not None:
+        with instrumentation.timer('solve'):
+            energysystem, results, meta = rolling_horizon.solve(
+                param_value, data, number_of_time_steps,
+                *rolling_horizon_settings, solver=solver, backend=backend,
+                solver_verbose=solver_verbose)
+        instrumentation.record_solve(meta['solve'])
+        return energysystem, results, meta
+
+    # Preview mode: the model is built on typical periods only
+    aggregation = None
+    if aggregation_settings is not None:
+        with instrumentation.timer('aggregate time series'):
+            aggregation = time_series_aggregation.aggregate(
+                data, number_of_time_steps, *aggregation_settings)
+        logging.info('Time series representation error:\n{0}'.format(
+            time_series_aggregation.representation_error(data, aggregation)))
+        data = aggregation['data']
+        number_of_time_steps = len(data)
+
+    ##########################################################################
+    # Create oemof object
+    ##########################################################################
+
+    with instrumentation.timer('build energy system'):
+        energysystem = create_energy_system(param_value, data,
+                                            number_of_time_steps)
 
     ##########################################################################
-    # Optimise the energy system and plot the results
+    # Optimise the energy system
     ##########################################################################
 
     logging.info('Optimise the energy system')
 
-    model = solph.Model(energysystem)
+    with instrumentation.timer('build model'):
+        if aggregation is None:
+            model = solph.Model(energysystem)
+        else:
+            model = time_series_aggregation.create_model(energysystem,
+                                                         aggregation)
 
-    if debug:
+    if cfg['debug'] and team_number is not None:
         filename = os.path.join(
             helpers.extend_basic_path('lp_files'), 'model_team_{0}.lp'.format(team_number+1))
         logging.info('Store lp-file in {0}.'.format(filename))
         model.write(filename, io_options={'symbolic_solver_labels': True})
 
     # if tee_switch is true solver messages will be displayed
-    logging.info('Solve the optimization problem of team {0}'.format(team_number+1))
-    model.solve(solver=solver, solve_kwargs={'tee': solver_verbose})
+    with instrumentation.timer('solve'):
+        solve_info = solver_backend.solve(model, solver, backend,
+                                          solver_verbose)
+    instrumentation.record_solve(solve_info)
 
-    logging.info('Store the energy system with the results.')
+    with instrumentation.timer('extract results'):
+        results, meta = model_results(model, results_format, aggregation)
+    return energysystem, results, meta
+
+
+def run_model(config_path, team_number):
+
+    # Configuration, time series and general parameters are loaded once
+    # per run, see 'run_context'
+    with instrumentation.timer('run context'):
+        context = run_context.get(config_path)
+    cfg = context.cfg
+
+    results_format = cfg.get('results_format', 'oemof')
 
-    energysystem.results['main'] = solph.processing.results(model)
-    energysystem.results['meta'] = solph.processing.meta_results(model)
+    # initiate the logger (see the API docs for more information)
+    logger.define_logging(logfile='model_team_{0}.log'.format(team_number+1),
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    logging.info('Initialize the energy system')
+
+    ##########################################################################
+    # Read time series and parameter values from data files
+    ##########################################################################
 
-    energysystem.dump(dpath=abs_path + "/results/optimisation_results/dumps",
-                      filename="model_team_{0}.oemof".format(team_number+1))
+    file_path_ts = context.file_path_ts
 
+    # file_path_weather_ts = abs_path + '/data_preprocessed/' + cfg[
+    #     'weather_time_series']
+    # weather_data = pd.read_csv(file_path_weather_ts)
+
+    with instrumentation.timer('read parameters'):
+        param_value = context.parameters(team_number)
+
+    ##########################################################################
+    # Reuse the results of an unchanged design
+    ##########################################################################
+
+    use_result_cache = cfg.get('result_cache', False)
+    if use_result_cache:
+        key = design_cache_key(cfg, param_value, file_path_ts)
+        with instrumentation.timer('result cache'):
+            cached = result_cache.load(key, team_number, results_format)
+        if cached:
+            instrumentation.count('result cache hits')
+            logging.info('Design of team {0} is unchanged, results are '
+                         'taken from the result cache.'.format(team_number+1))
+            return
+
+    logging.info('Solve the optimization problem of team {0}'.format(
+        team_number+1))
+    energysystem, results, meta = solve_design(
+        cfg, param_value, context.data, results_format,
+        team_number=team_number)
+
+    logging.info('Store the energy system with the results.')
+    with instrumentation.timer('store results'):
+        results_store.store_results(energysystem, results, meta,
+                                    team_number, results_format)
 
+    if use_result_cache:
+        result_cache.store(key, team_number, results_format,
+                           max_size_mb=cfg.get('result_cache_size_mb', 200))
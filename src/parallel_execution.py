@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Run the optimisation of several teams in parallel worker processes.
+
+Each team is built, solved and dumped by 'run_model' in its own worker
+process. The workers read the configuration, the time series and the
+general parameters from the run context of the main process (see
+'run_context'). Log files, dumps and the statistics of the stages (see
+'instrumentation') are named after the team number, so the workers do not
+interfere with each other. A team whose optimisation fails
+is reported, the remaining teams are solved anyway.
+
+"""
+
+import concurrent.futures
+import logging
+import os
+import traceback
+
+import instrumentation
+from model_energy_system import run_model
+from persistent_model import run_persistent_model
+import run_context
+
+
+def number_of_workers(setting, number_of_jobs):
+    """Translate the 'parallel_workers' setting into a number of processes.
+
+    'auto' (or None) uses one worker per CPU core. The result is limited
+    to the number of jobs, more workers than jobs would only idle.
+    """
+    if setting is None or setting == 'auto':
+        workers = os.cpu_count() or 1
+    else:
+        workers = int(setting)
+        if workers < 1:
+            raise ValueError(
+                "'parallel_workers' must be 'auto' or a positive integer, "
+                "not {0}.".format(setting))
+
+    return max(1, min(workers, number_of_jobs))
+
+
+def _team_done(on_team_done, n, failed_teams):
+    """Call on_team_done for team n, record an error as a failed team."""
+    if on_team_done is None:
+        return
+    try:
+        on_team_done(n)
+    except Exception:
+        failed_teams[n] = traceback.format_exc()
+        logging.error('Analysis of team {0} failed:\n{1}'.format(
+            n+1, failed_teams[n]))
+
+
+def run_models(config_path, team_numbers, workers=1, persistent=False,
+               on_team_done=None):
+    """Optimise the energy systems of several teams.
+
+    With one worker the teams are solved one after another in this process,
+    otherwise every team is sent to a process pool. If persistent is True,
+    each process builds one model and reuses it for all its teams.
+    on_team_done is called in this process with the team number as soon as
+    the optimisation of a team succeeded, e.g. to analyse it while the
+    other teams are still solved. An error in on_team_done fails only this
+    team.
+
+    Returns a dict with the team numbers that failed as keys and the
+    traceback of the error as values. It is empty if all teams succeeded.
+    """
+    failed_teams = {}
+
+    if persistent:
+        run = run_persistent_model
+    else:
+        run = run_model
+
+    if workers == 1:
+        for n in team_numbers:
+            try:
+                instrumentation.run_team(run, config_path=config_path,
+                                         team_number=n)
+            except Exception:
+                failed_teams[n] = traceback.format_exc()
+                logging.error('Optimisation of team {0} failed:\n{1}'.format(
+                    n+1, failed_teams[n]))
+            else:
+                _team_done(on_team_done, n, failed_teams)
+        return failed_teams
+
+    # The workers share the inputs of the run, the time series is not
+    # copied into every worker
+    with run_context.share(run_context.get(config_path)) as shared_context, \
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=run_context.attach,
+                initargs=shared_context) as executor:
+        futures = {
+            executor.submit(instrumentation.run_team, run,
+                            config_path=config_path, team_number=n): n
+            for n in team_numbers}
+        for future in concurrent.futures.as_completed(futures):
+            n = futures[future]
+            try:
+                future.result()
+            except Exception:
+                failed_teams[n] = traceback.format_exc()
+                logging.error('Optimisation of team {0} failed:\n{1}'.format(
+                    n+1, failed_teams[n]))
+            else:
+                logging.info('Optimisation of team {0} finished.'.format(n+1))
+                _team_done(on_team_done, n, failed_teams)
+
+    return failed_teams
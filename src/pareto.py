@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Cost/emission Pareto front of the investment optimisation.
+
+The front is the reference of what is achievable on the cost/CO2 plane of
+the results plot: for a series of emission caps, the cost-optimal design
+of the investment model (see 'investment') that emits at most the cap.
+The emissions are those of 'kpi.compute_kpis' ('emission_gas',
+'emission_el' and 'emission_heat'), the cap is a mutable parameter of one
+constraint (epsilon-constraint method).
+
+First the two ends of the front are solved: the cost optimum, whose
+emissions are the highest cap, and the lowest possible emissions. The
+caps in between are split into ranges, one per worker process. Every
+worker builds the model once and walks its range from the highest cap
+down. With the 'persistent' solver backend the solver keeps the model and
+starts each solve from the last solution, so a point of the front costs a
+fraction of a cold solve.
+
+The front is written to 'pareto_front_file_name' (config.yml) in
+results/optimisation_results/tables and drawn into the results plot.
+
+Run from the folder 'src':
+
+    python pareto.py [path of the investment specification]
+
+"""
+
+import concurrent.futures
+import csv
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from oemof.tools import logger
+from pyomo.environ import Constraint, Objective, Param, minimize
+import yaml
+
+import investment
+from parallel_execution import number_of_workers
+from plotting import pareto_front_file_path
+import solver_backend
+from sweep import kpi_columns, pareto_front
+
+# Emission factor of the flows with emissions, as in 'kpi.compute_kpis'
+emission_factors = {
+    ('natural_gas', 'chp'): 'emission_gas',
+    ('natural_gas', 'boiler'): 'emission_gas',
+    ('shortage_bel', 'electricity'): 'emission_el',
+    ('shortage_bth', 'heat'): 'emission_heat'}
+
+
+def emissions_expression(model, param_value, weights=None):
+    """Return the annual emissions [kg/a] of a model as an expression."""
+    if weights is None:
+        weights = [1] * len(model.TIMESTEPS)
+    return sum(model.flow[o, i, t] * weights[t]
+               * param_value[emission_factors[str(o), str(i)]]
+               for o, i in model.FLOWS
+               if (str(o), str(i)) in emission_factors
+               for t in model.TIMESTEPS)
+
+
+def add_emission_cap(model, param_value, cap, weights=None):
+    """Limit the emissions of a model to the mutable parameter
+    'model.emission_cap'."""
+    model.emission_cap = Param(mutable=True, initialize=cap)
+    model.emission_cap_constr = Constraint(
+        expr=emissions_expression(model, param_value, weights)
+        <= model.emission_cap)
+
+
+def _setup(config_path, spec_path):
+    with open(spec_path, 'r', encoding='utf-8') as ymlfile:
+        spec = yaml.load(ymlfile, Loader=yaml.CLoader)
+    inputs = investment.prepare(config_path, spec)
+    model = investment.build_model(
+        inputs['param_value'], inputs['data'],
+        inputs['number_of_time_steps'], spec['technologies'],
+        inputs['aggregation'])
+    return spec, inputs, model
+
+
+def solver_backend_name(spec, cfg):
+    """Return the solver backend of the front.
+
+    'pareto_solver_backend' of the specification, by default 'persistent'
+    if the solver of config.yml supports it and 'solver_backend' of
+    config.yml otherwise.
+    """
+    backend = spec.get('pareto_solver_backend')
+    if backend is None:
+        if solver_backend.supports_in_memory(cfg['solver']):
+            backend = 'persistent'
+        else:
+            backend = cfg.get('solver_backend', 'shell')
+    return backend
+
+
+def _solve(model, spec, inputs, emission_cap=None):
+    """Solve a model, return its row of the front (None if infeasible)."""
+    cfg = inputs['cfg']
+    solve_info = solver_backend.solve(
+        model, cfg['solver'], solver_backend_name(spec, cfg),
+        cfg['solver_verbose'])
+    if solve_info['termination'] != 'optimal':
+        logging.warning('Emission cap {0}: the optimisation ended with '
+                        'termination condition {1}'.format(
+                            emission_cap, solve_info['termination']))
+        return None
+
+    design, kpis = investment.design_kpis(model, inputs,
+                                          spec['technologies'])
+    row = {'emission_cap': emission_cap}
+    row.update(design.to_dict())
+    row.update({name: kpis[name] for name in kpi_columns})
+    row['solve_time'] = solve_info['solve_time']
+    return row
+
+
+def solve_end(config_path, spec_path, objective):
+    """Solve one end of the front, objective 'costs' or 'emissions'."""
+    spec, inputs, model = _setup(config_path, spec_path)
+    if objective == 'emissions':
+        model.objective.deactivate()
+        model.emission_objective = Objective(
+            expr=emissions_expression(model, inputs['param_value'],
+                                      inputs['weights']),
+            sense=minimize)
+    return _solve(model, spec, inputs)
+
+
+def solve_caps(config_path, spec_path, emission_caps):
+    """Solve the cost optimum of every emission cap of a range.
+
+    The caps are solved in the given order with one model, each solve
+    starts from the solution of the last cap.
+    """
+    spec, inputs, model = _setup(config_path, spec_path)
+    add_emission_cap(model, inputs['param_value'], emission_caps[0],
+                     inputs['weights'])
+    rows = []
+    for emission_cap in emission_caps:
+        model.emission_cap = emission_cap
+        row = _solve(model, spec, inputs, emission_cap)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def _write_front(rows, file_path):
+    columns = list(rows[0])
+    # Written next to the table and renamed, the plot never reads a half
+    # written front
+    tmp_file_path = '{0}.{1}.tmp'.format(file_path, os.getpid())
+    with open(tmp_file_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_file_path, file_path)
+
+
+def run_pareto(config_path, spec_path):
+    """Compute the cost/emission Pareto front, return its rows."""
+    with open(spec_path, 'r', encoding='utf-8') as ymlfile:
+        spec = yaml.load(ymlfile, Loader=yaml.CLoader)
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    logger.define_logging(logfile='pareto.log', screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    backend = solver_backend_name(spec, cfg)
+    logging.info("Pareto front solved with solver '{0}' and solver backend "
+                 "'{1}'{2}".format(cfg['solver'], backend,
+                                   ', every point starts from the last '
+                                   'solution' if backend == 'persistent'
+                                   else ''))
+
+    start = time.perf_counter()
+    number_of_points = spec.get('pareto_points', 30)
+    workers = number_of_workers(spec.get('pareto_workers', 'auto'),
+                                number_of_jobs=max(number_of_points - 1, 1))
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(workers, 2)) as executor:
+        # Both ends at the same time
+        cost_optimum, lowest_emissions = executor.map(
+            solve_end, [config_path] * 2, [spec_path] * 2,
+            ['costs', 'emissions'])
+        if cost_optimum is None or lowest_emissions is None:
+            raise RuntimeError('The ends of the Pareto front could not be '
+                               'solved, see pareto.log.')
+        highest_cap = cost_optimum['emissions']
+        lowest_cap = lowest_emissions['emissions']
+        logging.info('Emissions from {0:.2f} t/a (cost optimum) down to '
+                     '{1:.2f} t/a'.format(highest_cap / 1000,
+                                          lowest_cap / 1000))
+
+        # The lowest cap is a little above the lowest emissions, so the
+        # solver does not fail on rounding errors
+        emission_caps = np.linspace(highest_cap, lowest_cap,
+                                    number_of_points)[1:]
+        emission_caps[-1] += 1e-6 * max(highest_cap, 1)
+        ranges = [list(caps) for caps in np.array_split(
+            emission_caps, min(workers, len(emission_caps))) if len(caps)]
+        rows = [dict(cost_optimum, emission_cap=highest_cap)]
+        for range_rows in executor.map(solve_caps,
+                                       [config_path] * len(ranges),
+                                       [spec_path] * len(ranges), ranges):
+            rows.extend(range_rows)
+
+    # Points of degenerate caps may be dominated by their neighbours
+    mask = pareto_front([row['total_costs'] for row in rows],
+                        [row['emissions'] for row in rows])
+    rows = sorted((row for row, on_front in zip(rows, mask) if on_front),
+                  key=lambda row: row['total_costs'])
+
+    file_path = pareto_front_file_path(cfg)
+    _write_front(rows, file_path)
+    logging.info('Pareto front of {0} points in {1:.1f} s ({2:.2f} s solver '
+                 'time per point), written to {3}'.format(
+                     len(rows), time.perf_counter() - start,
+                     np.mean([row['solve_time'] for row in rows]),
+                     file_path))
+    return rows
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        investment_spec_path = os.path.abspath(sys.argv[1])
+    else:
+        investment_spec_path = os.path.abspath(
+            '../experiment_config/investment.yml')
+    run_pareto(config_path=os.path.abspath('../experiment_config/config.yml'),
+               spec_path=investment_spec_path)
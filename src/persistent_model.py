@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Persistent optimisation model for the rounds of the workshop.
+
+The linear program of every team has the same structure, only the
+capacities of the technologies differ. In persistent mode the oemof model
+is built once with all technologies. Before a team is solved, the bounds
+of the flow and storage content variables are set to the capacities of
+the team's design. Technologies that a team did not choose get a capacity
+of zero.
+
+The model stays alive in the process that built it, so every worker of
+the parallel mode builds it only once for all the teams it solves.
+
+"""
+
+import logging
+import os
+
+import oemof.solph as solph
+from oemof.tools import logger
+
+from model_energy_system import (create_energy_system, design_cache_key,
+                                 design_parameter_names, get_dispatch_engine,
+                                 get_number_of_time_steps, run_model,
+                                 store_results)
+import instrumentation
+import result_cache
+import rolling_horizon
+import run_context
+import solver_backend
+import time_series_aggregation
+import time_series_store
+
+# Model of this process and the key of the inputs it was built from
+_persistent_model = {'key': None, 'model': None, 'data': None}
+
+
+def update_capacities(model, energysystem):
+    """Set the capacities of a team's energy system in the model.
+
+    The model must contain all technologies of the energy system. Flows
+    and storages of the model that are missing in the energy system are
+    set to a capacity of zero.
+    """
+    team_flows = {(str(o), str(i)): flow
+                  for (o, i), flow in energysystem.flows().items()}
+
+    for o, i in model.FLOWS:
+        flow = model.flows[o, i]
+        if flow.nominal_value is None:
+            continue
+        team_flow = team_flows.get((str(o), str(i)))
+        if team_flow is None:
+            nominal_value = 0
+        else:
+            nominal_value = team_flow.nominal_value
+
+        if flow.fix[model.TIMESTEPS.at(1)] is not None:
+            for t in model.TIMESTEPS:
+                model.flow[o, i, t].fix(flow.fix[t] * nominal_value)
+        else:
+            for t in model.TIMESTEPS:
+                model.flow[o, i, t].setlb(flow.min[t] * nominal_value)
+                model.flow[o, i, t].setub(flow.max[t] * nominal_value)
+
+    team_storages = {
+        str(n): n for n in energysystem.nodes
+        if isinstance(n, solph.components.GenericStorage)}
+
+    block = model.GenericStorageBlock
+    for n in block.STORAGES:
+        team_storage = team_storages.get(str(n))
+        if team_storage is None:
+            capacity = 0
+        else:
+            capacity = team_storage.nominal_storage_capacity
+
+        for t in model.TIMEPOINTS:
+            block.storage_content[n, t].setlb(
+                capacity * n.min_storage_level[t])
+            block.storage_content[n, t].setub(
+                capacity * n.max_storage_level[t])
+        if n.initial_storage_level is not None:
+            block.storage_content[n, 0].fix(
+                n.initial_storage_level * capacity)
+
+
+def get_persistent_model(param_value, file_path_ts, number_of_time_steps,
+                         data=None):
+    """Return the model of this process, build it if the inputs changed.
+
+    The model is rebuilt if the time series, the general parameters or the
+    number of time steps differ from the ones it was built with. data is
+    the time series of file_path_ts if it is already loaded.
+    """
+    general_param_value = param_value.drop(design_parameter_names,
+                                           errors='ignore')
+    key = (file_path_ts, os.path.getmtime(file_path_ts),
+           number_of_time_steps, tuple(sorted(general_param_value.items())))
+
+    if _persistent_model['key'] != key:
+        logging.info('Build the persistent model with all technologies')
+        if data is None:
+            data = time_series_store.read_time_series(file_path_ts)
+        energysystem = create_energy_system(param_value, data,
+                                            number_of_time_steps,
+                                            all_technologies=True)
+        _persistent_model.update(key=key, model=solph.Model(energysystem),
+                                 data=data)
+
+    return _persistent_model['model'], _persistent_model['data']
+
+
+def run_persistent_model(config_path, team_number):
+    """Optimise the energy system of a team with the persistent model.
+
+    Same inputs and outputs as 'model_energy_system.run_model'.
+    """
+    with instrumentation.timer('run context'):
+        context = run_context.get(config_path)
+    cfg = context.cfg
+
+    # Models on typical periods or windows are small, they are built for
+    # every team. The merit order dispatch has no model.
+    if (time_series_aggregation.settings(cfg) is not None
+            or rolling_horizon.settings(cfg) is not None
+            or get_dispatch_engine(
+                cfg, context.parameters(team_number)) != 'lp'):
+        return run_model(config_path, team_number)
+
+    number_of_time_steps = get_number_of_time_steps(cfg)
+
+    solver = cfg['solver']
+    solver_verbose = cfg['solver_verbose']  # show/hide solver output
+    backend = cfg.get('solver_backend', 'shell')
+    results_format = cfg.get('results_format', 'oemof')
+
+    logger.define_logging(logfile='model_team_{0}.log'.format(team_number+1),
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    file_path_ts = context.file_path_ts
+
+    with instrumentation.timer('read parameters'):
+        param_value = context.parameters(team_number)
+
+    use_result_cache = cfg.get('result_cache', False)
+    if use_result_cache:
+        key = design_cache_key(cfg, param_value, file_path_ts)
+        with instrumentation.timer('result cache'):
+            cached = result_cache.load(key, team_number, results_format)
+        if cached:
+            instrumentation.count('result cache hits')
+            logging.info('Design of team {0} is unchanged, results are '
+                         'taken from the result cache.'.format(team_number+1))
+            return
+
+    with instrumentation.timer('build model'):
+        model, data = get_persistent_model(param_value, file_path_ts,
+                                           number_of_time_steps,
+                                           data=context.data)
+
+    # Only the oemof objects of the team are created, no Pyomo model
+    with instrumentation.timer('build energy system'):
+        team_energysystem = create_energy_system(param_value, data,
+                                                 number_of_time_steps)
+    logging.info('Update the capacities of team {0}'.format(team_number+1))
+    with instrumentation.timer('update capacities'):
+        update_capacities(model, team_energysystem)
+
+    logging.info('Solve the optimization problem of team {0}'.format(
+        team_number+1))
+    with instrumentation.timer('solve'):
+        solve_info = solver_backend.solve(model, solver, backend,
+                                          solver_verbose)
+    instrumentation.record_solve(solve_info)
+
+    with instrumentation.timer('store results'):
+        store_results(model.es, model, team_number, results_format)
+
+    if use_result_cache:
+        result_cache.store(key, team_number, results_format,
+                           max_size_mb=cfg.get('result_cache_size_mb', 200))
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Incremental run of the stages of 'main.py'.
+
+The outputs of the workshop depend on each other like this:
+
+    parameters of team n  ->  results file of team n  ->  KPI row of team n
+    KPI rows of all teams ->  results.csv             ->  results plot
+
+Every node has a fingerprint of its inputs. After a node is computed, its
+fingerprint and the size and modification time of its output files are
+written to a manifest ('results/optimisation_results/pipeline.json'). In
+the next run a node is computed again only if its fingerprint changed or
+its output files were changed or removed in the meantime. The KPI rows
+are kept in the manifest.
+
+The fingerprints contain
+
+* results file: the key of the result cache (all parameters of the team,
+  time series, solver, number of time steps, model source, aggregation,
+  rolling horizon and dispatch engine settings) and the results format,
+* KPI row: the results file, the parameters and name of the team and the
+  source of 'analyse_energy_system' and 'kpi',
+* results.csv: the KPI rows of the teams,
+* results plot: results.csv, the workshop title, the format and
+  resolution of the plot, the Pareto front table and the source of
+  'plot_team_results' and the file 'plotting.py' (matplotlib is only
+  imported if a plot is stale),
+* dispatch plot of team n: the results file of team n and the format and
+  resolution of the plot (only with 'plot_dispatch').
+
+So if only the plot style changed, only the plot is drawn again; if only
+the parameters of one team changed, only this team is solved. The
+results of the teams are always displayed in the terminal.
+
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+
+import pandas as pd
+
+import kpi
+import result_cache
+import results_store
+import run_context
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+manifest_path = abs_path + '/results/optimisation_results/pipeline.json'
+# matplotlib is slow to import, the plotting code is fingerprinted by its
+# file and only imported to draw a stale plot
+plotting_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'plotting.py')
+tables_path = abs_path + '/results/optimisation_results/tables/'
+
+_version = 1
+
+
+def fingerprint(*parts):
+    """Return the SHA-256 hash of the string representation of parts."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(repr(part).encode())
+        hasher.update(b';')
+    return hasher.hexdigest()
+
+
+def _source(obj):
+    return inspect.getsource(obj)
+
+
+def _file_hash(file_path):
+    hasher = hashlib.sha256()
+    result_cache._hash_file(file_path, hasher)
+    return hasher.hexdigest()
+
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_manifest():
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': _version, 'nodes': {}}
+    if manifest.get('version') != _version:
+        return {'version': _version, 'nodes': {}}
+    return manifest
+
+
+def save_manifest(manifest):
+    tmp_manifest_path = '{0}.{1}.tmp'.format(manifest_path, os.getpid())
+    with open(tmp_manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest_path, manifest_path)
+
+
+def is_fresh(manifest, node, node_fingerprint):
+    """Return True if node was computed from the same inputs.
+
+    Its output files must still be the ones that were written.
+    """
+    entry = manifest['nodes'].get(node)
+    if entry is None or entry['fingerprint'] != node_fingerprint:
+        return False
+    return all(_file_signature(file_path) == signature
+               for file_path, signature in entry['outputs'].items())
+
+
+def record(manifest, node, node_fingerprint, outputs=(), value=None):
+    """Mark node as computed from node_fingerprint."""
+    manifest['nodes'][node] = {
+        'fingerprint': node_fingerprint,
+        'outputs': {file_path: _file_signature(file_path)
+                    for file_path in outputs},
+        'value': value}
+
+
+def _json_row(row):
+    """Convert a KPI row (DataFrame with one row) to JSON values."""
+    values = {}
+    for name, value in row.iloc[0].items():
+        if hasattr(value, 'item'):
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            value = None
+        values[name] = value
+    return values
+
+
+def optimisation_fingerprint(context, team_number):
+    # Imported here, it needs oemof.solph
+    from model_energy_system import design_cache_key
+
+    cfg = context.cfg
+    # Same key as in 'run_model'. The results file of another format is
+    # another output
+    return fingerprint(
+        design_cache_key(cfg, context.parameters(team_number),
+                         context.file_path_ts),
+        cfg.get('results_format', 'oemof'))
+
+
+def results_node(team_number):
+    return 'results/team_{0}'.format(team_number+1)
+
+
+def stale_teams(context, team_numbers, manifest):
+    """Return the fingerprints of the teams whose results file is stale."""
+    fingerprints = {}
+    for n in team_numbers:
+        node_fingerprint = optimisation_fingerprint(context, n)
+        if is_fresh(manifest, results_node(n), node_fingerprint):
+            logging.info('Results of team {0} are up to date.'.format(n+1))
+        else:
+            fingerprints[n] = node_fingerprint
+    return fingerprints
+
+
+def record_results(manifest, team_number, node_fingerprint, results_format):
+    """Mark the results file of a team as computed."""
+    record(manifest, results_node(team_number), node_fingerprint,
+           outputs=[results_store.results_file_path(team_number,
+                                                    results_format)])
+
+
+def optimise(config_path, team_numbers, manifest):
+    """Solve the teams whose results file is stale.
+
+    Returns the teams whose optimisation failed, see
+    'parallel_execution.run_models'.
+    """
+    from parallel_execution import number_of_workers, run_models
+
+    context = run_context.get(config_path)
+    cfg = context.cfg
+
+    fingerprints = stale_teams(context, team_numbers, manifest)
+    if not fingerprints:
+        return {}
+
+    failed_teams = run_models(
+        config_path=config_path, team_numbers=list(fingerprints),
+        workers=number_of_workers(cfg.get('parallel_workers', 1),
+                                  len(fingerprints)),
+        persistent=cfg.get('persistent_model', False))
+
+    for n, node_fingerprint in fingerprints.items():
+        if n not in failed_teams:
+            record_results(manifest, n, node_fingerprint,
+                           cfg.get('results_format', 'oemof'))
+    save_manifest(manifest)
+    return failed_teams
+
+
+def analyse(config_path, team_numbers, manifest, plot_results=True,
+            preview=False):
+    """Update the KPI rows, results.csv and the plots if they are stale.
+
+    With preview the plots are saved with the lower resolution for live
+    screens, see 'plotting'.
+    """
+    import detailed_analysis
+
+    if not team_numbers:
+        return
+
+    context = run_context.get(config_path)
+    cfg = context.cfg
+    results_format = cfg.get('results_format', 'oemof')
+    analysis_source = (_source(detailed_analysis.analyse_energy_system),
+                       _source(kpi))
+
+    records = []
+    row_fingerprints = []
+    for n in team_numbers:
+        node = 'kpis/team_{0}'.format(n+1)
+        node_fingerprint = fingerprint(
+            _file_signature(results_store.results_file_path(n,
+                                                            results_format)),
+            sorted(context.parameters(n).items()), cfg['team_names'][n],
+            analysis_source)
+        if not is_fresh(manifest, node, node_fingerprint):
+            logging.info('Analyse the results of team {0}'.format(n+1))
+            row = detailed_analysis.analyse_energy_system(
+                config_path=config_path, team_number=n)
+            record(manifest, node, node_fingerprint, value=_json_row(row))
+        records.append(manifest['nodes'][node]['value'])
+        row_fingerprints.append(node_fingerprint)
+
+    teamdata = pd.DataFrame.from_records(records, index=list(team_numbers))
+    table_fingerprint = fingerprint(row_fingerprints)
+    if not is_fresh(manifest, 'table', table_fingerprint):
+        teamdata.to_csv(detailed_analysis.results_table_path)
+        record(manifest, 'table', table_fingerprint,
+               outputs=[detailed_analysis.results_table_path])
+    else:
+        logging.info('results.csv is up to date.')
+
+    plot_source = (_file_hash(plotting_path), cfg.get('plot_format', 'png'),
+                   cfg.get('preview_plot_dpi') if preview
+                   else cfg.get('plot_dpi'))
+    plot_fingerprint = fingerprint(
+        table_fingerprint, cfg['workshop_title'],
+        _source(detailed_analysis.plot_team_results), plot_source,
+        _file_signature(tables_path + cfg.get('pareto_front_file_name',
+                                              'pareto_front.csv')))
+    if plot_results and not is_fresh(manifest, 'plot', plot_fingerprint):
+        plot_file_path = detailed_analysis.plot_team_results(
+            config_path=config_path,
+            df_basic_results_and_team_decision=teamdata, preview=preview)
+        record(manifest, 'plot', plot_fingerprint, outputs=[plot_file_path])
+    elif plot_results:
+        logging.info('The results plot is up to date.')
+
+    # Dispatch plot of every team, drawn again if its results changed
+    if plot_results and cfg.get('plot_dispatch', False):
+        for n in team_numbers:
+            node = 'dispatch/team_{0}'.format(n+1)
+            node_fingerprint = fingerprint(
+                _file_signature(results_store.results_file_path(
+                    n, results_format)),
+                cfg['team_names'][n], plot_source)
+            if not is_fresh(manifest, node, node_fingerprint):
+                record(manifest, node, node_fingerprint,
+                       outputs=detailed_analysis.plot_team_dispatch(
+                           config_path, [n], preview=preview))
+
+    save_manifest(manifest)
+    print('S i m u l a t i o n  f i n i s h e d !')
+
+
+def run(config_path):
+    """Run the enabled stages of config.yml, skip the nodes up to date."""
+    cfg = run_context.get(config_path).cfg
+    manifest = load_manifest()
+    team_numbers = list(range(cfg['number_of_teams']))
+
+    if cfg['run_model']:
+        failed_teams = optimise(config_path, team_numbers, manifest)
+        # Do not analyse outdated dumps of teams whose optimisation failed
+        for n in failed_teams:
+            logging.warning('Team {0} ({1}) is skipped in the analysis, '
+                            'its optimisation failed.'.format(
+                                n+1, cfg['team_names'][n]))
+        team_numbers = [n for n in team_numbers if n not in failed_teams]
+
+    if cfg['display_results']:
+        from basic_analysis import display_results
+        for n in team_numbers:
+            display_results(config_path=config_path, team_number=n)
+
+    if cfg['run_detailed_analysis']:
+        analyse(config_path, team_numbers, manifest)
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Plots of the results of the teams.
+
+The figures are created with the object oriented API of matplotlib, not
+with pyplot: they are not registered globally, so they are freed like any
+other object, and the style is applied only to the figures of this module
+instead of changing the global rcParams.
+
+Every process keeps one figure per plot and updates it when the results
+change: the markers of the results plot are moved by updating the offsets
+and sizes of the scatter, the labels are moved instead of drawn again. So
+redrawing the plot in the watch mode or after every team takes a fraction
+of a second. The dispatch plots of the teams are rendered one after
+another with the same figure.
+
+The output is set in config.yml: 'plot_format' ('png' or 'svg') and
+'plot_dpi'. Live redraws (watch mode, 'stream_plot') are saved with the
+lower 'preview_plot_dpi'.
+
+The cost/emission Pareto front of 'pareto' is drawn into the results plot
+as reference if its table exists.
+
+"""
+
+import contextlib
+import os
+
+import matplotlib
+from matplotlib.figure import Figure
+import matplotlib.style
+import numpy as np
+import pandas as pd
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+plots_path = abs_path + '/results/plots/'
+tables_path = abs_path + '/results/optimisation_results/tables/'
+
+red_beuth = (227/255, 35/255, 37/255)
+beuth_col_1 = (223/255, 242/255, 243/255)
+beuth_col_2 = (178/255, 225/255, 227/255)
+beuth_col_3 = (0/255, 152/255, 161/255)
+
+plot_formats = ('png', 'svg')
+
+# Flows into (producers) and out of (consumers) the buses of the dispatch
+# plots, by bus
+dispatch_flows = {
+    'electricity': {
+        'demand': 'demand_el',
+        'producers': ['wind_turbine', 'PV', 'PV_pp', 'chp', 'storage_el',
+                      'shortage_bel']},
+    'heat': {
+        'demand': 'demand_th',
+        'producers': ['solar_thermal', 'chp', 'boiler', 'heat_pump',
+                      'storage_th', 'shortage_bth']}}
+
+# Figures of this process, by plot
+_figures = {}
+
+
+@contextlib.contextmanager
+def _style():
+    """Apply the workshop style to the artists created in the block."""
+    with matplotlib.style.context('ggplot'), \
+            matplotlib.rc_context({'axes.facecolor': beuth_col_3}):
+        yield
+
+
+def plot_file_path(name, cfg):
+    """Return the path of a plot in the configured format."""
+    plot_format = cfg.get('plot_format', 'png')
+    if plot_format not in plot_formats:
+        raise ValueError("'plot_format' must be one of {0}, not {1}.".format(
+            ', '.join(plot_formats), plot_format))
+    return '{0}{1}.{2}'.format(plots_path, name, plot_format)
+
+
+def pareto_front_file_path(cfg):
+    return tables_path + cfg.get('pareto_front_file_name',
+                                 'pareto_front.csv')
+
+
+def load_pareto_front(cfg):
+    """Return the Pareto front table of 'pareto', None if there is none."""
+    file_path = pareto_front_file_path(cfg)
+    if not os.path.exists(file_path):
+        return None
+    return pd.read_csv(file_path)
+
+
+def plot_dpi(cfg, preview=False):
+    if preview:
+        return cfg.get('preview_plot_dpi', 72)
+    return cfg.get('plot_dpi', 300)
+
+
+def _save(figure, file_path, dpi):
+    # Written next to the plot and renamed, a screen showing the plot never
+    # reads a half written file
+    root, extension = os.path.splitext(file_path)
+    tmp_file_path = '{0}.{1}.tmp{2}'.format(root, os.getpid(), extension)
+    figure.savefig(tmp_file_path, dpi=dpi)
+    os.replace(tmp_file_path, file_path)
+
+
+class ResultsPlot:
+    """Costs and emissions of the teams, marker size by self-sufficiency."""
+
+    def __init__(self):
+        with _style():
+            self.figure = Figure(figsize=(8, 6))
+            self.axes = self.figure.add_subplot()
+            self.axes.set_ylabel('CO2-Emissionen in t/a', fontsize=14)
+            self.axes.set_xlabel('Kosten in Mio. €/a', fontsize=14)
+            self.axes.axis([0, 50, 0, 40000])
+            self.axes.set_title(
+                'Jährliche Emissionen und Kosten der Energieversorgung',
+                fontsize=14)
+            self.suptitle = self.figure.suptitle('', fontsize=10)
+            self.axes.tick_params(axis='both', which='major', labelsize=12)
+            self.scatter = self.axes.scatter(
+                [], [], marker='o', facecolors=[red_beuth],
+                edgecolors=beuth_col_2, linewidths=1.0, alpha=1)
+            self.front, = self.axes.plot(
+                [], [], color=beuth_col_1, linestyle='--', marker='.',
+                linewidth=1.5, zorder=1, label='Pareto-Front')
+            self.legend = self.axes.legend(handles=[self.front],
+                                           loc='upper right', fontsize=11)
+            self.legend.set_visible(False)
+            self.axes.text(1, 2000, 'Copyright ©, Berliner Hochschule für '
+                           + 'Technik, 2022. All rights reserved.',
+                           fontsize=11.5, color=beuth_col_1,
+                           ha='left', va='top', alpha=0.5)
+        self.annotations = []
+
+    def update(self, df_basic_results_and_team_decision, title, front=None):
+        """Move the markers and labels to the results of the teams.
+
+        front is the table of the Pareto front, see 'pareto'.
+        """
+        df = df_basic_results_and_team_decision
+        self.suptitle.set_text(title)
+        if front is None:
+            self.front.set_data([], [])
+        else:
+            self.front.set_data(
+                front['total_costs'].to_numpy(dtype=float) / 1e6,
+                front['emissions'].to_numpy(dtype=float) / 1e3)
+        self.legend.set_visible(front is not None)
+        self.scatter.set_offsets(np.column_stack(
+            [df['costs'].to_numpy(dtype=float),
+             df['emissions'].to_numpy(dtype=float)]))
+        self.scatter.set_sizes(
+            df['selfsufficiency'].to_numpy(dtype=float) * 10)
+
+        # Labels are reused, only labels of teams that are added or removed
+        # are created or removed
+        with _style():
+            for i, (label, x, y) in enumerate(zip(
+                    df['team name'], df['costs'], df['emissions'])):
+                if i < len(self.annotations):
+                    self.annotations[i].set_text(label)
+                    self.annotations[i].xy = (x, y)
+                else:
+                    self.annotations.append(self.axes.annotate(
+                        label,
+                        xy=(x, y),
+                        xytext=(75, 40),
+                        textcoords='offset points',
+                        ha='right',  # horizontal alignment
+                        va='bottom',  # vertical alignment 'bottom'
+                        bbox=dict(
+                            boxstyle='round,pad=0.5',
+                            fc=beuth_col_1,
+                            alpha=0.5),
+                        arrowprops=dict(
+                            arrowstyle='->',
+                            connectionstyle='arc3,rad=0')))
+        for annotation in self.annotations[len(df):]:
+            annotation.remove()
+        del self.annotations[len(df):]
+
+    def save(self, file_path, dpi):
+        _save(self.figure, file_path, dpi)
+
+
+class DispatchPlot:
+    """Hourly production of electricity and heat of a team, stacked."""
+
+    def __init__(self):
+        with _style():
+            self.figure = Figure(figsize=(12, 7))
+            self.axes = self.figure.subplots(len(dispatch_flows), 1,
+                                             sharex=True)
+
+    def update(self, string_results, title):
+        """Draw the dispatch of the results of a team."""
+        self.figure.suptitle(title, fontsize=12)
+        with _style():
+            for axes, (bus, bus_flows) in zip(self.axes,
+                                              dispatch_flows.items()):
+                axes.clear()
+                producers = [source for source in bus_flows['producers']
+                             if (source, bus) in string_results]
+                sequences = [np.asarray(
+                    string_results[source, bus]['sequences']['flow'],
+                    dtype=float) for source in producers]
+                hours = np.arange(len(sequences[0])) if sequences else []
+                if sequences:
+                    axes.stackplot(hours, np.nan_to_num(sequences),
+                                   labels=producers, linewidth=0)
+                if (bus, bus_flows['demand']) in string_results:
+                    demand = np.asarray(string_results[
+                        bus, bus_flows['demand']]['sequences']['flow'],
+                        dtype=float)
+                    axes.plot(np.arange(len(demand)), demand, color='black',
+                              linewidth=0.8, label='demand')
+                axes.set_ylabel('{0} in MW'.format(bus))
+                axes.legend(loc='upper right', fontsize=8, ncol=4)
+            self.axes[-1].set_xlabel('Stunde')
+
+    def save(self, file_path, dpi):
+        _save(self.figure, file_path, dpi)
+
+
+def _figure(name, plot_class):
+    if name not in _figures:
+        _figures[name] = plot_class()
+    return _figures[name]
+
+
+def plot_results(df_basic_results_and_team_decision, cfg, preview=False):
+    """Update the results plot of the teams, return its file path."""
+    file_path = plot_file_path('results', cfg)
+    plot = _figure('results', ResultsPlot)
+    # Only teams with results are plotted
+    plot.update(df_basic_results_and_team_decision, cfg['workshop_title'],
+                front=load_pareto_front(cfg))
+    plot.save(file_path, plot_dpi(cfg, preview))
+    return file_path
+
+
+def plot_dispatch(cfg, team_numbers, load_results, preview=False):
+    """Render the dispatch plot of every team, return their file paths.
+
+    load_results returns the string keyed results of a team, see
+    'results_store.load_string_results'.
+    """
+    plot = _figure('dispatch', DispatchPlot)
+    file_paths = []
+    for n in team_numbers:
+        file_path = plot_file_path('dispatch_team_{0}'.format(n+1), cfg)
+        plot.update(load_results(n), 'Team {0}: {1}'.format(
+            n+1, cfg['team_names'][n]))
+        plot.save(file_path, plot_dpi(cfg, preview))
+        file_paths.append(file_path)
+    return file_paths
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Content-addressed cache for the optimisation results of the teams.
+
+The cache key is a hash of everything the optimisation result depends on:
+the merged parameter values (team design and general parameters), the
+time series file, the solver and its backend, the number of time steps and
+the code that builds, solves and stores the model.
+A cache entry is a copy of the stored results of a team (see
+'results_store'). On a cache hit the entry is copied to the results file of
+the team and the solve is skipped.
+
+The size of the cache is bounded. If the entries exceed the configured
+size, the least recently used entries are removed.
+
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+
+import results_store
+import time_series_store
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+cache_path = abs_path + '/results/optimisation_results/cache'
+
+# Modules that produce or serialize the results of every optimisation. A
+# change of any of them invalidates all cached results.
+result_modules = ('model_energy_system.py', 'persistent_model.py',
+                  'solver_backend.py', 'result_extraction.py',
+                  'results_store.py')
+
+
+def _hash_file(file_path, hasher):
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+
+
+def cache_key(param_value, file_path_ts, solver, number_of_time_steps,
+              aggregation=None, rolling_horizon=None, dispatch_engine='lp',
+              solver_backend='shell'):
+    """Return the cache key of an optimisation as a hex string.
+
+    solver_backend is the interface to the solver, see 'solver_backend'.
+    aggregation and rolling_horizon are the settings of the time series
+    aggregation and the rolling horizon, see 'time_series_aggregation'
+    and 'rolling_horizon'. dispatch_engine is 'lp' or 'merit_order', see
+    'merit_order'.
+    """
+    hasher = hashlib.sha256()
+
+    # Parameter values sorted by name, so the order of the rows in the
+    # parameter files does not matter
+    for name, value in sorted(param_value.items()):
+        hasher.update('{0}={1!r};'.format(name, float(value)).encode())
+    hasher.update('solver={0};backend={1};steps={2};'.format(
+        solver, solver_backend, number_of_time_steps).encode())
+    # Hash of the time series from its binary cache, the CSV is not read
+    hasher.update('time_series={0};'.format(
+        time_series_store.source_hash(file_path_ts)).encode())
+    src_path = os.path.dirname(os.path.abspath(__file__))
+    for module_file in result_modules:
+        _hash_file(os.path.join(src_path, module_file), hasher)
+    if aggregation is not None:
+        hasher.update('aggregation={0}x{1};'.format(*aggregation).encode())
+        _hash_file(os.path.join(src_path, 'time_series_aggregation.py'),
+                   hasher)
+    if rolling_horizon is not None:
+        hasher.update('rolling_horizon={0}+{1};'.format(
+            *rolling_horizon).encode())
+        _hash_file(os.path.join(src_path, 'rolling_horizon.py'), hasher)
+    if dispatch_engine != 'lp':
+        hasher.update('dispatch_engine={0};'.format(dispatch_engine).encode())
+        _hash_file(os.path.join(src_path, 'merit_order.py'), hasher)
+
+    return hasher.hexdigest()
+
+
+def _entry_path(key, results_format):
+    return os.path.join(
+        cache_path, key + results_store.file_extensions[results_format])
+
+
+def load(key, team_number, results_format='oemof'):
+    """Copy the cached results of key to the results file of a team.
+
+    Returns True on a cache hit and False otherwise.
+    """
+    entry = _entry_path(key, results_format)
+    if not os.path.isfile(entry):
+        return False
+
+    shutil.copyfile(entry, results_store.results_file_path(team_number,
+                                                          results_format))
+    # Mark the entry as recently used for the eviction
+    os.utime(entry)
+    return True
+
+
+def store(key, team_number, results_format='oemof', max_size_mb=200):
+    """Add the results of a team to the cache and evict old entries."""
+    os.makedirs(cache_path, exist_ok=True)
+    entry = _entry_path(key, results_format)
+
+    # Copy to a temporary file first, parallel workers must never see a
+    # partially written entry
+    tmp_entry = '{0}.{1}.tmp'.format(entry, os.getpid())
+    shutil.copyfile(results_store.results_file_path(team_number,
+                                                    results_format),
+                    tmp_entry)
+    os.replace(tmp_entry, entry)
+
+    evict(max_size_mb)
+
+
+def evict(max_size_mb):
+    """Remove the least recently used entries above max_size_mb."""
+    if not os.path.isdir(cache_path):
+        return
+
+    entries = []
+    for file_name in os.listdir(cache_path):
+        if not file_name.endswith(
+                tuple(results_store.file_extensions.values())):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_path, file_name))
+        except OSError:
+            # Removed by another worker in the meantime
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file_name))
+
+    total_size = sum(size for _, size, _ in entries)
+    max_size = max_size_mb * 1024 ** 2
+
+    for _, size, file_name in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(os.path.join(cache_path, file_name))
+        except OSError:
+            continue
+        total_size -= size
+        logging.info('Removed {0} from the result cache.'.format(file_name))
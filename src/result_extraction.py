@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Extraction of the results of a solved model into one block of floats.
+
+'solph.processing.results' collects every variable value into one long
+DataFrame, groups and pivots it into one DataFrame per node pair. For a
+year of hourly time steps this takes seconds, while the columnar results
+file only needs the values. 'extract_results' reads the flow values in one
+pass into an array (flow × time step) and the variables of the components
+(storage content and losses, investments, ...) into the same block, and
+returns an 'results_store.ArrayResults': one float array with one row per
+time point and one column per result sequence, with the same labels,
+columns and values as the string keyed results of 'solph.processing'. The
+pandas objects are only created when a key of the results is accessed.
+
+"""
+
+import numpy as np
+from oemof.network.network import Entity
+import pandas as pd
+from pyomo.core.base.piecewise import IndexedPiecewise
+from pyomo.core.base.var import Var
+
+from results_store import ArrayResults
+
+
+def _label(node):
+    if node is None:
+        return None
+    return str(node)
+
+
+def _variable_values(model):
+    """Return the values of the variables of the components.
+
+    Sequences are returned by their [source, target, name] label as dicts
+    of time step and value, scalars (e.g. investments) as a list of
+    [source, target, name, value]. Variables are identified like
+    'solph.processing.create_dataframe' does.
+    """
+    values = {}
+    for var in model.component_objects(Var, descend_into=True):
+        # The flows are read in bulk, the auxiliary variables of pyomo's
+        # Piecewise are dropped
+        if var is model.flow or isinstance(
+                var.parent_block().parent_component(), IndexedPiecewise):
+            continue
+        name = var.local_name
+        for index, var_data in var.items():
+            if var_data.value is None:
+                continue
+            if not isinstance(index, tuple):
+                index = (index,)
+            # Variables that do not belong to a node are not results
+            if not isinstance(index[0], Entity):
+                break
+            if isinstance(index[-1], Entity):
+                key, timestep = index, 0
+            else:
+                key, timestep = index[:-1], index[-1]
+            if len(key) == 1:
+                key = (key[0], None)
+            values.setdefault(
+                (_label(key[0]), _label(key[1]), name), {})[timestep] = (
+                    var_data.value)
+
+    sequences = {}
+    scalars = []
+    for label, timesteps in values.items():
+        # Like the pivot of 'solph.processing', a variable with a value at
+        # the first time step only is a scalar
+        if list(timesteps) == [0]:
+            scalars.append(list(label) + [float(timesteps[0])])
+        else:
+            sequences[label] = timesteps
+    return sequences, scalars
+
+
+def extract_results(model):
+    """Return the results of a solved model as 'ArrayResults'.
+
+    Dual values are not extracted, use 'solph.processing.results' for
+    models with duals.
+    """
+    if model.es.timeindex is None:
+        index = pd.RangeIndex(len(model.es.timeincrement) + 1)
+    else:
+        index = model.es.timeindex
+    number_of_rows = len(index)
+    timesteps = list(model.TIMESTEPS)
+
+    # model.flow is indexed by flow and time step, in this order
+    flows = [(_label(o), _label(i)) for o, i in model.FLOWS]
+    flow_values = np.array([var_data.value for var_data in
+                            model.flow.values()], dtype=float).reshape(
+        len(flows), len(timesteps))
+    sequences, scalars = _variable_values(model)
+
+    columns = sorted([[source, target, 'flow'] for source, target in flows]
+                     + [list(label) for label in sequences],
+                     key=lambda c: (c[0], str(c[1]), c[2]))
+    flow_rows = {flow: i for i, flow in enumerate(flows)}
+
+    # The closing time point of the sequences on time steps stays nan
+    values = np.full((number_of_rows, len(columns)), np.nan, order='F')
+    for j, (source, target, name) in enumerate(columns):
+        if name == 'flow' and (source, target) in flow_rows:
+            values[:len(timesteps), j] = flow_values[flow_rows[
+                source, target]]
+        else:
+            timestep_values = sequences[source, target, name]
+            values[np.fromiter(timestep_values, dtype=int), j] = np.fromiter(
+                timestep_values.values(), dtype=float)
+
+    return ArrayResults(columns, values, index,
+                        sorted(scalars, key=lambda s: (s[0], str(s[1]),
+                                                       s[2])))
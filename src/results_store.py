@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Storage of the optimisation results of the teams.
+
+Two formats are supported, selected by 'results_format' in config.yml:
+
+'oemof'
+    The energy system including its results is pickled by
+    'EnergySystem.dump' into a '.oemof' file.
+'columnar'
+    One '.columns' file per team with every result sequence (flows,
+    storage content, ...) as a float64 column and the scalar results and
+    meta results in a JSON header. The columns are memory-mapped by the
+    readers, only the columns that are accessed are loaded. Both the
+    written results ('result_extraction') and the read results are
+    'ArrayResults', one block of floats with pandas views on demand.
+
+Layout of a '.columns' file:
+
+    8 bytes   magic number b'ESPWCOL1'
+    8 bytes   length of the header (unsigned, little-endian)
+    header    JSON, utf-8 encoded
+    padding   up to the next multiple of 64 bytes
+    data      float64 (little-endian), one column after the other
+
+"""
+
+from collections.abc import Mapping
+import json
+import numbers
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+dump_path = abs_path + '/results/optimisation_results/dumps'
+
+file_extensions = {'oemof': '.oemof', 'columnar': '.columns'}
+
+_magic = b'ESPWCOL1'
+_alignment = 64
+
+# String keyed results loaded in this process, by results file. An entry is
+# reused by all analysis stages as long as the file is not modified.
+_loaded_results = {}
+
+
+def results_file_name(team_number, results_format='oemof'):
+    return 'model_team_{0}{1}'.format(team_number+1,
+                                      file_extensions[results_format])
+
+
+def results_file_path(team_number, results_format='oemof'):
+    return os.path.join(dump_path,
+                        results_file_name(team_number, results_format))
+
+
+def _label(node):
+    if node is None:
+        return None
+    return str(node)
+
+
+def _json_value(value):
+    """Convert meta results to values that can be stored as JSON."""
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, numbers.Number):
+        return float(value)
+    return str(value)
+
+
+def write_columnar_results(results, meta, file_path):
+    """Write the results of an optimisation as a columnar file.
+
+    results is either an 'ArrayResults', written as it is, or the nested
+    result dict of 'solph.processing.results', with node or label tuples
+    as keys. meta is the dict of 'solph.processing.meta_results'.
+    """
+    if isinstance(results, ArrayResults):
+        _write_columnar_file(results.columns, results.values, results.index,
+                             results.scalars, meta, file_path)
+        return
+
+    columns = []
+    scalars = []
+    arrays = []
+    index = None
+
+    for key in sorted(results, key=lambda k: tuple(map(str, k))):
+        source, target = (_label(node) for node in key)
+        sequences = results[key]['sequences']
+        for name in sequences.columns:
+            columns.append([source, target, name])
+            arrays.append(sequences[name].to_numpy(dtype='<f8'))
+            if index is None or (index.freq is None
+                                 and sequences.index.freq is not None):
+                index = sequences.index
+        for name, value in results[key].get('scalars', {}).items():
+            scalars.append([source, target, name, float(value)])
+
+    number_of_rows = len(arrays[0])
+    if any(len(a) != number_of_rows for a in arrays):
+        raise ValueError('All result sequences must have the same length.')
+
+    _write_columnar_file(columns, np.stack(arrays, axis=1), index, scalars,
+                         meta, file_path)
+
+
+def _write_columnar_file(columns, values, index, scalars, meta, file_path):
+    # values has one row per time point and one column per label of columns
+    number_of_rows = len(values)
+    freq = None
+    start = None
+    if isinstance(index, pd.DatetimeIndex) and len(index) > 2:
+        freq = index.freqstr or pd.infer_freq(index)
+        if freq is not None:
+            start = index[0].isoformat()
+
+    header = json.dumps({
+        'columns': columns,
+        'number_of_rows': number_of_rows,
+        'start': start,
+        'freq': freq,
+        'scalars': scalars,
+        'meta': _json_value(meta)}).encode('utf-8')
+    data_offset = _data_offset(len(header))
+
+    # Write to a temporary file first, readers must never see a partially
+    # written file
+    tmp_file_path = '{0}.{1}.tmp'.format(file_path, os.getpid())
+    with open(tmp_file_path, 'wb') as f:
+        f.write(_magic)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_offset - f.tell()))
+        # One column after the other, no copy if values is in Fortran order
+        np.ascontiguousarray(values.T, dtype='<f8').tofile(f)
+    os.replace(tmp_file_path, file_path)
+
+
+def _data_offset(header_length):
+    end_of_header = len(_magic) + 8 + header_length
+    return -(-end_of_header // _alignment) * _alignment
+
+
+def read_columnar_header(file_path):
+    """Return the header of a columnar file and the offset of its data."""
+    with open(file_path, 'rb') as f:
+        if f.read(len(_magic)) != _magic:
+            raise ValueError('{0} is not a columnar results file.'.format(
+                file_path))
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, _data_offset(header_length)
+
+
+class ArrayResults(Mapping):
+    """Results of an optimisation as one block of floats.
+
+    values has one row per time point and one column per result sequence
+    (flows, storage content, ...), columns[i] is the [source, target, name]
+    label of column i, target None for the variables of a node. scalars is
+    a list of [source, target, name, value].
+
+    Behaves like the string keyed result dict of
+    'solph.views.convert_keys_to_strings': results['rgas', 'natural_gas']
+    returns a dict with the 'sequences' DataFrame and the 'scalars'
+    Series. The pandas objects are only created when a key is accessed.
+    """
+
+    def __init__(self, columns, values, index, scalars=(), meta=None):
+        self.columns = columns
+        self.values = values
+        self.index = index
+        self.scalars = list(scalars)
+        self.meta = meta if meta is not None else {}
+        self.number_of_rows = len(index)
+
+        self._columns = {}
+        for i, (source, target, name) in enumerate(columns):
+            self._columns.setdefault((source, str(target)), {})[name] = i
+        self._scalars = {}
+        for source, target, name, value in self.scalars:
+            self._scalars.setdefault((source, str(target)), {})[name] = value
+
+    def column(self, source, target, name='flow'):
+        """Return one result sequence as a read-only array (no copy)."""
+        return self.values[:, self._columns[source, str(target)][name]]
+
+    def take(self, rows, index):
+        """Return the results at the given rows, e.g. to expand typical
+        periods to the full year."""
+        return ArrayResults(self.columns,
+                            np.asfortranarray(self.values[rows]), index,
+                            self.scalars, self.meta)
+
+    def __getitem__(self, key):
+        columns = self._columns[key]
+        sequences = pd.DataFrame(
+            {name: self.values[:, i] for name, i in columns.items()},
+            index=self.index)
+        scalars = pd.Series(self._scalars.get(key, {}), dtype=float)
+        return {'sequences': sequences, 'scalars': scalars}
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+
+class ColumnarResults(ArrayResults):
+    """Read-only view of a columnar results file.
+
+    The data is memory-mapped, a column is only read from disk when it is
+    accessed.
+    """
+
+    def __init__(self, file_path):
+        header, data_offset = read_columnar_header(file_path)
+        self.file_path = file_path
+        number_of_rows = header['number_of_rows']
+
+        if header['start'] is None:
+            index = pd.RangeIndex(number_of_rows)
+        else:
+            index = pd.date_range(header['start'], periods=number_of_rows,
+                                  freq=header['freq'])
+
+        if header['columns']:
+            # Stored one column after the other, the transposed view has one
+            # row per time point
+            values = np.memmap(
+                file_path, dtype='<f8', mode='r', offset=data_offset,
+                shape=(len(header['columns']), number_of_rows)).T
+        else:
+            values = np.empty((number_of_rows, 0))
+        super().__init__(header['columns'], values, index,
+                         header['scalars'], header['meta'])
+
+
+def store_results(energysystem, results, meta, team_number,
+                  results_format='oemof'):
+    """Store the results of a team in the configured format.
+
+    results of the columnar format may be an 'ArrayResults', see
+    'result_extraction'.
+    """
+    if results_format == 'columnar':
+        write_columnar_results(
+            results, meta, results_file_path(team_number, results_format))
+    else:
+        # Energy systems that were not solved as a whole, e.g. with a
+        # rolling horizon, have no solver results yet
+        if getattr(energysystem, 'results', None) is None:
+            energysystem.results = {}
+        energysystem.results['main'] = results
+        energysystem.results['meta'] = meta
+        energysystem.dump(dpath=dump_path,
+                          filename=results_file_name(team_number))
+
+
+def load_string_results(cfg, team_number):
+    """Load the results of a team as a string keyed result dict.
+
+    The results file is read once per process. Later calls return the same
+    object until the file is written again, so the basic and the detailed
+    analysis share the loaded results. The returned results must not be
+    modified.
+    """
+    results_format = cfg.get('results_format', 'oemof')
+    file_path = results_file_path(team_number, results_format)
+
+    stat = os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    loaded = _loaded_results.get(file_path)
+    if loaded is not None and loaded[0] == signature:
+        return loaded[1]
+
+    if results_format == 'columnar':
+        string_results = ColumnarResults(file_path)
+    else:
+        # oemof.solph is slow to import, it is only needed for this format
+        import oemof.solph as solph
+        energysystem = solph.EnergySystem()
+        energysystem.restore(dpath=dump_path,
+                             filename=results_file_name(team_number))
+        string_results = solph.views.convert_keys_to_strings(
+            energysystem.results['main'])
+
+    _loaded_results[file_path] = (signature, string_results)
+    return string_results
+
+
+def clear_loaded_results():
+    """Forget all results loaded in this process."""
+    _loaded_results.clear()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Rolling horizon solve of long time series.
+
+Instead of one linear program for all time steps, the time series is
+solved window by window. Each window covers 'rolling_horizon_window' time
+steps that are kept, plus 'rolling_horizon_overlap' time steps of look
+ahead that are solved but thrown away. Only the model of the current
+window is kept in memory, so the memory use depends on the window size and
+not on the length of the time series.
+
+Between two windows
+
+* the storage contents at the end of the kept time steps are the initial
+  contents of the next window. The last window ends at the initial storage
+  level, like the model of the full time series. A last window shorter
+  than the overlap is merged into the window before it,
+* every other window ends with at least the storage contents of a coarse
+  solve of the whole time series on daily means (see 'storage_guide').
+  Without it a window would empty the storages by its end, energy that is
+  left has no value for it. The coarse solve keeps seasonal storages
+  filled for the winter,
+* the gas budget ('full_load_time_max') that is left is passed on. Each
+  window may use a share of it proportional to its heat demand.
+
+The kept time steps of all windows are stitched into results with the same
+keys and sequences as the results of the full model.
+
+"""
+
+import logging
+
+import numpy as np
+import oemof.solph as solph
+import pandas as pd
+from pyomo.environ import Constraint
+
+import model_energy_system
+import solver_backend
+
+# Time series that sets the share of the gas budget of a window
+gas_budget_profile = 'Demand_th [MWh]'
+
+# Length of the time steps of the coarse solve of 'storage_guide'
+guide_hours = 24
+
+
+def settings(cfg):
+    """Return (window, overlap) in time steps or None.
+
+    The rolling horizon is off in debug mode, the debug model is already
+    small.
+    """
+    if not cfg.get('rolling_horizon', False) or cfg['debug']:
+        return None
+    window = cfg.get('rolling_horizon_window', 720)
+    overlap = cfg.get('rolling_horizon_overlap', 48)
+    if window < 1 or overlap < 0:
+        raise ValueError('The rolling horizon needs a window of at least one '
+                         'time step and an overlap of zero or more.')
+    return window, overlap
+
+
+def _labels(energysystem):
+    return {str(node): node for node in energysystem.nodes}
+
+
+def windows(number_of_time_steps, window, overlap):
+    """Return the (start, kept time steps) of every window.
+
+    The last window has to bring every storage back to its initial level.
+    A tail shorter than the overlap may be too short for that, it is kept
+    by the window before it instead.
+    """
+    starts = list(range(0, number_of_time_steps, window))
+    if len(starts) > 1 and number_of_time_steps - starts[-1] < overlap:
+        del starts[-1]
+    ends = starts[1:] + [number_of_time_steps]
+    return [(start, end - start) for start, end in zip(starts, ends)]
+
+
+def storage_guide(param_value, data, number_of_time_steps, solver,
+                  backend='shell', solver_verbose=False):
+    """Return the storage levels of a coarse solve of the whole time series.
+
+    The time series is averaged over blocks of 'guide_hours' time steps and
+    solved in one model, like the full model the storages end at their
+    initial level. Returns a function of the time step that gives the
+    storage level of every storage by its label, interpolated between the
+    blocks. None if the time series is shorter than two blocks.
+    """
+    blocks = number_of_time_steps // guide_hours
+    if blocks < 2:
+        return None
+    block_data = data.iloc[:blocks * guide_hours].groupby(
+        np.arange(blocks * guide_hours) // guide_hours).mean()
+    energysystem = model_energy_system.create_energy_system(
+        param_value, block_data.reset_index(drop=True), blocks,
+        hours_per_time_step=guide_hours)
+    model = solph.Model(energysystem)
+    if not hasattr(model, 'GenericStorageBlock'):
+        return None
+    solver_backend.solve(model, solver, backend, solver_verbose)
+
+    block = model.GenericStorageBlock
+    # The time steps after the last block are at the final level
+    hours = np.append(np.arange(blocks + 1) * guide_hours,
+                      number_of_time_steps)
+    levels = {}
+    for n in block.STORAGES:
+        capacity = n.nominal_storage_capacity
+        contents = [block.storage_content[n, t].value or 0
+                    for t in model.TIMEPOINTS]
+        contents.append(contents[-1])
+        levels[str(n)] = np.array(contents) / (capacity or 1)
+
+    def guide(time_step):
+        return {label: float(np.interp(time_step, hours, values))
+                for label, values in levels.items()}
+
+    logging.info('Rolling horizon: storage levels of the coarse solve on '
+                 '{0} blocks of {1} hours'.format(blocks, guide_hours))
+    return guide
+
+
+def _solve_window(param_value, data, start, length, storage_levels,
+                  final_storage_levels, gas_budget, solver, backend,
+                  solver_verbose, last=False):
+    """Solve one window, return its solved model.
+
+    The storages end with at least final_storage_levels, the last window
+    (last is True) with exactly these levels. final_storage_levels may be
+    None for all windows but the last one.
+    """
+    window_data = data.iloc[start:start + length].reset_index(drop=True)
+    energysystem = model_energy_system.create_energy_system(
+        param_value, window_data, length)
+
+    for node in energysystem.nodes:
+        if isinstance(node, solph.components.GenericStorage):
+            node.initial_storage_level = storage_levels[str(node)]
+            node.balanced = False
+
+    for (o, i), flow in energysystem.flows().items():
+        if flow.full_load_time_max is not None:
+            flow.full_load_time_max = max(
+                gas_budget[str(o), str(i)] / flow.nominal_value, 0)
+
+    model = solph.Model(energysystem)
+
+    if final_storage_levels and hasattr(model, 'GenericStorageBlock'):
+        block = model.GenericStorageBlock
+        end = model.TIMEPOINTS.last()
+
+        def _final_storage_level_rule(block, n):
+            final_content = (n.nominal_storage_capacity
+                             * final_storage_levels[str(n)])
+            if last:
+                return block.storage_content[n, end] == final_content
+            return block.storage_content[n, end] >= final_content
+
+        block.final_storage_level = Constraint(
+            block.STORAGES, rule=_final_storage_level_rule)
+
+    solver_backend.solve(model, solver, backend, solver_verbose)
+    return model
+
+
+def _objective(energysystem, results, number_of_time_steps):
+    """Return the variable costs of the stitched results."""
+    objective = 0
+    for (o, i), flow in energysystem.flows().items():
+        costs = np.array([flow.variable_costs[t]
+                          for t in range(number_of_time_steps)], dtype=float)
+        values = results[o, i]['sequences']['flow'].to_numpy()
+        objective += np.dot(values[:number_of_time_steps], costs)
+    return objective
+
+
+def solve(param_value, data, number_of_time_steps, window, overlap, solver,
+          backend='shell', solver_verbose=False):
+    """Solve an energy system with a rolling horizon.
+
+    Returns the energy system of the full time series (without a model)
+    and the stitched results and meta results, see
+    'solph.processing.results' and 'solph.processing.meta_results'.
+    """
+    energysystem = model_energy_system.create_energy_system(
+        param_value, data, number_of_time_steps)
+    nodes = _labels(energysystem)
+
+    storage_levels = {
+        str(n): n.initial_storage_level for n in energysystem.nodes
+        if isinstance(n, solph.components.GenericStorage)}
+    final_storage_levels = dict(storage_levels)
+
+    window_list = windows(number_of_time_steps, window, overlap)
+    guide = None
+    if len(window_list) > 1:
+        guide = storage_guide(param_value, data, number_of_time_steps,
+                              solver, backend, solver_verbose)
+
+    gas_budget_left = {
+        (str(o), str(i)): flow.full_load_time_max * flow.nominal_value
+        for (o, i), flow in energysystem.flows().items()
+        if flow.full_load_time_max is not None}
+    profile = data[gas_budget_profile].to_numpy(
+        dtype=float)[:number_of_time_steps]
+
+    parts = {}
+    solve_time = 0
+    for number, (start, kept) in enumerate(window_list):
+        last = number == len(window_list) - 1
+        length = min(kept + overlap, number_of_time_steps - start)
+        logging.info('Rolling horizon: solve window {0} of {1} (time steps '
+                     '{2} to {3})'.format(number + 1, len(window_list), start,
+                                          start + length - 1))
+
+        # Share of the budget that is left, by the heat demand
+        if last:
+            share = 1
+        else:
+            share = (profile[start:start + length].sum()
+                     / max(profile[start:].sum(), 1e-12))
+
+        if last:
+            window_end_levels = final_storage_levels
+        elif guide is not None:
+            window_end_levels = guide(start + length)
+        else:
+            window_end_levels = None
+
+        model = _solve_window(
+            param_value, data, start, length, storage_levels,
+            final_storage_levels=window_end_levels,
+            gas_budget={key: budget * share
+                        for key, budget in gas_budget_left.items()},
+            solver=solver, backend=backend, solver_verbose=solver_verbose,
+            last=last)
+
+        results = solph.views.convert_keys_to_strings(
+            solph.processing.results(model))
+        meta = solph.processing.meta_results(model)
+        solve_time += model.solve_info['solve_time']
+
+        # The closing row of the last window closes the time series
+        rows = kept + 1 if last else kept
+        for key, value in results.items():
+            parts.setdefault(key, []).append(
+                (value['sequences'].iloc[:rows], value['scalars']))
+
+        for label in storage_levels:
+            content = results[label, 'None'][
+                'sequences']['storage_content'].iloc[kept]
+            capacity = nodes[label].nominal_storage_capacity
+            storage_levels[label] = content / capacity if capacity else 0
+
+        for key in gas_budget_left:
+            gas_budget_left[key] -= results[key][
+                'sequences']['flow'].iloc[:kept].sum()
+
+        # Free the model of the window before the next one is built
+        model_solve_info = model.solve_info
+        del model, results
+
+    index = energysystem.timeindex[:number_of_time_steps + 1]
+    stitched = {}
+    for (source, target), window_parts in parts.items():
+        sequences = pd.concat([sequence for sequence, _ in window_parts])
+        sequences.index = index
+        key = (nodes[source], nodes.get(target))
+        stitched[key] = {'sequences': sequences,
+                         'scalars': window_parts[0][1]}
+
+    meta['objective'] = _objective(energysystem, stitched,
+                                   number_of_time_steps)
+    meta['solve'] = dict(model_solve_info, solve_time=solve_time)
+    logging.info('Rolling horizon: {0} windows solved, objective {1}'.format(
+        len(window_list), meta['objective']))
+    return energysystem, stitched, meta
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Inputs that all teams of a run share, loaded once per run.
+
+The run context holds the configuration, the time series and the general
+parameters. The time series is kept as one block of floats, with the
+yield per m² of the PV and solar thermal collectors added as columns, so
+'create_energy_system' does not compute them for every team. The design
+parameters of a team are read when the team is first asked for and
+again when its file changed.
+
+'get' returns the context of this process and loads it again only if the
+configuration, the time series or the general parameters changed on disk.
+The worker processes of the parallel mode get the context of the main
+process through 'share' and 'attach': the time series is put into shared
+memory once and every worker reads it from there without a copy.
+
+"""
+
+import contextlib
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import time_series_store
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+
+# Yield per m² of the solar technologies, by their efficiency parameter
+solar_yield_columns = {'eta_PV': 'PV yield [MWh/sqm]',
+                       'eta_solar_th': 'Solar_th yield [MWh/sqm]'}
+
+# Context of this process and the shared memory of the time series
+_context = {'context': None, 'shared_memory': None}
+
+
+def solar_yield(data, param_value, efficiency):
+    """Return the yield per m² [MWh/m²] of a solar technology.
+
+    efficiency is the name of its efficiency parameter, see
+    'solar_yield_columns'. Uses the column of the run context if the time
+    series has it.
+    """
+    column = solar_yield_columns[efficiency]
+    if column in data:
+        return data[column]
+    return data['Sol_irradiation [Wh/sqm]'] * 0.000001 * param_value[
+        efficiency]
+
+
+class RunContext:
+    """Configuration, time series and general parameters of a run."""
+
+    def __init__(self, config_path, cfg, data, general_param_df, mtimes):
+        self.config_path = config_path
+        self.cfg = cfg
+        self.data = data
+        self.general_param_df = general_param_df
+        self.mtimes = mtimes
+        self._design_param_dfs = {}
+
+    @property
+    def file_path_ts(self):
+        return abs_path + '/data/' + self.cfg['time_series_file_name']
+
+    def _design_param_df(self, team_number):
+        file_path = (abs_path + '/data/'
+                     + self.cfg['design_parameters_file_name'][team_number])
+        # The design of a team may change while the context is in use
+        mtime = os.path.getmtime(file_path)
+        loaded = self._design_param_dfs.get(team_number)
+        if loaded is None or loaded[0] != mtime:
+            loaded = (mtime, pd.read_csv(file_path, index_col=1))
+            self._design_param_dfs[team_number] = loaded
+        return loaded[1]
+
+    def design_parameters(self, team_number):
+        """Return the design parameter values of a team."""
+        return self._design_param_df(team_number)['value']
+
+    def parameters(self, team_number):
+        """Return the merged design and general parameter values of a team.
+
+        Same values as 'model_energy_system.load_parameters'.
+        """
+        param_df = pd.concat([self._design_param_df(team_number),
+                              self.general_param_df], sort=True)
+        return param_df['value']
+
+    def is_current(self):
+        """Return False if one of the input files changed since loading."""
+        try:
+            return all(os.path.getmtime(file_path) == mtime
+                       for file_path, mtime in self.mtimes.items())
+        except OSError:
+            return False
+
+
+def _input_files(config_path, cfg):
+    return [config_path,
+            abs_path + '/data/' + cfg['time_series_file_name'],
+            abs_path + '/data/' + cfg['parameters_file_name']]
+
+
+def load(config_path):
+    """Read the inputs of a run from disk, return the run context."""
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+    config_path, file_path_ts, file_path_general = _input_files(config_path,
+                                                                cfg)
+    mtimes = {file_path: os.path.getmtime(file_path)
+              for file_path in (config_path, file_path_ts, file_path_general)}
+
+    general_param_df = pd.read_csv(file_path_general, index_col=1)
+    data = time_series_store.read_time_series(file_path_ts)
+    general_param_value = general_param_df['value']
+    for efficiency, column in solar_yield_columns.items():
+        data[column] = solar_yield(data, general_param_value, efficiency)
+
+    # One block of floats, see 'share'
+    data = pd.DataFrame(data.to_numpy(dtype=float), columns=data.columns)
+    return RunContext(config_path, cfg, data, general_param_df, mtimes)
+
+
+def get(config_path):
+    """Return the run context of this process for a configuration file."""
+    context = _context['context']
+    if (context is None or context.config_path != config_path
+            or not context.is_current()):
+        context = load(config_path)
+        _context['context'] = context
+    return context
+
+
+@contextlib.contextmanager
+def share(context):
+    """Put the time series of a context into shared memory.
+
+    Yields the arguments of 'attach' for the worker processes. The shared
+    memory is released when the block ends.
+    """
+    values = context.data.to_numpy()
+    memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes,
+                                                              1))
+    try:
+        np.ndarray(values.shape, dtype=values.dtype,
+                   buffer=memory.buf)[:] = values
+        yield (memory.name, values.shape, values.dtype.str,
+               list(context.data.columns), context.config_path, context.cfg,
+               context.general_param_df, context.mtimes)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def attach(name, shape, dtype, columns, config_path, cfg, general_param_df,
+           mtimes):
+    """Make the shared context of the main process the one of this process.
+
+    Meant as initializer of the worker processes, see 'share'.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    values.flags.writeable = False
+    data = pd.DataFrame(values, columns=columns, copy=False)
+    _context.update(
+        context=RunContext(config_path, cfg, data, general_param_df, mtimes),
+        shared_memory=memory)
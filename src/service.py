@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Local HTTP service to submit team designs and poll their results.
+
+Teams (e.g. on tablets in the local network) send their design as JSON
+instead of editing the parameter files. The design is validated against
+the variables of the parameter files of the teams, solved on a bounded
+pool of worker processes and the KPIs and flow sequences are returned
+when the job is done. A design is solved like in 'main.py', with the
+dispatch engine, time series aggregation and rolling horizon of config.yml.
+Results are kept by the hash of the design (the key of the result cache,
+see 'model_energy_system.design_cache_key'), so the same design is solved
+only once and gets the same KPIs as in 'main.py'.
+
+The results files of the teams are not touched.
+
+Endpoints:
+
+GET /variables
+    the design variables and the design of every team
+POST /designs
+    body {"team": 1, "design": {"number_of_chps": 2, ...}}. Variables
+    that are left out are taken from the design of the team (default
+    team 1). Returns the job, status 202 if it is still pending.
+GET /jobs/<job>
+    status ('pending', 'done' or 'failed') and, when done, the KPIs and
+    the flow sequences. '?sequences=false' leaves the sequences out.
+
+Run from the folder 'src':
+
+    python service.py [--host 127.0.0.1] [--port 8080] [--workers 2]
+
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import logging
+import math
+import os
+import urllib.parse
+
+import numpy as np
+import oemof.solph as solph
+from oemof.tools import logger
+import pandas as pd
+
+import kpi
+import model_energy_system
+from parallel_execution import number_of_workers
+import results_store
+import run_context
+
+_reasons = {200: 'OK', 202: 'Accepted', 400: 'Bad Request',
+            404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error',
+            503: 'Service Unavailable'}
+
+# Largest accepted request body in bytes
+max_body_size = 1 << 16
+
+
+def _json_number(value):
+    """Return value as a float, None if it is NaN or infinite."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def solve_design(config_path, param_value):
+    """Solve a design in a worker process, return its KPIs and flows.
+
+    param_value is the dict of all parameter values of the design. The
+    design is solved by 'model_energy_system.solve_design' with the
+    dispatch engine, time series aggregation and rolling horizon of the
+    configuration, like in 'main.py'.
+    """
+    context = run_context.get(config_path)
+    cfg = context.cfg
+    param_value = pd.Series(param_value)
+    number_of_time_steps = model_energy_system.get_number_of_time_steps(cfg)
+
+    _, results, meta = model_energy_system.solve_design(
+        cfg, param_value, context.data, results_format='columnar')
+    termination = meta['solve']['termination']
+    if termination not in ('optimal', 'simulated'):
+        raise RuntimeError('The optimisation ended with termination '
+                           'condition {0}.'.format(termination))
+
+    if not isinstance(results, results_store.ArrayResults):
+        results = solph.views.convert_keys_to_strings(results)
+    kpis = kpi.compute_kpis(design=kpi.design_matrix([param_value]),
+                            sums=kpi.annual_sums(results)[np.newaxis],
+                            param_value=param_value)
+
+    sequences = {}
+    for (source, target), value in results.items():
+        if 'flow' in value['sequences']:
+            sequences['{0} -> {1}'.format(source, target)] = [
+                _json_number(v) for v in
+                value['sequences']['flow'].to_numpy()[:number_of_time_steps]]
+
+    return {'kpis': {name: _json_number(values[0])
+                     for name, values in kpis.items()},
+            'objective': _json_number(meta['objective']),
+            'solve_time': meta['solve']['solve_time'],
+            'sequences': sequences}
+
+
+class DesignService:
+    """Jobs of the submitted designs, by the hash of the design."""
+
+    def __init__(self, config_path, executor, max_pending=16,
+                 max_jobs=256):
+        self.config_path = config_path
+        self.executor = executor
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.jobs = collections.OrderedDict()
+
+    def variables(self):
+        context = run_context.get(self.config_path)
+        cfg = context.cfg
+        designs = {}
+        for n in range(cfg['number_of_teams']):
+            designs[n+1] = {name: float(value) for name, value in
+                            context.design_parameters(n).items()}
+        return {'variables': list(designs[1]), 'teams': designs,
+                'team names': cfg['team_names'][:cfg['number_of_teams']]}
+
+    def _param_value(self, request):
+        """Validate a submitted design, return all its parameter values."""
+        if not isinstance(request, dict) or not isinstance(
+                request.get('design'), dict):
+            raise ValueError("Send a JSON object with the object 'design'.")
+
+        context = run_context.get(self.config_path)
+        team = request.get('team', 1)
+        if (not isinstance(team, int) or isinstance(team, bool)
+                or not 1 <= team <= context.cfg['number_of_teams']):
+            raise ValueError("'team' must be a team number from 1 to "
+                             "{0}.".format(context.cfg['number_of_teams']))
+
+        param_value = context.parameters(team - 1).copy()
+        variables = context.design_parameters(team - 1).index
+        unknown = [name for name in request['design']
+                   if name not in variables]
+        if unknown:
+            raise ValueError('Unknown design variables: {0}. The design '
+                             'variables are {1}.'.format(
+                                 ', '.join(unknown), ', '.join(variables)))
+        for name, value in request['design'].items():
+            if (not isinstance(value, (int, float))
+                    or isinstance(value, bool) or not math.isfinite(value)
+                    or value < 0):
+                raise ValueError("'{0}' must be a number of at least "
+                                 "0.".format(name))
+            param_value[name] = value
+        return param_value, variables
+
+    def submit(self, request):
+        """Queue a design, return its job id and the job."""
+        param_value, variables = self._param_value(request)
+        context = run_context.get(self.config_path)
+        job_id = model_energy_system.design_cache_key(
+            context.cfg, param_value, context.file_path_ts)
+
+        job = self.jobs.get(job_id)
+        if job is not None and job['status'] != 'failed':
+            self.jobs.move_to_end(job_id)
+            return job_id, job
+
+        pending = sum(job['status'] == 'pending'
+                      for job in self.jobs.values())
+        if pending >= self.max_pending:
+            raise OverflowError('{0} designs are waiting, try again '
+                                'later.'.format(pending))
+
+        job = {'status': 'pending',
+               'design': {name: float(param_value[name])
+                          for name in variables}}
+        self.jobs[job_id] = job
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, solve_design, self.config_path,
+            param_value.to_dict())
+        future.add_done_callback(lambda f: self._finish(job_id, job, f))
+        logging.info('Design {0} submitted'.format(job_id[:12]))
+        self._evict()
+        return job_id, job
+
+    def _finish(self, job_id, job, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            job.update(status='failed', error=str(future.exception()))
+            logging.error('Design {0} failed: {1}'.format(
+                job_id[:12], future.exception()))
+        else:
+            job.update(status='done', **future.result())
+            logging.info('Design {0} solved'.format(job_id[:12]))
+
+    def _evict(self):
+        # Oldest finished jobs first
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if self.jobs[job_id]['status'] != 'pending':
+                del self.jobs[job_id]
+
+    async def handle(self, reader, writer):
+        """Answer one HTTP request."""
+        try:
+            status, body = await self._respond(reader)
+        except (ValueError, json.JSONDecodeError) as e:
+            status, body = 400, {'error': str(e)}
+        except OverflowError as e:
+            status, body = 503, {'error': str(e)}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except Exception as e:
+            logging.exception('Request failed')
+            status, body = 500, {'error': str(e)}
+
+        # NaN is not valid JSON, the results map it to null
+        data = json.dumps(body, allow_nan=False).encode()
+        writer.write('HTTP/1.1 {0} {1}\r\n'
+                     'Content-Type: application/json\r\n'
+                     'Content-Length: {2}\r\n'
+                     'Connection: close\r\n\r\n'.format(
+                         status, _reasons[status], len(data)).encode()
+                     + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise ValueError('Malformed request line.')
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        path = url.path.rstrip('/')
+
+        if path == '/variables':
+            if method != 'GET':
+                return 405, {'error': 'Use GET.'}
+            return 200, self.variables()
+
+        if path == '/designs':
+            if method != 'POST':
+                return 405, {'error': 'Use POST.'}
+            length = int(headers.get('content-length', 0))
+            if length > max_body_size:
+                return 413, {'error': 'The design is too large.'}
+            request = json.loads(await reader.readexactly(length))
+            job_id, job = self.submit(request)
+            return (200 if job['status'] == 'done' else 202,
+                    {'job': job_id, 'status': job['status'],
+                     'url': '/jobs/' + job_id})
+
+        if path.startswith('/jobs/'):
+            if method != 'GET':
+                return 405, {'error': 'Use GET.'}
+            job = self.jobs.get(path[len('/jobs/'):])
+            if job is None:
+                return 404, {'error': 'Unknown job.'}
+            if query.get('sequences', ['true'])[0].lower() == 'false':
+                job = {k: v for k, v in job.items() if k != 'sequences'}
+            return 200, job
+
+        return 404, {'error': 'Unknown path, use /variables, /designs or '
+                              '/jobs/<job>.'}
+
+
+async def _serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    logging.info('Design service on http://{0}:{1}'.format(host, port))
+    async with server:
+        await server.serve_forever()
+
+
+def serve(config_path, host='127.0.0.1', port=8080, workers=None,
+          max_pending=16):
+    """Run the service until it is interrupted.
+
+    workers is the number of worker processes, by default the setting
+    'parallel_workers' of config.yml. At most max_pending designs wait for
+    a worker, further designs are rejected until one is done.
+    """
+    context = run_context.get(config_path)
+    if workers is None:
+        workers = number_of_workers(
+            context.cfg.get('parallel_workers', 1), os.cpu_count() or 1)
+
+    with run_context.share(context) as shared_context, \
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=run_context.attach,
+                initargs=shared_context) as executor:
+        service = DesignService(config_path, executor,
+                                max_pending=max_pending)
+        try:
+            asyncio.run(_serve(service, host, port))
+        except KeyboardInterrupt:
+            logging.info('Design service stopped')
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Local HTTP service to solve team designs.')
+    parser.add_argument('--config', default='../experiment_config/config.yml',
+                        help='configuration file (default: %(default)s)')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on, 0.0.0.0 for the local '
+                             'network (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='port (default: %(default)s)')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes (default: parallel_workers '
+                             'of the configuration)')
+    parser.add_argument('--max-pending', type=int, default=16,
+                        help='designs that may wait for a worker '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    logger.define_logging(logfile='service.log', screen_level=logging.INFO,
+                          file_level=logging.INFO)
+    serve(os.path.abspath(args.config), host=args.host, port=args.port,
+          workers=args.workers, max_pending=args.max_pending)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Interfaces to the solver, selected by 'solver_backend' in config.yml.
+
+'shell'
+    The solver program is run by Pyomo, the model is passed as an LP file
+    and the solution is read back from a solution file. Works with every
+    solver Pyomo knows, e.g. cbc or glpk. This is 'oemof.solph.Model.solve'.
+'direct'
+    The model is passed to the solver in memory through its Python
+    bindings and the values of the variables are read back the same way,
+    no files are written. Supports 'highs' (package highspy), 'gurobi'
+    and 'cplex'.
+'persistent'
+    Like 'direct', but the solver instance is kept with the model. When
+    the model is solved again, only the changed variable bounds and
+    parameters are passed to the solver and HiGHS starts from the basis
+    of the last solution. Meant for the persistent model and the sweep,
+    which only change capacities between the solves.
+
+Every solve is timed. The time, the size of the linear program, the
+number of solver iterations (if the solver reports them) and the
+termination condition are kept as 'model.solve_info' and stored with the
+meta results.
+
+Run from the folder 'src' to compare the backends on the model of a team:
+
+    python solver_backend.py [team number, starting at 1] [backends]
+
+"""
+
+import logging
+import os
+import sys
+import time
+import warnings
+import weakref
+
+import oemof.solph as solph
+from oemof.tools import logger
+import pandas as pd
+from pyomo.opt import SolverFactory
+import yaml
+
+import model_energy_system
+import time_series_store
+
+backends = ['shell', 'direct', 'persistent']
+
+# In-memory (appsi) interfaces of the solvers
+_appsi_solvers = {'highs': 'appsi_highs', 'gurobi': 'appsi_gurobi',
+                  'cplex': 'appsi_cplex'}
+
+# Solver instances of the 'persistent' backend, by model
+_persistent_solvers = weakref.WeakKeyDictionary()
+
+
+def _appsi_solver(solver):
+    if solver not in _appsi_solvers:
+        raise ValueError(
+            "The 'direct' and 'persistent' solver backends support the "
+            "solvers {0}, not '{1}'.".format(', '.join(_appsi_solvers),
+                                              solver))
+    return SolverFactory(_appsi_solvers[solver])
+
+
+def supports_in_memory(solver):
+    """Return True if the 'direct' and 'persistent' backends support
+    solver."""
+    return solver in _appsi_solvers
+
+
+def _persistent_solver(model, solver):
+    opt = _persistent_solvers.get(model)
+    if opt is None:
+        opt = _appsi_solver(solver)
+        # Between two solves only bounds, fixed values and parameters
+        # change, the structure of the model stays the same
+        opt.update_config.check_for_new_or_removed_constraints = False
+        opt.update_config.check_for_new_or_removed_vars = False
+        opt.update_config.check_for_new_or_removed_params = False
+        opt.update_config.update_constraints = False
+        opt.update_config.update_named_expressions = False
+        # Fixed flows (e.g. of the wind turbines) change their value with
+        # the capacities. As variables with equal bounds only the bounds
+        # are updated, as parameters every constraint with them is rebuilt.
+        opt.update_config.treat_fixed_vars_as_params = False
+        _persistent_solvers[model] = opt
+    return opt
+
+
+def _defined(value):
+    if value is None or str(value) == '<undefined>':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lp_statistics(solver_results, opt=None):
+    """Return the size of the linear program and the solver iterations."""
+    highs = getattr(opt, '_solver_model', None)
+    if highs is not None and hasattr(highs, 'getNumNz'):
+        info = highs.getInfo()
+        return {'variables': highs.getNumCol(),
+                'constraints': highs.getNumRow(),
+                'nonzeros': highs.getNumNz(),
+                'iterations': (info.simplex_iteration_count
+                               + info.ipm_iteration_count)}
+
+    # Reported by the shell interfaces of e.g. cbc and glpk
+    problem = solver_results.problem
+    try:
+        iterations = (solver_results.solver.statistics.black_box
+                      .number_of_iterations)
+    except AttributeError:
+        iterations = None
+    return {'variables': _defined(problem.number_of_variables),
+            'constraints': _defined(problem.number_of_constraints),
+            'nonzeros': _defined(problem.number_of_nonzeros),
+            'iterations': _defined(iterations)}
+
+
+def _solve_in_memory(opt, model, solver_verbose):
+    # The appsi interfaces would try to import duals and reduced costs into
+    # the attributes 'dual' and 'rc', which oemof sets to None
+    unused = {name: model.__dict__.pop(name) for name in ('dual', 'rc')
+              if name in model.__dict__ and model.__dict__[name] is None}
+    try:
+        solver_results = opt.solve(model, tee=solver_verbose)
+    finally:
+        model.__dict__.update(unused)
+
+    # Same checks and attributes as 'oemof.solph.Model.solve'
+    status = solver_results['Solver'][0]['Status']
+    termination_condition = solver_results['Solver'][0][
+        'Termination condition']
+    if status == 'ok' and termination_condition == 'optimal':
+        logging.info('Optimization successful...')
+    else:
+        warnings.warn('Optimization ended with status {0} and termination '
+                      'condition {1}'.format(status, termination_condition),
+                      UserWarning)
+    model.es.results = solver_results
+    model.solver_results = solver_results
+    return solver_results
+
+
+def solve(model, solver, backend='shell', solver_verbose=False):
+    """Solve an oemof model with a solver backend.
+
+    Returns a dict with the backend, the solver, the solve time in seconds,
+    the termination condition, the number of variables, constraints and
+    nonzeros and the solver iterations (None if unknown). It is also kept
+    as 'model.solve_info'.
+    """
+    start = time.perf_counter()
+    opt = None
+    if backend == 'shell':
+        solver_results = model.solve(solver=solver,
+                                     solve_kwargs={'tee': solver_verbose})
+    elif backend == 'direct':
+        opt = _appsi_solver(solver)
+        solver_results = _solve_in_memory(opt, model, solver_verbose)
+    elif backend == 'persistent':
+        opt = _persistent_solver(model, solver)
+        solver_results = _solve_in_memory(opt, model, solver_verbose)
+    else:
+        raise ValueError("Unknown solver backend '{0}', use one of "
+                         "{1}.".format(backend, ', '.join(backends)))
+
+    model.solve_info = {
+        'backend': backend,
+        'solver': solver,
+        'solve_time': time.perf_counter() - start,
+        'termination': str(
+            solver_results['Solver'][0]['Termination condition'])}
+    model.solve_info.update(_lp_statistics(solver_results, opt))
+    logging.info('Solved with {0} ({1} backend) in {2:.2f} s, {3} variables, '
+                 '{4} constraints, {5} nonzeros, {6} iterations'.format(
+                     solver, backend, model.solve_info['solve_time'],
+                     model.solve_info['variables'],
+                     model.solve_info['constraints'],
+                     model.solve_info['nonzeros'],
+                     model.solve_info['iterations']))
+    return model.solve_info
+
+
+def compare_backends(config_path, team_number, backends_to_compare=None):
+    """Solve the model of a team with several backends, return the times.
+
+    The 'persistent' backend solves the model twice, the second solve
+    shows the time of a warm started solve.
+    """
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+    data = time_series_store.read_time_series(
+        abs_path + '/data/' + cfg['time_series_file_name'])
+    param_value = model_energy_system.load_parameters(cfg, team_number)
+    number_of_time_steps = model_energy_system.get_number_of_time_steps(cfg)
+
+    rows = []
+    for backend in backends_to_compare or backends:
+        solver = cfg['solver']
+        if backend != 'shell' and solver not in _appsi_solvers:
+            solver = 'highs'
+        model = solph.Model(model_energy_system.create_energy_system(
+            param_value, data, number_of_time_steps))
+        repetitions = 2 if backend == 'persistent' else 1
+        for repetition in range(repetitions):
+            info = solve(model, solver, backend)
+            rows.append(dict(info, solve=repetition + 1,
+                             objective=model.objective()))
+
+    comparison = pd.DataFrame(rows)
+    logging.info('Solver backends on the model of team {0}:\n{1}'.format(
+        team_number+1, comparison))
+    return comparison
+
+
+if __name__ == '__main__':
+    logger.define_logging(logfile='solver_backend.log',
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+    team = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    compare_backends(
+        config_path=os.path.abspath('../experiment_config/config.yml'),
+        team_number=team-1, backends_to_compare=sys.argv[2:] or None)
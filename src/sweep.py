@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Design space sweep: evaluate many energy system designs without writing
+parameter files for them.
+
+The designs are generated from a sweep specification (see
+'experiment_config/sweep.yml'), either as the full grid of the given
+parameter values or as random samples from it. Every design is solved in
+a process pool with the persistent model of 'persistent_model', so each
+worker builds the optimisation model only once. The KPIs of a design are
+appended to the results table as soon as its solve is finished. At the
+end, the designs on the cost/emission Pareto front are written to a
+separate table.
+
+With 'engine: merit_order' in the specification, the dispatch of the
+designs is simulated without a solver (see 'merit_order'), many designs
+at once.
+
+Run from the folder 'src':
+
+    python sweep.py [path of the sweep specification]
+
+"""
+
+import collections
+import concurrent.futures
+import csv
+import itertools
+import logging
+import os
+import random
+import sys
+import time
+
+from oemof.tools import logger
+import numpy as np
+import yaml
+
+import kpi
+import merit_order
+from model_energy_system import (create_energy_system,
+                                 design_parameter_names, flow_sums,
+                                 get_number_of_time_steps, load_parameters)
+from parallel_execution import number_of_workers
+from persistent_model import get_persistent_model, update_capacities
+import solver_backend
+import time_series_store
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+
+# KPIs written to the results table, see 'kpi.compute_kpis'
+kpi_columns = ['total_costs', 'annuity', 'var_costs', 'emissions',
+               'selfsufficiency', 'el_purchase', 'heat_purchase']
+
+# State of a worker process, set by '_init_worker'
+_worker = {}
+
+
+def parse_values(values):
+    """Return the list of values of one parameter of the specification.
+
+    Values are given as a list, e.g. [0, 1, 2, 4], or as an inclusive
+    range 'start..stop' with an optional step 'start..stop:step',
+    e.g. '0..10' or '0..8:2'.
+    """
+    if isinstance(values, (list, tuple)):
+        return list(values)
+    if isinstance(values, str) and '..' in values:
+        bounds, _, step = values.partition(':')
+        start, stop = (float(v) for v in bounds.split('..'))
+        step = float(step) if step else 1
+        number = int(round((stop - start) / step)) + 1
+        return [start + i * step for i in range(number)]
+    return [values]
+
+
+def generate_designs(spec):
+    """Yield the designs of a sweep specification as dicts."""
+    parameters = spec['parameters']
+    unknown = set(parameters) - set(design_parameter_names)
+    if unknown:
+        raise ValueError(
+            'Only design parameters can be swept, not {0}. Cost parameters '
+            'can be varied without solving, see kpi.compute_kpis.'.format(
+                ', '.join(sorted(unknown))))
+
+    names = list(parameters)
+    values = [parse_values(parameters[name]) for name in names]
+
+    if spec.get('method', 'grid') == 'grid':
+        for combination in itertools.product(*values):
+            yield dict(zip(names, combination))
+    else:
+        rng = random.Random(spec.get('random_seed'))
+        for _ in range(spec['number_of_samples']):
+            yield {name: rng.choice(v) for name, v in zip(names, values)}
+
+
+def _init_worker(config_path, base_design_file_name, engine='lp'):
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    # The base design takes the place of the design of team 1
+    cfg['design_parameters_file_name'] = [base_design_file_name]
+
+    _worker.update(
+        cfg=cfg,
+        engine=engine,
+        param_value=load_parameters(cfg, 0),
+        file_path_ts=abs_path + '/data/' + cfg['time_series_file_name'],
+        number_of_time_steps=get_number_of_time_steps(cfg))
+
+
+def _chunks(designs, size):
+    """Yield lists of up to size designs."""
+    while True:
+        chunk = list(itertools.islice(designs, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def evaluate_designs(designs):
+    """Evaluate a chunk of designs, return their rows of the table."""
+    if _worker['engine'] == 'merit_order':
+        return simulate_designs(designs)
+    return [evaluate_design(design) for design in designs]
+
+
+def simulate_designs(designs):
+    """Simulate the dispatch of designs by merit order, return their rows."""
+    if 'data' not in _worker:
+        _worker['data'] = time_series_store.read_time_series(
+            _worker['file_path_ts'])
+
+    start = time.perf_counter()
+    param_values = []
+    for design in designs:
+        param_value = _worker['param_value'].copy()
+        for name, value in design.items():
+            param_value[name] = value
+        param_values.append(param_value)
+
+    results, _ = merit_order.simulate(param_values, _worker['data'],
+                                      _worker['number_of_time_steps'])
+    kpis = kpi.compute_kpis(
+        design=kpi.design_matrix(param_values),
+        sums=np.column_stack([results[label].sum(axis=1)
+                              for _, label in kpi.flows]),
+        param_value=_worker['param_value'])
+    objectives = merit_order.objectives(results, param_values)
+    solve_time = (time.perf_counter() - start) / len(designs)
+
+    rows = []
+    for i, param_value in enumerate(param_values):
+        row = {name: param_value[name] for name in design_parameter_names}
+        row.update({name: kpis[name][i] for name in kpi_columns})
+        row['objective'] = objectives[i]
+        # The dispatch of a fixed design is the optimum
+        row['termination'] = ('optimal'
+                              if merit_order.has_fixed_dispatch(param_value)
+                              else 'simulated')
+        row['solve_time'] = solve_time
+        rows.append(row)
+    return rows
+
+
+def evaluate_design(design):
+    """Solve one design and return its row of the results table."""
+    cfg = _worker['cfg']
+    number_of_time_steps = _worker['number_of_time_steps']
+
+    param_value = _worker['param_value'].copy()
+    for name, value in design.items():
+        param_value[name] = value
+
+    # Nothing to optimise, see 'merit_order.has_fixed_dispatch'
+    if merit_order.has_fixed_dispatch(param_value):
+        return simulate_designs([design])[0]
+
+    start = time.perf_counter()
+    model, data = get_persistent_model(param_value, _worker['file_path_ts'],
+                                       number_of_time_steps)
+    update_capacities(model, create_energy_system(param_value, data,
+                                                  number_of_time_steps))
+    solver_backend.solve(model, cfg['solver'],
+                         cfg.get('solver_backend', 'shell'))
+
+    termination = model.solver_results['Solver'][0]['Termination condition']
+    kpis = kpi.compute_kpis(
+        design=kpi.design_matrix([param_value]),
+        sums=kpi.sums_vector(flow_sums(model))[np.newaxis],
+        param_value=param_value)
+
+    row = {name: param_value[name] for name in design_parameter_names}
+    row.update({name: kpis[name][0] for name in kpi_columns})
+    row['objective'] = model.objective()
+    row['termination'] = str(termination)
+    row['solve_time'] = time.perf_counter() - start
+    return row
+
+
+def pareto_front(costs, emissions):
+    """Return a boolean mask of the designs that are not dominated."""
+    costs = np.asarray(costs, dtype=float)
+    emissions = np.asarray(emissions, dtype=float)
+    order = np.lexsort((emissions, costs))
+    mask = np.zeros(len(costs), dtype=bool)
+    lowest_emissions = np.inf
+    for i in order:
+        if emissions[i] < lowest_emissions:
+            mask[i] = True
+            lowest_emissions = emissions[i]
+    return mask
+
+
+def run_sweep(config_path, spec_path):
+    with open(spec_path, 'r', encoding='utf-8') as ymlfile:
+        spec = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    logger.define_logging(logfile='sweep.log', screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    tables_path = abs_path + '/results/optimisation_results/tables/'
+    results_file_path = tables_path + spec['results_file_name']
+    pareto_file_path = (os.path.splitext(results_file_path)[0]
+                        + '_pareto.csv')
+
+    # The merit order dispatch simulates a chunk of designs at once
+    engine = spec.get('engine', 'lp')
+    chunk_size = 64 if engine == 'merit_order' else 1
+    chunks = _chunks(generate_designs(spec), chunk_size)
+    workers = number_of_workers(spec.get('workers', 'auto'),
+                                number_of_jobs=os.cpu_count() or 1)
+    # Designs are submitted lazily, so huge grids do not pile up in memory
+    max_pending = 4 * workers
+
+    columns = (design_parameter_names + kpi_columns
+               + ['objective', 'termination', 'solve_time'])
+    rows = []
+    failed = 0
+
+    with open(results_file_path, 'w', newline='') as f, \
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(config_path, spec['base_design_file_name'],
+                          engine)
+            ) as executor:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+
+        pending = collections.OrderedDict()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending[executor.submit(evaluate_designs, chunk)] = chunk
+
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    chunk_rows = future.result()
+                except Exception as e:
+                    failed += len(chunk)
+                    for design in chunk:
+                        logging.error('Design {0} failed: {1}'.format(
+                            design, e))
+                    continue
+                writer.writerows(chunk_rows)
+                f.flush()
+                rows.extend(chunk_rows)
+
+            logging.info('{0} designs evaluated, {1} failed'.format(
+                len(rows), failed))
+
+    if rows:
+        mask = pareto_front([row['total_costs'] for row in rows],
+                            [row['emissions'] for row in rows])
+        with open(pareto_file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(sorted(
+                (row for row, on_front in zip(rows, mask) if on_front),
+                key=lambda row: row['total_costs']))
+
+    logging.info('Sweep finished, results in {0}'.format(results_file_path))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sweep_spec_path = os.path.abspath(sys.argv[1])
+    else:
+        sweep_spec_path = os.path.abspath('../experiment_config/sweep.yml')
+    run_sweep(config_path=os.path.abspath('../experiment_config/config.yml'),
+              spec_path=sweep_spec_path)
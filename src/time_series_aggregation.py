@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Time series aggregation into typical periods for fast preview results.
+
+The year is cut into periods of equal length (e.g. days or weeks). The
+periods are clustered with k-means into a small number of typical
+periods, each one the mean of the periods of its cluster. The model is
+built on the typical periods only:
+
+* the costs of every time step are weighted with the number of periods it
+  represents ('objective_weighting' of the oemof model),
+* the gas budget ('full_load_time_max') is applied to the weighted gas
+  consumption,
+* every storage starts and ends each typical period at its initial level.
+
+After the solve the result sequences are expanded back to the full year by
+putting the typical period of each period in its place. The annual sums of
+the analysis therefore need no further scaling.
+
+Run from the folder 'src' to compare the aggregated with the full-year
+solve of a team:
+
+    python time_series_aggregation.py [team number, starting at 1]
+
+"""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import oemof.solph as solph
+from oemof.tools import logger
+import pandas as pd
+from pyomo.environ import Constraint
+import yaml
+
+import kpi
+import model_energy_system
+import results_store
+import run_context
+import solver_backend
+import time_series_store
+
+
+def settings(cfg):
+    """Return (number of typical periods, hours per period) or None.
+
+    Aggregation is off in debug mode, the debug model is already small.
+    """
+    if not cfg.get('time_series_aggregation', False) or cfg['debug']:
+        return None
+    return (cfg.get('number_of_typical_periods', 12),
+            cfg.get('hours_per_typical_period', 24))
+
+
+def _kmeans(features, number_of_clusters, iterations=100):
+    """Cluster the rows of features, return the cluster of every row.
+
+    The centres are initialised with k-means++ from a fixed seed, so the
+    same time series always gives the same typical periods.
+    """
+    rng = np.random.default_rng(0)
+    centres = [features[rng.integers(len(features))]]
+    for _ in range(1, number_of_clusters):
+        distance = np.min([((features - c) ** 2).sum(axis=1)
+                           for c in centres], axis=0)
+        if distance.sum() == 0:
+            centres.append(features[rng.integers(len(features))])
+        else:
+            centres.append(features[rng.choice(len(features),
+                                               p=distance / distance.sum())])
+    centres = np.array(centres)
+
+    assignment = None
+    for _ in range(iterations):
+        distance = ((features[:, np.newaxis] - centres) ** 2).sum(axis=2)
+        new_assignment = distance.argmin(axis=1)
+        if assignment is not None and (new_assignment == assignment).all():
+            break
+        assignment = new_assignment
+        for k in range(number_of_clusters):
+            members = features[assignment == k]
+            if len(members):
+                centres[k] = members.mean(axis=0)
+            else:
+                # Restart an empty cluster at the worst represented period
+                worst = distance[np.arange(len(features)), assignment].argmax()
+                centres[k] = features[worst]
+    return assignment
+
+
+def aggregate(data, number_of_time_steps, number_of_periods,
+              hours_per_period):
+    """Cluster the time series into typical periods.
+
+    Returns a dict with
+
+    'data'
+        the time series of the typical periods, one after the other,
+    'weights'
+        the number of periods every time step of 'data' represents,
+    'assignment'
+        the typical period of every period of the year,
+    'hours_per_period' and 'number_of_time_steps' (of the full year).
+
+    A last, incomplete period (e.g. of weeks) is not clustered, it is
+    assigned to the typical period that fits its hours best.
+    """
+    number_of_full_periods = number_of_time_steps // hours_per_period
+    if hours_per_period < 1 or not 1 <= number_of_periods \
+            <= number_of_full_periods:
+        raise ValueError(
+            'Cannot build {0} typical periods of {1} hours from {2} time '
+            'steps.'.format(number_of_periods, hours_per_period,
+                            number_of_time_steps))
+
+    columns = [c for c in data.columns if c != 'Counter']
+    values = data[columns].to_numpy(dtype=float)[:number_of_time_steps]
+
+    # Every time series is scaled to its maximum, so all of them have the
+    # same influence on the clustering. The solar yields of the run context
+    # follow the irradiation, they are not clustered on.
+    scale = np.abs(values).max(axis=0)
+    scale[scale == 0] = 1
+    features = np.array([c not in run_context.solar_yield_columns.values()
+                         for c in columns])
+    periods = values[:number_of_full_periods * hours_per_period].reshape(
+        number_of_full_periods, hours_per_period, len(columns))
+    assignment = _kmeans(
+        (periods / scale)[:, :, features].reshape(number_of_full_periods, -1),
+        number_of_periods)
+
+    # Cluster means keep the annual sum of every time series
+    typical = np.array([periods[assignment == k].mean(axis=0)
+                        for k in range(number_of_periods)])
+
+    weights = np.zeros((number_of_periods, hours_per_period))
+    for k in range(number_of_periods):
+        weights[k] = (assignment == k).sum()
+
+    rest = values[number_of_full_periods * hours_per_period:]
+    if len(rest):
+        distance = ((((typical[:, :len(rest)] - rest) / scale)[:, :, features])
+                    ** 2).sum(axis=(1, 2))
+        k = distance.argmin()
+        assignment = np.append(assignment, k)
+        weights[k, :len(rest)] += 1
+
+    typical_data = pd.DataFrame(
+        typical.reshape(-1, len(columns)), columns=columns)
+    typical_data.insert(0, 'Counter', np.arange(1, len(typical_data) + 1))
+
+    logging.info('Time series aggregated into {0} typical periods of {1} '
+                 'hours'.format(number_of_periods, hours_per_period))
+
+    return {'data': typical_data,
+            'weights': weights.ravel(),
+            'assignment': assignment,
+            'hours_per_period': hours_per_period,
+            'number_of_time_steps': number_of_time_steps}
+
+
+def full_year_rows(aggregation):
+    """Return the row of the typical data of every time step of the year."""
+    hours_per_period = aggregation['hours_per_period']
+    steps = np.arange(aggregation['number_of_time_steps'])
+    return (aggregation['assignment'][steps // hours_per_period]
+            * hours_per_period + steps % hours_per_period)
+
+
+def create_model(energysystem, aggregation):
+    """Build the oemof model of an energy system on the typical periods."""
+    weights = aggregation['weights']
+    model = solph.Model(energysystem, objective_weighting=weights)
+    timesteps = list(model.TIMESTEPS)
+
+    # The gas budget limits the consumption of the whole year
+    flow_block = model.SimpleFlowBlock
+    flow_block.full_load_time_max_constr.deactivate()
+
+    def _weighted_full_load_time_max_rule(block, o, i):
+        return (sum(model.flow[o, i, t] * model.timeincrement[t]
+                    * weights[t] for t in timesteps)
+                <= model.flows[o, i].full_load_time_max
+                * model.flows[o, i].nominal_value)
+
+    model.weighted_full_load_time_max = Constraint(
+        flow_block.FULL_LOAD_TIME_MAX_FLOWS,
+        rule=_weighted_full_load_time_max_rule)
+
+    # Energy must not be shifted from one typical period to another
+    period_starts = range(aggregation['hours_per_period'], len(weights),
+                          aggregation['hours_per_period'])
+
+    if hasattr(model, 'GenericStorageBlock'):
+        storage_block = model.GenericStorageBlock
+
+        def _typical_period_storage_rule(block, n, t):
+            return (storage_block.storage_content[n, t]
+                    == storage_block.storage_content[n, 0])
+
+        model.typical_period_storage = Constraint(
+            storage_block.STORAGES, period_starts,
+            rule=_typical_period_storage_rule)
+
+    # The contents of invested storages are those at the end of each time
+    # step, the initial content is a variable of its own
+    if hasattr(model, 'GenericInvestmentStorageBlock'):
+        invest_block = model.GenericInvestmentStorageBlock
+
+        def _typical_period_invest_storage_rule(block, n, t):
+            return (invest_block.storage_content[n, t - 1]
+                    == invest_block.init_content[n])
+
+        model.typical_period_invest_storage = Constraint(
+            invest_block.INVESTSTORAGES, period_starts,
+            rule=_typical_period_invest_storage_rule)
+
+    return model
+
+
+def expand_results(results, aggregation):
+    """Expand the results of an aggregated model to the full year.
+
+    results is the dict of 'solph.processing.results' or an
+    'results_store.ArrayResults'. The sequences get one row per time step
+    of the year plus the closing row, like the results of a full-year
+    model.
+    """
+    rows = np.append(full_year_rows(aggregation),
+                     len(aggregation['weights']))
+    if isinstance(results, results_store.ArrayResults):
+        return results.take(rows, pd.date_range(
+            results.index[0], periods=len(rows), freq=results.index.freq))
+
+    expanded = {}
+    for key, value in results.items():
+        sequences = value['sequences']
+        index = pd.date_range(sequences.index[0], periods=len(rows),
+                              freq=sequences.index.freq)
+        expanded[key] = dict(value)
+        expanded[key]['sequences'] = pd.DataFrame(
+            sequences.to_numpy()[rows], index=index,
+            columns=sequences.columns)
+    return expanded
+
+
+def representation_error(data, aggregation):
+    """Return the error of the typical periods for every time series.
+
+    'annual sum [%]' is the deviation of the annual sum, 'nRMSE [%]' the
+    root mean square error of the hourly values relative to the mean.
+    """
+    typical = aggregation['data'].drop(columns='Counter')
+    original = data[typical.columns].iloc[
+        :aggregation['number_of_time_steps']].to_numpy(dtype=float)
+    expanded = typical.to_numpy()[full_year_rows(aggregation)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_error = (expanded.sum(axis=0) / original.sum(axis=0) - 1) * 100
+        rmse = (np.sqrt(((expanded - original) ** 2).mean(axis=0))
+                / np.abs(original).mean(axis=0) * 100)
+    return pd.DataFrame({'annual sum [%]': sum_error, 'nRMSE [%]': rmse},
+                        index=typical.columns)
+
+
+def compare_with_full_year(config_path, team_number):
+    """Solve a team with and without aggregation and compare the KPIs.
+
+    Returns a DataFrame with the KPIs of both solves and the relative
+    deviation of the aggregated one. No results are stored.
+    """
+    with open(config_path, 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.load(ymlfile, Loader=yaml.CLoader)
+
+    abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+    data = time_series_store.read_time_series(
+        abs_path + '/data/' + cfg['time_series_file_name'])
+    param_value = model_energy_system.load_parameters(cfg, team_number)
+    # Same horizon as the run that is checked
+    number_of_time_steps = model_energy_system.get_number_of_time_steps(cfg)
+    number_of_periods, hours_per_period = (
+        cfg.get('number_of_typical_periods', 12),
+        cfg.get('hours_per_typical_period', 24))
+
+    comparison = {}
+    for name in ['full year', 'aggregated']:
+        start = time.perf_counter()
+        if name == 'full year':
+            energysystem = model_energy_system.create_energy_system(
+                param_value, data, number_of_time_steps)
+            model = solph.Model(energysystem)
+            weights = None
+        else:
+            aggregation = aggregate(data, number_of_time_steps,
+                                    number_of_periods, hours_per_period)
+            energysystem = model_energy_system.create_energy_system(
+                param_value, aggregation['data'], len(aggregation['data']))
+            model = create_model(energysystem, aggregation)
+            weights = aggregation['weights']
+        solver_backend.solve(model, cfg['solver'],
+                             cfg.get('solver_backend', 'shell'))
+
+        kpis = kpi.compute_kpis(
+            design=kpi.design_matrix([param_value]),
+            sums=kpi.sums_vector(model_energy_system.flow_sums(
+                model, weights))[np.newaxis],
+            param_value=param_value)
+        comparison[name] = {
+            'objective': model.objective(),
+            'total costs': kpis['total_costs'][0],
+            'emissions': kpis['emissions'][0],
+            'selfsufficiency': kpis['selfsufficiency'][0],
+            'el purchase': kpis['el_purchase'][0],
+            'heat purchase': kpis['heat_purchase'][0],
+            'run time [s]': time.perf_counter() - start}
+
+    comparison = pd.DataFrame(comparison)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        comparison['deviation [%]'] = (
+            (comparison['aggregated'] / comparison['full year'] - 1) * 100)
+
+    logging.info('Time series representation error:\n{0}'.format(
+        representation_error(data, aggregation)))
+    logging.info('Aggregated compared with full-year solve of team '
+                 '{0}:\n{1}'.format(team_number+1, comparison))
+    return comparison
+
+
+if __name__ == '__main__':
+    logger.define_logging(logfile='time_series_aggregation.log',
+                          screen_level=logging.INFO,
+                          file_level=logging.INFO)
+    team = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    compare_with_full_year(
+        config_path=os.path.abspath('../experiment_config/config.yml'),
+        team_number=team-1)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Binary cache of the time series files.
+
+The first time a time series CSV is read, its columns are converted to a
+float64 array and saved next to it as '<file name>.npy'. A sidecar
+'<file name>.npy.json' keeps the size, modification time and SHA-256 hash
+of the CSV and the names of the columns. Later reads memory-map the array
+instead of parsing the text file.
+
+The cache is used as long as the CSV has the same size and modification
+time. If only the modification time changed (e.g. the file was copied),
+the hash decides. A CSV with columns that are not numbers is read with
+pandas and not cached.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+_version = 1
+
+
+def cache_file_path(file_path):
+    return file_path + '.npy'
+
+
+def _sidecar_file_path(file_path):
+    return cache_file_path(file_path) + '.json'
+
+
+def file_hash(file_path):
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _read_sidecar(file_path):
+    try:
+        with open(_sidecar_file_path(file_path), 'r') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get('version') != _version:
+        return None
+    return sidecar
+
+
+def _write_atomic(file_path, write):
+    # Parallel workers must never see a partially written file
+    tmp_file_path = '{0}.{1}.tmp'.format(file_path, os.getpid())
+    try:
+        write(tmp_file_path)
+        os.replace(tmp_file_path, file_path)
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+
+def _valid_sidecar(file_path):
+    """Return the sidecar of the cache of file_path if it is up to date."""
+    sidecar = _read_sidecar(file_path)
+    if sidecar is None or not os.path.exists(cache_file_path(file_path)):
+        return None
+    stat = os.stat(file_path)
+    if sidecar['size'] != stat.st_size:
+        return None
+    if sidecar['mtime_ns'] == stat.st_mtime_ns:
+        return sidecar
+    if sidecar['sha256'] != file_hash(file_path):
+        return None
+
+    # Same content, e.g. a copy of the file
+    sidecar['mtime_ns'] = stat.st_mtime_ns
+    try:
+        _write_atomic(_sidecar_file_path(file_path),
+                      lambda path: _dump_json(sidecar, path))
+    except OSError:
+        pass
+    return sidecar
+
+
+def _dump_json(value, file_path):
+    with open(file_path, 'w') as f:
+        json.dump(value, f, indent=2)
+
+
+def _convert(file_path):
+    """Parse the CSV and write its cache, return the time series."""
+    stat = os.stat(file_path)
+    data = pd.read_csv(file_path)
+    numeric = all(pd.api.types.is_numeric_dtype(dtype)
+                  for dtype in data.dtypes)
+    if not numeric or data.empty:
+        logging.info('Time series {0} is not cached, it has columns that '
+                     'are not numbers.'.format(file_path))
+        return data
+
+    values = data.to_numpy(dtype=np.float64)
+    sidecar = {'version': _version,
+               'size': stat.st_size,
+               'mtime_ns': stat.st_mtime_ns,
+               'sha256': file_hash(file_path),
+               'columns': list(data.columns)}
+    try:
+        # np.save would add '.npy' to the temporary file name
+        def _save(path):
+            with open(path, 'wb') as f:
+                np.save(f, values)
+        _write_atomic(cache_file_path(file_path), _save)
+        _write_atomic(_sidecar_file_path(file_path),
+                      lambda path: _dump_json(sidecar, path))
+        logging.info('Time series {0} cached in {1}'.format(
+            file_path, cache_file_path(file_path)))
+    except OSError as e:
+        logging.warning('Cannot cache the time series {0}: {1}'.format(
+            file_path, e))
+    return pd.DataFrame(values, columns=data.columns, copy=False)
+
+
+def read_time_series(file_path):
+    """Return the time series of a CSV file as DataFrame of floats.
+
+    Replaces 'pd.read_csv(file_path)'. The columns of a cached time series
+    are memory-mapped and read-only.
+    """
+    sidecar = _valid_sidecar(file_path)
+    if sidecar is None:
+        return _convert(file_path)
+    values = np.load(cache_file_path(file_path), mmap_mode='r')
+    return pd.DataFrame(values, columns=sidecar['columns'], copy=False)
+
+
+def source_hash(file_path):
+    """Return the SHA-256 hash of a time series file.
+
+    Taken from the cache if it is up to date, so the file is not read.
+    """
+    sidecar = _valid_sidecar(file_path)
+    if sidecar is None:
+        return file_hash(file_path)
+    return sidecar['sha256']
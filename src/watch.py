@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Watch mode: solve a team again as soon as its parameter file is saved.
+
+The data folder and the configuration are polled for changes. When the
+design file of a team is saved, only this team is solved on the worker
+pool; teams are not queued behind each other. When the optimisation of a
+team is done, its KPIs, results.csv and the plot are updated with the
+incremental pipeline (see 'pipeline'), the other teams are taken from the
+pipeline manifest. The plots are saved as previews ('preview_plot_dpi').
+A change of the configuration, the general parameters or the time series
+checks all teams, and solves the ones whose results depend on the change.
+
+A file is only read after it has not changed for one polling interval, so
+a file that is still being written is not solved.
+
+Run from the folder 'src' (stop with Ctrl+C):
+
+    python main.py --watch
+
+"""
+
+import concurrent.futures
+import logging
+import os
+import signal
+import time
+import traceback
+
+from oemof.tools import logger
+
+from basic_analysis import display_results
+import instrumentation
+from model_energy_system import run_model
+from parallel_execution import number_of_workers
+from persistent_model import run_persistent_model
+import pipeline
+import run_context
+
+abs_path = os.path.dirname(os.path.abspath(os.path.join(__file__, '..')))
+
+
+def _watched_files(cfg, config_path):
+    """Return the watched files, by the team they belong to (None: all)."""
+    files = {config_path: None,
+             abs_path + '/data/' + cfg['time_series_file_name']: None,
+             abs_path + '/data/' + cfg['parameters_file_name']: None}
+    for n in range(cfg['number_of_teams']):
+        files[abs_path + '/data/'
+              + cfg['design_parameters_file_name'][n]] = n
+    return files
+
+
+def _mtimes(files):
+    mtimes = {}
+    for file_path in files:
+        try:
+            mtimes[file_path] = os.stat(file_path).st_mtime_ns
+        except OSError:
+            mtimes[file_path] = None
+    return mtimes
+
+
+def _init_worker(*shared_context):
+    # Ctrl+C stops the watch mode, the workers are shut down by it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_context.attach(*shared_context)
+
+
+def watch(config_path, interval=1.0):
+    """Poll the inputs and solve the teams whose inputs changed.
+
+    Runs until it is interrupted. interval is the polling interval in
+    seconds.
+    """
+    logger.define_logging(logfile='watch.log', screen_level=logging.INFO,
+                          file_level=logging.INFO)
+
+    context = run_context.get(config_path)
+    cfg = context.cfg
+    manifest = pipeline.load_manifest()
+    team_numbers = list(range(cfg['number_of_teams']))
+
+    files = _watched_files(cfg, config_path)
+    seen = _mtimes(files)
+    changed = {}  # file path: mtime, waiting to settle
+    queued = set(team_numbers)  # teams to check, all at the start
+    running = {}  # future: (team number, fingerprint)
+    failed_teams = set()
+    # results.csv and the plot are brought up to date at the start
+    refresh = True
+
+    workers = number_of_workers(cfg.get('parallel_workers', 1),
+                                len(team_numbers))
+    logging.info('Watch the parameters of {0} teams with {1} workers, stop '
+                 'with Ctrl+C'.format(len(team_numbers), workers))
+
+    with run_context.share(context) as shared_context, \
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=shared_context) as executor:
+        try:
+            while True:
+                # Files that changed and then stayed the same for one
+                # interval
+                mtimes = _mtimes(files)
+                inputs_changed = False
+                for file_path, mtime in mtimes.items():
+                    if mtime == seen[file_path]:
+                        changed.pop(file_path, None)
+                    elif changed.get(file_path) != mtime:
+                        changed[file_path] = mtime
+                    else:
+                        del changed[file_path]
+                        seen[file_path] = mtime
+                        logging.info('{0} changed'.format(file_path))
+                        if files[file_path] is None:
+                            inputs_changed = True
+                            queued.update(team_numbers)
+                        else:
+                            queued.add(files[file_path])
+
+                # The configuration may name other files or teams
+                if inputs_changed:
+                    context = run_context.get(config_path)
+                    cfg = context.cfg
+                    team_numbers = list(range(cfg['number_of_teams']))
+                    files = _watched_files(cfg, config_path)
+                    seen = {file_path: seen.get(file_path, mtime)
+                            for file_path, mtime in _mtimes(files).items()}
+                    queued.intersection_update(team_numbers)
+
+                # A team that is still solved is queued again after it
+                # finished
+                busy = {n for n, _ in running.values()}
+                ready = sorted(queued - busy)
+                if ready:
+                    queued.difference_update(ready)
+                    run = (run_persistent_model
+                           if cfg.get('persistent_model', False)
+                           else run_model)
+                    fingerprints = pipeline.stale_teams(context, ready,
+                                                        manifest)
+                    for n, node_fingerprint in fingerprints.items():
+                        logging.info('Solve team {0}'.format(n+1))
+                        future = executor.submit(
+                            instrumentation.run_team, run,
+                            config_path=config_path, team_number=n)
+                        running[future] = (n, node_fingerprint)
+
+                done = [future for future in running if future.done()]
+                for future in done:
+                    n, node_fingerprint = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        failed_teams.add(n)
+                        logging.error('Optimisation of team {0} failed:\n'
+                                      '{1}'.format(n+1,
+                                                   traceback.format_exc()))
+                    else:
+                        failed_teams.discard(n)
+                        pipeline.record_results(
+                            manifest, n, node_fingerprint,
+                            cfg.get('results_format', 'oemof'))
+                        display_results(config_path=config_path,
+                                        team_number=n)
+                    refresh = True
+
+                if refresh:
+                    refresh = False
+                    pipeline.save_manifest(manifest)
+                    pipeline.analyse(
+                        config_path,
+                        [n for n in team_numbers if n not in failed_teams],
+                        manifest, preview=True)
+                    logging.info('results.csv and the plot are updated')
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            logging.info('Stop watching')
+            executor.shutdown(wait=False, cancel_futures=True)
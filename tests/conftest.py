@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+The modules of 'src' import each other by their names, like when they are
+run from the folder 'src'.
+
+"""
+
+import os
+import sys
+
+import pytest
+import yaml
+
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                        'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+config_file_path = os.path.join(src_path, '..', 'experiment_config',
+                                'config.yml')
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """Return a function that writes config.yml with changed settings.
+
+    The time series and parameter files of the repository are used. The
+    default is a short horizon of one week. Every call writes a new file,
+    so the run context is always loaded again.
+    """
+    file_paths = []
+
+    def make_config(**settings):
+        with open(config_file_path, 'rb') as ymlfile:
+            cfg = yaml.safe_load(ymlfile)
+        cfg.update(debug=False, number_of_time_steps=168)
+        cfg.update(settings)
+        file_path = tmp_path / 'config_{0}.yml'.format(len(file_paths))
+        file_paths.append(file_path)
+        with open(file_path, 'w') as ymlfile:
+            yaml.safe_dump(cfg, ymlfile)
+        return os.path.abspath(str(file_path))
+
+    return make_config
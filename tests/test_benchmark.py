@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Benchmark of the pipeline stages: the measurements of every stage and the
+results the benchmark stores against the solve of the teams.
+
+"""
+
+import json
+
+import pytest
+
+import benchmark
+import results_store
+
+pytest.importorskip('highspy')
+
+
+@pytest.mark.parametrize('results_format', ['oemof', 'columnar'])
+def test_case_measures_every_stage_of_every_team(make_config, tmp_path,
+                                                 monkeypatch, results_format):
+    # 'run_case' sets the dump path of its process
+    monkeypatch.setattr(results_store, 'dump_path', results_store.dump_path)
+    config_path = make_config(solver='highs', solver_backend='direct')
+
+    case = benchmark.run_case(config_path, 48, 2, results_format,
+                              str(tmp_path))
+
+    assert case['results_format'] == results_format
+    assert [team['team'] for team in case['teams']] == [1, 2]
+    for team in case['teams']:
+        assert list(team['stages']) == benchmark.stages
+        for measurement in team['stages'].values():
+            assert measurement['time'] >= 0
+    assert case['stages']['solve'] == pytest.approx(sum(
+        team['stages']['solve']['time'] for team in case['teams']))
+    assert case['wall_time'] >= sum(case['stages'].values())
+
+
+def test_stored_results_are_the_ones_of_the_solve(make_config, tmp_path,
+                                                  monkeypatch):
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import run_context
+    import solver_backend
+
+    monkeypatch.setattr(results_store, 'dump_path', results_store.dump_path)
+    config_path = make_config(solver='highs', solver_backend='direct')
+    benchmark.run_case(config_path, 48, 2, 'columnar', str(tmp_path))
+
+    context = run_context.get(config_path)
+    for team_number in range(2):
+        model = solph.Model(create_energy_system(
+            context.parameters(team_number), context.data, 48))
+        solver_backend.solve(model, 'highs', 'direct')
+        stored = results_store.ColumnarResults(
+            str(tmp_path / 'model_team_{0}.columns'.format(team_number + 1)))
+        assert stored.meta['objective'] == pytest.approx(model.objective(),
+                                                         rel=1e-6)
+
+
+def test_benchmark_writes_every_case(make_config, tmp_path):
+    config_path = make_config(solver='highs', solver_backend='direct')
+    output_file_path = str(tmp_path / 'benchmark.json')
+
+    measurements, file_path = benchmark.run_benchmark(
+        config_path, horizons=[24, 48], team_counts=[1],
+        output_file_path=output_file_path)
+
+    assert file_path == output_file_path
+    with open(file_path) as f:
+        assert json.load(f) == json.loads(json.dumps(measurements))
+    table = benchmark.summary(measurements)
+    assert list(table.index) == [(24, 1), (48, 1)]
+    assert list(table.columns[:len(benchmark.stages)]) == benchmark.stages
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Timers, counters and the statistics of a team, against the solve they
+describe.
+
+"""
+
+import pstats
+
+import pytest
+
+import instrumentation
+import results_store
+
+
+@pytest.fixture
+def dumps(tmp_path, monkeypatch):
+    monkeypatch.setattr(results_store, 'dump_path', str(tmp_path))
+    monkeypatch.setattr(instrumentation, 'profile_path',
+                        str(tmp_path / 'profiles'))
+    instrumentation.start_team()
+    return tmp_path
+
+
+def test_timer_adds_up_and_counts_failed_stages(dumps):
+    with instrumentation.timer('solve'):
+        pass
+    with pytest.raises(RuntimeError):
+        with instrumentation.timer('solve'):
+            raise RuntimeError
+    instrumentation.count('result cache hits')
+    instrumentation.count('result cache hits', 2)
+
+    stats = instrumentation.stats()
+    assert list(stats) == ['time solve [s]', 'result cache hits']
+    assert stats['time solve [s]'] >= 0
+    assert stats['result cache hits'] == 3
+
+    instrumentation.start_team()
+    assert instrumentation.stats() == {}
+
+
+def test_stats_round_trip(dumps):
+    assert instrumentation.read_stats(0) == {}
+    instrumentation.record_solve({'solve_time': 0.5, 'variables': 10,
+                                  'constraints': 4, 'nonzeros': 20,
+                                  'iterations': None})
+    instrumentation.write_stats(0)
+    assert instrumentation.read_stats(0) == {
+        'solver time [s]': 0.5, 'LP variables': 10, 'LP constraints': 4,
+        'LP nonzeros': 20, 'solver iterations': None}
+    assert instrumentation.read_stats(1) == {}
+
+
+def test_team_statistics_describe_its_solve(make_config, dumps):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system, run_model
+    import run_context
+    import solver_backend
+
+    config_path = make_config(solver='highs', solver_backend='direct',
+                              number_of_time_steps=48, profile_teams=True)
+    instrumentation.run_team(run_model, config_path, 1)
+    stats = instrumentation.read_stats(1)
+
+    context = run_context.get(config_path)
+    model = solph.Model(create_energy_system(context.parameters(1),
+                                             context.data, 48))
+    info = solver_backend.solve(model, 'highs', 'direct')
+    for key in ['variables', 'constraints', 'nonzeros']:
+        assert stats[instrumentation.solve_stats[key]] == info[key]
+
+    # Every stage is part of the total
+    stages = [name for name in stats
+              if name.startswith('time ') and name != 'time total [s]']
+    assert 'time solve [s]' in stages
+    assert sum(stats[name] for name in stages) <= stats['time total [s]']
+
+    profile = pstats.Stats(str(dumps / 'profiles' / 'model_team_2.prof'))
+    assert any(function == 'run_model'
+               for _, _, function in profile.stats)
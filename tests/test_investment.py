@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Investment optimisation: the objective of the optimal design and its
+re-evaluation with the dispatch of the full time series.
+
+"""
+
+import numpy as np
+import oemof.solph as solph
+import pytest
+
+import investment
+import kpi
+from model_energy_system import create_energy_system, flow_sums
+import run_context
+import solver_backend
+
+pytest.importorskip('highspy')
+
+spec = {'base_design_file_name': 'parameters_Team_01.csv'}
+
+
+def _optimise(config_path, technologies):
+    """Return the optimal design and its total costs of the model."""
+    inputs = investment.prepare(config_path, spec)
+    model = investment.build_model(
+        inputs['param_value'], inputs['data'],
+        inputs['number_of_time_steps'], technologies, inputs['aggregation'])
+    solve_info = solver_backend.solve(model, 'highs', 'direct')
+    assert solve_info['termination'] == 'optimal'
+    design, kpis = investment.design_kpis(model, inputs, technologies)
+    return inputs['param_value'], design, kpis['total_costs']
+
+
+def _evaluate(config_path, param_value, design, number_of_time_steps):
+    """Return the total costs of the dispatch of a design on the full time
+    series."""
+    param_value = param_value.copy()
+    for name, value in design.items():
+        param_value[name] = value
+    model = solph.Model(create_energy_system(
+        param_value, run_context.get(config_path).data,
+        number_of_time_steps))
+    solver_backend.solve(model, 'highs', 'direct')
+    kpis = kpi.compute_kpis(
+        design=kpi.design_matrix([param_value]),
+        sums=kpi.sums_vector(flow_sums(model))[np.newaxis],
+        param_value=param_value)
+    return kpis['total_costs'][0]
+
+
+def test_aggregated_storage_does_not_shift_energy_between_periods(
+        make_config):
+    config_path = make_config(
+        number_of_time_steps=336, solver='highs', solver_backend='direct',
+        time_series_aggregation=True, number_of_typical_periods=7,
+        hours_per_typical_period=24)
+    # The thermal storage is invested with a fixed size, the converters
+    # are optimised
+    technologies = {'number_of_chps': {}, 'number_of_heat_pumps': {},
+                    'number_of_boilers': {},
+                    'capacity_thermal_storage': {'minimum': 10,
+                                                 'maximum': 10}}
+    param_value, design, total_costs = _optimise(config_path, technologies)
+
+    assert design['capacity_thermal_storage'] == pytest.approx(10)
+    assert total_costs == pytest.approx(
+        _evaluate(config_path, param_value, design, 336), rel=5e-3)
+
+
+def test_optimal_design_is_the_cheapest_to_operate(make_config):
+    config_path = make_config(number_of_time_steps=168, solver='highs',
+                              solver_backend='direct')
+    technologies = {'number_of_chps': {}, 'number_of_boilers': {},
+                    'area_solar_th': {'maximum': 8},
+                    'capacity_electr_storage': {'maximum': 7},
+                    'capacity_thermal_storage': {'maximum': 90}}
+    param_value, design, total_costs = _optimise(config_path, technologies)
+
+    assert total_costs == pytest.approx(
+        _evaluate(config_path, param_value, design, 168), rel=1e-6)
+    # No other capacity of one of the technologies is cheaper
+    for name in technologies:
+        for factor in [0.8, 1.25]:
+            changed = design.copy()
+            changed[name] = design[name] * factor + (factor - 1)
+            changed[name] = min(max(changed[name], 0),
+                                technologies[name].get('maximum', np.inf))
+            assert _evaluate(config_path, param_value, changed, 168) >= (
+                total_costs * (1 - 1e-6))
+
+
+def test_whole_units(make_config):
+    config_path = make_config(number_of_time_steps=48, solver='highs',
+                              solver_backend='direct')
+    technologies = {'number_of_chps': {'integer': True, 'maximum': 20},
+                    'number_of_boilers': {'integer': True, 'maximum': 10}}
+    param_value, design, total_costs = _optimise(config_path, technologies)
+
+    for name, value in design.items():
+        assert value == int(value)
+        assert 0 <= value <= technologies[name]['maximum']
+    assert total_costs == pytest.approx(
+        _evaluate(config_path, param_value, design, 48), rel=1e-6)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+The vectorised KPIs against the scalar formulas of the analysis before
+'kpi' (one energy system at a time, see the Changelog).
+
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import kpi
+
+general_parameters = pd.Series({
+    'invest_cost_chp': 1.2e6, 'invest_cost_boiler': 2e5,
+    'invest_cost_wind': 3e6, 'invest_cost_heatpump': 9e5,
+    'invest_cost_storage_el': 2.6e7, 'invest_cost_storage_th': 1.4e7,
+    'invest_cost_pv': 8e5, 'invest_cost_solarthermal': 6e5,
+    'invest_cost_PV_pp': 7e5, 'PV_pp_surface_area': 5,
+    'lifetime': 20, 'wacc': 0.05,
+    'var_costs_gas': 30, 'var_costs_shortage_bel': 200,
+    'var_costs_shortage_bth': 90,
+    'emission_el': 400, 'emission_heat': 250, 'emission_gas': 200})
+
+
+def _annuity(capex, n, wacc):
+    # oemof.tools.economics.annuity
+    return capex * (wacc * (1 + wacc) ** n) / ((1 + wacc) ** n - 1)
+
+
+def scalar_kpis(design, sums, param_value):
+    """KPIs of one energy system, formula by formula."""
+    design = dict(zip([name for name, _ in kpi.technologies], design))
+    flow = dict(zip([name for name, _ in kpi.flows], sums))
+    total_annuity = 0
+    for name, cost in kpi.technologies:
+        capex = design[name] * param_value[cost]
+        if name == 'number_of_PV_pp':
+            capex = capex * param_value['PV_pp_surface_area']
+        total_annuity += _annuity(capex, param_value['lifetime'],
+                                  param_value['wacc'])
+    var_costs = (flow['gas'] * param_value['var_costs_gas']
+                 + flow['el_shortage'] * param_value['var_costs_shortage_bel']
+                 + flow['heat_shortage']
+                 * param_value['var_costs_shortage_bth'])
+    emissions = (flow['el_shortage'] * param_value['emission_el']
+                 + flow['heat_shortage'] * param_value['emission_heat']
+                 + (flow['gas_chp'] + flow['gas_boiler'])
+                 * param_value['emission_gas'])
+    coverage_el = ((flow['el_demand'] + flow['el_hp'] - flow['el_shortage'])
+                   / (flow['el_demand'] + flow['el_hp']))
+    coverage_heat = ((flow['heat_demand'] - flow['heat_shortage'])
+                     / flow['heat_demand'])
+    return {'annuity': total_annuity, 'var_costs': var_costs,
+            'total_costs': var_costs + total_annuity, 'emissions': emissions,
+            'coverage_el': coverage_el, 'coverage_heat': coverage_heat,
+            'selfsufficiency': (coverage_el + coverage_heat) / 2}
+
+
+@pytest.fixture
+def systems():
+    rng = np.random.default_rng(1)
+    design = rng.integers(0, 5, size=(6, len(kpi.technologies)))
+    sums = rng.uniform(1, 1000, size=(6, len(kpi.flows)))
+    return design, sums
+
+
+def test_compute_kpis_matches_scalar_formulas(systems):
+    design, sums = systems
+    kpis = kpi.compute_kpis(design, sums, general_parameters)
+    for i in range(len(design)):
+        expected = scalar_kpis(design[i], sums[i], general_parameters)
+        for name, value in expected.items():
+            assert kpis[name][i] == pytest.approx(value, rel=1e-12)
+
+
+def test_compute_kpis_with_one_parameter_value_per_system(systems):
+    design, sums = systems
+    wacc = np.linspace(0.01, 0.1, len(design))
+    kpis = kpi.compute_kpis(design, sums,
+                            dict(general_parameters, wacc=wacc))
+    for i in range(len(design)):
+        expected = scalar_kpis(design[i], sums[i],
+                               dict(general_parameters, wacc=wacc[i]))
+        assert kpis['total_costs'][i] == pytest.approx(
+            expected['total_costs'], rel=1e-12)
+
+
+def test_annual_sums_of_missing_technologies_are_zero():
+    index = pd.RangeIndex(3)
+    string_results = {('rgas', 'natural_gas'): {
+        'sequences': pd.DataFrame({'flow': [1.0, 2.0, np.nan]},
+                                  index=index)}}
+    sums = kpi.annual_sums(string_results)
+    assert sums[0] == 3
+    assert not sums[1:].any()
+
+
+def test_annuity_rejects_parameters_out_of_bounds():
+    with pytest.raises(ValueError):
+        kpi.annuity(1, 0, 0.05)
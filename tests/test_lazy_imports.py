@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+The analysis of columnar results starts without oemof.solph, Pyomo and
+matplotlib, and gives the sums of the oemof results.
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+import results_store
+
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                        'src')
+
+slow_modules = ['oemof.solph', 'pyomo.environ', 'matplotlib.pyplot']
+
+
+def _run_python(script):
+    env = dict(os.environ, PYTHONPATH=src_path)
+    env.pop('MPLBACKEND', None)
+    result = subprocess.run([sys.executable, '-c', textwrap.dedent(script)],
+                            cwd=src_path, env=env, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_modules_of_main_are_imported_without_the_slow_ones():
+    imported = _run_python("""
+        import json
+        import os
+        import sys
+
+        import basic_analysis, detailed_analysis, main, results_store
+
+        print(json.dumps({{'modules': [name for name in {modules!r}
+                                       if name in sys.modules],
+                           'backend': os.environ['MPLBACKEND']}}))
+        """.format(modules=slow_modules))
+    assert imported == {'modules': [], 'backend': 'Agg'}
+
+
+def test_columnar_results_are_analysed_without_oemof(make_config, tmp_path,
+                                                     monkeypatch):
+    pytest.importorskip('highspy')
+    import kpi
+    from model_energy_system import run_model
+
+    monkeypatch.setattr(results_store, 'dump_path', str(tmp_path))
+    results_store._loaded_results.clear()
+    sums = {}
+    for results_format in ['oemof', 'columnar']:
+        config_path = make_config(solver='highs', solver_backend='direct',
+                                  number_of_time_steps=48,
+                                  results_format=results_format)
+        run_model(config_path, 0)
+        sums[results_format] = kpi.annual_sums(
+            results_store.load_string_results(
+                {'results_format': results_format}, 0))
+
+    loaded = _run_python("""
+        import json
+        import sys
+
+        import kpi, results_store
+
+        results_store.dump_path = {dump_path!r}
+        sums = kpi.annual_sums(results_store.load_string_results(
+            {{'results_format': 'columnar'}}, 0))
+        print(json.dumps({{'modules': [name for name in {modules!r}
+                                       if name in sys.modules],
+                           'sums': sums.tolist()}}))
+        """.format(dump_path=str(tmp_path), modules=slow_modules))
+    assert loaded['modules'] == []
+    np.testing.assert_allclose(loaded['sums'], sums['oemof'], rtol=1e-9)
+    np.testing.assert_allclose(sums['columnar'], sums['oemof'], rtol=1e-9)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Merit order dispatch: the storage operation, the closed form of designs
+with a fixed dispatch and its equality with the LP optimum, and the
+feasibility of the simulated dispatch for the LP.
+
+"""
+
+import numpy as np
+import pytest
+
+import merit_order
+import run_context
+
+
+def _storage(**values):
+    s = {'size': 10.0, 'power': 2.0, 'loss': 0.0, 'eta_in': 1.0,
+         'eta_out': 0.9, 'initial': 5.0}
+    s.update(values)
+    return s
+
+
+def _surplus_and_need(hours=48):
+    rng = np.random.default_rng(2)
+    # Surplus in the first half, need in the second one, so the storage
+    # is full at noon and the need alone does not empty it
+    surplus = np.where(np.arange(hours) < hours // 2,
+                       rng.uniform(0, 3, hours), 0)
+    need = np.where(np.arange(hours) >= hours // 2,
+                    rng.uniform(0, 0.2, hours), 0)
+    return surplus, need
+
+
+@pytest.mark.parametrize('loss', [0.0, 0.02])
+def test_storage_ends_at_its_initial_level(loss):
+    s = _storage(loss=loss)
+    surplus, need = _surplus_and_need()
+    charged, discharged, contents = merit_order._operate_storage(
+        s, surplus.tolist(), need.tolist(), min, max)
+
+    assert contents[-1] == pytest.approx(s['initial'])
+    assert min(contents) >= s['initial'] - 1e-9
+    assert max(contents) <= s['size'] + 1e-9
+    assert max(charged) <= s['power'] + 1e-9
+    assert max(discharged) <= s['power'] + 1e-9
+    # Balance of every hour
+    for t in range(len(charged)):
+        assert contents[t + 1] == pytest.approx(
+            contents[t] * (1 - loss) + charged[t] * s['eta_in']
+            - discharged[t] / s['eta_out'])
+
+
+def test_storage_operation_of_many_designs_matches_one_design():
+    surplus, need = _surplus_and_need()
+    designs = 20
+    s = {name: np.full(designs, value)
+         for name, value in _storage(loss=0.01).items()}
+    s['size'] = np.linspace(0, 12, designs)
+    s['power'] = s['size'] / 4
+    s['initial'] = s['size'] / 2
+    surplus = np.tile(surplus, (designs, 1))
+    need = np.tile(need, (designs, 1))
+
+    many = merit_order._storage_operation(s, surplus, need)
+    for i in [0, 7, designs - 1]:
+        one = merit_order._operate_storage(
+            {name: float(value[i]) for name, value in s.items()},
+            surplus[i].tolist(), need[i].tolist(), min, max)
+        for values, value in zip(many, one):
+            np.testing.assert_allclose(values[i], value, atol=1e-12)
+    np.testing.assert_allclose(many[2][:, -1], s['initial'], atol=1e-9)
+
+
+def _fixed_design(param_value):
+    param_value = param_value.copy()
+    for name in ('number_of_chps', 'number_of_heat_pumps',
+                 'number_of_boilers', 'capacity_electr_storage',
+                 'capacity_thermal_storage'):
+        param_value[name] = 0
+    return param_value
+
+
+def test_has_fixed_dispatch(make_config):
+    param_value = run_context.get(make_config()).parameters(0)
+    fixed = _fixed_design(param_value)
+    assert merit_order.has_fixed_dispatch(fixed)
+
+    for name in ('number_of_chps', 'capacity_thermal_storage'):
+        design = fixed.copy()
+        design[name] = 1
+        assert not merit_order.has_fixed_dispatch(design)
+
+    # Buying and dumping energy would pay off in the LP
+    fixed['var_costs_excess_bel'] = -fixed['var_costs_shortage_bel'] - 1
+    assert not merit_order.has_fixed_dispatch(fixed)
+
+
+@pytest.mark.parametrize('loss', [0.0, 0.01])
+def test_simulated_storages_end_at_their_initial_level(make_config, loss):
+    context = run_context.get(make_config())
+    param_values = []
+    for n in range(context.cfg['number_of_teams']):
+        param_value = context.parameters(n).copy()
+        param_value['capacity_loss_storage_el'] = loss
+        param_value['capacity_loss_storage_th'] = loss
+        param_values.append(param_value)
+    results, contents = merit_order.simulate(param_values, context.data, 168)
+
+    assert not merit_order.end_level_deviation(
+        contents, param_values).max() > 1e-6
+    for value in results.values():
+        assert value.min() >= -1e-9
+
+
+def test_closed_form_is_the_lp_optimum(make_config):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system, flow_sums
+    import solver_backend
+
+    context = run_context.get(make_config())
+    param_value = _fixed_design(context.parameters(0))
+    results, meta = merit_order.run(param_value, context.data, 168)
+    assert meta['solve']['backend'] == 'closed_form'
+
+    model = solph.Model(create_energy_system(param_value, context.data, 168))
+    solver_backend.solve(model, 'highs', 'direct')
+    assert meta['objective'] == pytest.approx(model.objective(), rel=1e-6)
+    for key, value in flow_sums(model).items():
+        assert results[key]['sequences']['flow'].sum() == pytest.approx(
+            value, rel=1e-6, abs=1e-6)
+
+
+def test_simulated_dispatch_is_feasible_for_the_lp(make_config):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import solver_backend
+
+    context = run_context.get(make_config())
+    param_value = context.parameters(0).copy()
+    param_value['capacity_loss_storage_th'] = 0.01
+    results, meta = merit_order.run(param_value, context.data, 168)
+
+    # The LP with every flow fixed to the simulated dispatch
+    model = solph.Model(create_energy_system(param_value, context.data, 168))
+    for o, i in model.FLOWS:
+        flow = results[str(o), str(i)]['sequences']['flow'].to_numpy()
+        for t in model.TIMESTEPS:
+            model.flow[o, i, t].fix(max(flow[t], 0))
+    solve_info = solver_backend.solve(model, 'highs', 'direct')
+    assert solve_info['termination'] == 'optimal'
+    assert model.objective() == pytest.approx(meta['objective'], rel=1e-6)
+
+
+def test_gas_budget_goes_to_the_most_valuable_hours(make_config):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import solver_backend
+
+    context = run_context.get(make_config())
+    param_value = context.parameters(2).copy()
+    param_value['capacity_electr_storage'] = 0
+    param_value['capacity_thermal_storage'] = 0
+    results, _ = merit_order.simulate([param_value], context.data, 168)
+    # A budget of 40% of the gas the dispatch would use
+    budget = 0.4 * results['rgas', 'natural_gas'].sum()
+    param_value['full_load_time_max_gas'] = budget / param_value[
+        'nom_val_gas']
+
+    results, meta = merit_order.run(param_value, context.data, 168)
+    assert results['rgas', 'natural_gas']['sequences']['flow'].sum() == (
+        pytest.approx(budget))
+
+    model = solph.Model(create_energy_system(param_value, context.data, 168))
+    solver_backend.solve(model, 'highs', 'direct')
+    # First come, first served the costs were 2.6% above the optimum
+    assert meta['objective'] == pytest.approx(model.objective(), rel=1.5e-2)
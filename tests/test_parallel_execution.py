@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Callback of the teams whose optimisation succeeded.
+
+"""
+
+import parallel_execution
+
+
+def test_error_in_callback_fails_only_this_team():
+    def on_team_done(n):
+        if n == 1:
+            raise ValueError('analysis failed')
+
+    failed_teams = {}
+    for n in range(3):
+        parallel_execution._team_done(on_team_done, n, failed_teams)
+    assert list(failed_teams) == [1]
+    assert 'analysis failed' in failed_teams[1]
+
+
+def test_no_callback():
+    failed_teams = {}
+    parallel_execution._team_done(None, 0, failed_teams)
+    assert failed_teams == {}
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Solver backend of the Pareto front and the points of the front.
+
+"""
+
+import numpy as np
+import pytest
+import yaml
+
+import pareto
+
+
+def test_persistent_backend_if_the_solver_supports_it():
+    cfg = {'solver': 'highs', 'solver_backend': 'shell'}
+    assert pareto.solver_backend_name({}, cfg) == 'persistent'
+
+
+def test_backend_of_config_otherwise():
+    cfg = {'solver': 'cbc', 'solver_backend': 'shell'}
+    assert pareto.solver_backend_name({}, cfg) == 'shell'
+    assert pareto.solver_backend_name({}, {'solver': 'cbc'}) == 'shell'
+
+
+def test_backend_of_the_specification():
+    cfg = {'solver': 'highs', 'solver_backend': 'persistent'}
+    spec = {'pareto_solver_backend': 'direct'}
+    assert pareto.solver_backend_name(spec, cfg) == 'direct'
+
+
+@pytest.mark.parametrize('aggregation', [False, True])
+def test_costs_rise_and_emissions_fall_as_the_cap_tightens(
+        make_config, tmp_path, aggregation):
+    pytest.importorskip('highspy')
+
+    config_path = make_config(
+        number_of_time_steps=336, solver='highs', solver_backend='direct',
+        time_series_aggregation=aggregation, number_of_typical_periods=7,
+        hours_per_typical_period=24)
+    spec_path = tmp_path / 'investment.yml'
+    spec_path.write_text(yaml.safe_dump({
+        'base_design_file_name': 'parameters_Team_01.csv',
+        'technologies': {'number_of_windturbines': {'maximum': 20},
+                         'number_of_chps': {'maximum': 20},
+                         'number_of_heat_pumps': {'maximum': 10},
+                         'capacity_thermal_storage': {'maximum': 10}},
+        'pareto_solver_backend': 'persistent'}))
+    spec_path = str(spec_path)
+
+    highest = pareto.solve_end(config_path, spec_path, 'costs')['emissions']
+    lowest = pareto.solve_end(config_path, spec_path,
+                              'emissions')['emissions']
+    assert lowest < highest
+    caps = list(np.linspace(highest, lowest, 6)[1:])
+    caps[-1] += 1e-6 * highest
+    rows = pareto.solve_caps(config_path, spec_path, caps)
+    assert [row['emission_cap'] for row in rows] == caps
+
+    for row, next_row in zip(rows, rows[1:]):
+        assert next_row['total_costs'] >= row['total_costs'] * (1 - 1e-6)
+        assert next_row['emissions'] <= row['emissions'] * (1 + 1e-6)
+    for row in rows:
+        assert row['emissions'] <= row['emission_cap'] * (1 + 1e-6)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Persistent model: the teams solved one after another with updated
+capacities against a cold solve of the model of each team.
+
+"""
+
+import pytest
+
+import run_context
+
+pytest.importorskip('highspy')
+
+
+@pytest.mark.parametrize('backend', ['direct', 'persistent'])
+def test_updated_model_gives_the_optimum_of_every_team(make_config,
+                                                       backend):
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import persistent_model
+    import solver_backend
+
+    config_path = make_config(number_of_teams=8)
+    context = run_context.get(config_path)
+    # Team 8 has no converters and storages, its design is solved between
+    # the others, so every capacity is set down to zero and up again
+    for n in [0, 7, 5, 1, 3, 2, 6, 4]:
+        param_value = context.parameters(n)
+        model, data = persistent_model.get_persistent_model(
+            param_value, context.file_path_ts, 168, data=context.data)
+        persistent_model.update_capacities(
+            model, create_energy_system(param_value, data, 168))
+        solver_backend.solve(model, 'highs', backend)
+
+        cold = solph.Model(create_energy_system(param_value, data, 168))
+        solver_backend.solve(cold, 'highs', 'direct')
+        # The dispatch may be another one of the same costs
+        assert model.objective() == pytest.approx(cold.objective(),
+                                                  rel=1e-6), n
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Staleness rules of the incremental pipeline.
+
+"""
+
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+import detailed_analysis
+import pipeline
+
+
+def test_node_is_fresh_until_its_inputs_or_outputs_change(tmp_path):
+    output = tmp_path / 'results.csv'
+    output.write_text('a')
+    manifest = {'version': pipeline._version, 'nodes': {}}
+
+    assert not pipeline.is_fresh(manifest, 'table', 'f1')
+    pipeline.record(manifest, 'table', 'f1', outputs=[str(output)])
+    assert pipeline.is_fresh(manifest, 'table', 'f1')
+    assert not pipeline.is_fresh(manifest, 'table', 'f2')
+
+    output.write_text('changed')
+    assert not pipeline.is_fresh(manifest, 'table', 'f1')
+    pipeline.record(manifest, 'table', 'f1', outputs=[str(output)])
+    output.unlink()
+    assert not pipeline.is_fresh(manifest, 'table', 'f1')
+
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch):
+    """Run 'pipeline.analyse' with stand-ins of the analysis and the plot,
+    return the calls of the stages."""
+    plotting_path = tmp_path / 'plotting.py'
+    shutil.copyfile(pipeline.plotting_path, plotting_path)
+    monkeypatch.setattr(pipeline, 'plotting_path', str(plotting_path))
+    monkeypatch.setattr(pipeline, 'manifest_path',
+                        str(tmp_path / 'pipeline.json'))
+    monkeypatch.setattr(pipeline, 'tables_path', str(tmp_path) + '/')
+    monkeypatch.setattr(detailed_analysis, 'results_table_path',
+                        str(tmp_path / 'results.csv'))
+
+    calls = []
+
+    def analyse_energy_system(config_path, team_number):
+        calls.append(('kpis', team_number))
+        return pd.DataFrame({'costs': [float(team_number)]})
+
+    def plot_team_results(config_path, df_basic_results_and_team_decision,
+                          preview=False):
+        calls.append(('plot',))
+        file_path = tmp_path / 'results.png'
+        file_path.write_bytes(b'png')
+        return str(file_path)
+
+    monkeypatch.setattr(detailed_analysis, 'analyse_energy_system',
+                        analyse_energy_system)
+    monkeypatch.setattr(detailed_analysis, 'plot_team_results',
+                        plot_team_results)
+    return calls
+
+
+def _analyse(config_path):
+    manifest = pipeline.load_manifest()
+    pipeline.analyse(config_path, [0, 1], manifest)
+
+
+def test_only_stale_stages_run_again(make_config, stages):
+    config_path = make_config()
+    _analyse(config_path)
+    assert stages == [('kpis', 0), ('kpis', 1), ('plot',)]
+
+    del stages[:]
+    _analyse(config_path)
+    assert stages == []
+
+    # Only the plot depends on its resolution
+    config_path = make_config(plot_dpi=100)
+    _analyse(config_path)
+    assert stages == [('plot',)]
+
+
+def test_plotting_code_is_fingerprinted_without_importing_it(make_config,
+                                                             stages):
+    config_path = make_config()
+    _analyse(config_path)
+    sys.modules.pop('plotting', None)
+
+    del stages[:]
+    _analyse(config_path)
+    assert stages == []
+    assert 'plotting' not in sys.modules
+
+    with open(pipeline.plotting_path, 'a') as f:
+        f.write('\n# changed\n')
+    _analyse(config_path)
+    assert stages == [('plot',)]
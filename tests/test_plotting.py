@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Reused figures of the plots against figures drawn from scratch.
+
+"""
+
+import io
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+import plotting
+
+
+def _teams(costs, emissions, selfsufficiency):
+    return pd.DataFrame({
+        'team name': ['Team {0}'.format(i + 1) for i in range(len(costs))],
+        'costs': costs, 'emissions': emissions,
+        'selfsufficiency': selfsufficiency})
+
+
+def _pixels(plot):
+    import matplotlib.image
+
+    buffer = io.BytesIO()
+    plot.figure.savefig(buffer, format='png', dpi=50)
+    buffer.seek(0)
+    return matplotlib.image.imread(buffer, format='png')
+
+
+def test_updated_results_plot_equals_a_new_one():
+    reused = plotting.ResultsPlot()
+    reused.update(_teams([10, 20, 30], [5000, 15000, 25000], [1, 2, 3]),
+                  'first', front=pd.DataFrame({'total_costs': [5e6, 4e7],
+                                               'emissions': [3e7, 2e6]}))
+    _pixels(reused)
+    teams = _teams([12, 25], [30000, 8000], [4, 0.5])
+    reused.update(teams, 'second')
+
+    new = plotting.ResultsPlot()
+    new.update(teams, 'second')
+    assert len(reused.annotations) == 2
+    np.testing.assert_array_equal(_pixels(reused), _pixels(new))
+
+
+def test_dispatch_plot_reused_for_every_team():
+    index = np.arange(24)
+    results = [
+        {('chp', 'electricity'): {'sequences': pd.DataFrame(
+            {'flow': index * 0.1})},
+         ('electricity', 'demand_el'): {'sequences': pd.DataFrame(
+             {'flow': np.full(24, 2.0)})},
+         ('boiler', 'heat'): {'sequences': pd.DataFrame(
+             {'flow': np.full(24, 3.0)})}},
+        {('wind_turbine', 'electricity'): {'sequences': pd.DataFrame(
+            {'flow': np.cos(index) + 1})},
+         ('heat', 'demand_th'): {'sequences': pd.DataFrame(
+             {'flow': np.full(24, 1.0)})}}]
+
+    reused = plotting.DispatchPlot()
+    for team_results in results:
+        reused.update(team_results, 'Team')
+        _pixels(reused)
+    new = plotting.DispatchPlot()
+    new.update(results[-1], 'Team')
+    np.testing.assert_array_equal(_pixels(reused), _pixels(new))
+
+
+def test_plots_leave_pyplot_and_rcparams_alone(tmp_path, monkeypatch):
+    import matplotlib.pyplot as plt
+
+    monkeypatch.setattr(plotting, 'plots_path', str(tmp_path) + '/')
+    monkeypatch.setattr(plotting, 'tables_path', str(tmp_path) + '/')
+    monkeypatch.setattr(plotting, '_figures', {})
+    rc_params = dict(matplotlib.rcParams)
+    figures = plt.get_fignums()
+    cfg = {'workshop_title': 'Workshop', 'team_names': ['A', 'B'],
+           'plot_format': 'svg', 'preview_plot_dpi': 20}
+
+    file_path = plotting.plot_results(_teams([10, 20], [5000, 9000], [1, 2]),
+                                      cfg, preview=True)
+    results = {('boiler', 'heat'): {'sequences': pd.DataFrame(
+        {'flow': np.ones(4)})}}
+    file_paths = plotting.plot_dispatch(cfg, [0, 1], lambda n: results,
+                                        preview=True)
+
+    assert file_path == str(tmp_path / 'results.svg')
+    assert file_paths == [str(tmp_path / 'dispatch_team_1.svg'),
+                          str(tmp_path / 'dispatch_team_2.svg')]
+    assert sorted(os.listdir(tmp_path)) == [
+        'dispatch_team_1.svg', 'dispatch_team_2.svg', 'results.svg']
+    assert plt.get_fignums() == figures
+    assert dict(matplotlib.rcParams) == rc_params
+
+    with pytest.raises(ValueError):
+        plotting.plot_file_path('results', dict(cfg, plot_format='pdf'))
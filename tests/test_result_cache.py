@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Invalidation and eviction of the result cache.
+
+"""
+
+import os
+
+import pytest
+
+import result_cache
+import results_store
+import run_context
+
+
+@pytest.fixture
+def inputs(make_config):
+    context = run_context.get(make_config())
+    return {'param_value': context.parameters(0),
+            'file_path_ts': context.file_path_ts, 'solver': 'cbc',
+            'number_of_time_steps': 168}
+
+
+def test_same_design_gives_same_key(inputs):
+    key = result_cache.cache_key(**inputs)
+    # The order of the parameters does not matter
+    reordered = dict(inputs, param_value=inputs['param_value'][::-1])
+    assert result_cache.cache_key(**reordered) == key
+
+
+@pytest.mark.parametrize('change', [
+    {'solver': 'highs'},
+    {'number_of_time_steps': 8760},
+    {'solver_backend': 'direct'},
+    {'aggregation': (12, 24)},
+    {'rolling_horizon': (720, 48)},
+    {'dispatch_engine': 'merit_order'}])
+def test_settings_change_the_key(inputs, change):
+    assert (result_cache.cache_key(**dict(inputs, **change))
+            != result_cache.cache_key(**inputs))
+
+
+def test_design_changes_the_key(inputs):
+    param_value = inputs['param_value'].copy()
+    param_value['number_of_chps'] += 1
+    assert (result_cache.cache_key(**dict(inputs, param_value=param_value))
+            != result_cache.cache_key(**inputs))
+
+
+def test_key_covers_the_code_of_the_results(inputs, monkeypatch):
+    hashed = []
+    hash_file = result_cache._hash_file
+    monkeypatch.setattr(result_cache, '_hash_file', lambda file_path, hasher:
+                        hashed.append(os.path.basename(file_path))
+                        or hash_file(file_path, hasher))
+    result_cache.cache_key(**inputs)
+    for module_file in ('model_energy_system.py', 'persistent_model.py',
+                        'solver_backend.py', 'result_extraction.py',
+                        'results_store.py'):
+        assert module_file in hashed
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, 'cache_path', str(tmp_path / 'cache'))
+    monkeypatch.setattr(results_store, 'dump_path', str(tmp_path / 'dumps'))
+    os.makedirs(results_store.dump_path)
+
+    def write_results(team_number, size):
+        with open(results_store.results_file_path(team_number), 'wb') as f:
+            f.write(b'x' * size)
+
+    return write_results
+
+
+def test_load_copies_a_stored_entry(cache):
+    cache(0, 10)
+    assert not result_cache.load('a', 1)
+    result_cache.store('a', 0)
+    assert result_cache.load('a', 1)
+    with open(results_store.results_file_path(1), 'rb') as f:
+        assert f.read() == b'x' * 10
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    megabyte = 1024 ** 2
+    for key, atime in [('old', 1), ('used', 2), ('new', 3)]:
+        cache(0, megabyte)
+        result_cache.store(key, 0, max_size_mb=10)
+        entry = result_cache._entry_path(key, 'oemof')
+        os.utime(entry, (atime, atime))
+    # 'used' is read again, so 'old' is the least recently used entry
+    result_cache.load('used', 1)
+
+    result_cache.evict(max_size_mb=2)
+    assert not result_cache.load('old', 1)
+    assert result_cache.load('used', 1)
+    assert result_cache.load('new', 1)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+The results extracted in bulk against 'solph.processing.results'.
+
+"""
+
+import numpy as np
+import pytest
+
+import run_context
+
+pytest.importorskip('highspy')
+
+
+def test_extract_results_matches_solph_processing(make_config):
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import result_extraction
+    import solver_backend
+
+    context = run_context.get(make_config())
+    model = solph.Model(create_energy_system(context.parameters(0),
+                                             context.data, 48))
+    solver_backend.solve(model, 'highs', 'direct')
+
+    extracted = result_extraction.extract_results(model)
+    processed = solph.views.convert_keys_to_strings(
+        solph.processing.results(model))
+
+    assert sorted(extracted) == sorted(processed)
+    for key, value in processed.items():
+        sequences = extracted[key]['sequences']
+        assert sorted(sequences.columns) == sorted(value['sequences'].columns)
+        for name in value['sequences'].columns:
+            np.testing.assert_allclose(sequences[name].to_numpy(),
+                                       value['sequences'][name].to_numpy(),
+                                       equal_nan=True)
+        assert dict(extracted[key]['scalars']) == pytest.approx(
+            dict(value['scalars']))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Round trip of the columnar results format.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import results_store
+
+
+@pytest.fixture
+def results():
+    index = pd.date_range('1/1/2030', periods=5, freq='H')
+    return {
+        ('rgas', 'natural_gas'): {
+            'sequences': pd.DataFrame({'flow': [1.0, 2.0, 3.0, 4.0, np.nan]},
+                                      index=index),
+            'scalars': pd.Series(dtype=float)},
+        ('storage_th', None): {
+            'sequences': pd.DataFrame(
+                {'storage_content': [5.0, 4.0, 3.0, 4.0, 5.0],
+                 'storage_losses': [0.0, 0.0, 0.0, 0.0, np.nan]},
+                index=index),
+            'scalars': pd.Series({'invest': 12.5})}}
+
+
+def _assert_same_results(loaded, results):
+    assert sorted(loaded) == sorted((source, str(target))
+                                    for source, target in results)
+    for (source, target), value in results.items():
+        pd.testing.assert_frame_equal(
+            loaded[source, str(target)]['sequences'], value['sequences'],
+            check_freq=False)
+        assert dict(loaded[source, str(target)]['scalars']) == dict(
+            value['scalars'])
+
+
+def test_columnar_round_trip(tmp_path, results):
+    file_path = str(tmp_path / 'model_team_1.columns')
+    meta = {'objective': 3.5, 'solve': {'backend': 'direct',
+                                        'termination': 'optimal'}}
+    results_store.write_columnar_results(results, meta, file_path)
+
+    loaded = results_store.ColumnarResults(file_path)
+    _assert_same_results(loaded, results)
+    assert loaded.meta == meta
+    assert loaded.index.equals(results['rgas', 'natural_gas'][
+        'sequences'].index)
+    np.testing.assert_array_equal(loaded.column('rgas', 'natural_gas'),
+                                  [1, 2, 3, 4, np.nan])
+
+
+def test_array_results_are_written_as_they_are(tmp_path, results):
+    first = str(tmp_path / 'first.columns')
+    second = str(tmp_path / 'second.columns')
+    results_store.write_columnar_results(results, {}, first)
+    results_store.write_columnar_results(
+        results_store.ColumnarResults(first), {}, second)
+
+    _assert_same_results(results_store.ColumnarResults(second), results)
+
+
+def test_read_rejects_other_files(tmp_path):
+    file_path = tmp_path / 'model_team_1.oemof'
+    file_path.write_bytes(b'not columnar')
+    with pytest.raises(ValueError):
+        results_store.ColumnarResults(str(file_path))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Windows of the rolling horizon.
+
+"""
+
+import pytest
+
+import rolling_horizon
+
+
+def test_windows_cover_the_time_series_once():
+    windows = rolling_horizon.windows(8760, 720, 48)
+    assert windows[0] == (0, 720)
+    assert windows[-1] == (8640, 120)
+    assert sum(kept for _, kept in windows) == 8760
+    for (start, kept), (next_start, _) in zip(windows, windows[1:]):
+        assert start + kept == next_start
+
+
+@pytest.mark.parametrize('window', [8759, 8730, 4370])
+def test_tail_shorter_than_the_overlap_is_merged(window):
+    windows = rolling_horizon.windows(8760, window, 48)
+    assert windows[-1][1] >= 48
+    assert windows[-1][0] + windows[-1][1] == 8760
+
+
+def test_single_window():
+    assert rolling_horizon.windows(168, 720, 48) == [(0, 168)]
+
+
+
+@pytest.mark.parametrize('team_number', [1, 5])
+def test_objective_is_close_to_the_full_model(make_config, team_number):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import run_context
+    import solver_backend
+
+    context = run_context.get(make_config())
+    param_value = context.parameters(team_number)
+    model = solph.Model(create_energy_system(param_value, context.data, 336))
+    solver_backend.solve(model, 'highs', 'direct')
+
+    energysystem, results, meta = rolling_horizon.solve(
+        param_value, context.data, 336, 96, 24, 'highs', 'direct')
+    assert meta['objective'] == pytest.approx(model.objective(), rel=5e-3)
+
+    # The stitched storages end at their initial level
+    for node in energysystem.nodes:
+        if isinstance(node, solph.components.GenericStorage):
+            content = results[node, None]['sequences']['storage_content']
+            assert content.iloc[-1] == pytest.approx(
+                node.initial_storage_level * node.nominal_storage_capacity)
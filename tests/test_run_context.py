@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Run context: the inputs it shares against the ones read for every team.
+
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_energy_system import load_parameters
+import run_context
+import time_series_store
+
+
+@pytest.fixture(autouse=True)
+def context_of_this_process(monkeypatch):
+    monkeypatch.setattr(run_context, '_context',
+                        {'context': None, 'shared_memory': None})
+
+
+def test_inputs_are_the_ones_of_the_files(make_config):
+    config_path = make_config()
+    context = run_context.get(config_path)
+
+    for team_number in range(context.cfg['number_of_teams']):
+        pd.testing.assert_series_equal(
+            context.parameters(team_number),
+            load_parameters(context.cfg, team_number))
+
+    data = time_series_store.read_time_series(context.file_path_ts)
+    param_value = context.parameters(0)
+    for column in data.columns:
+        np.testing.assert_allclose(context.data[column], data[column])
+    for efficiency, column in run_context.solar_yield_columns.items():
+        np.testing.assert_allclose(
+            run_context.solar_yield(context.data, param_value, efficiency),
+            data['Sol_irradiation [Wh/sqm]'] * 0.000001
+            * param_value[efficiency])
+
+
+def test_context_is_loaded_again_when_an_input_changed(make_config):
+    config_path = make_config()
+    context = run_context.get(config_path)
+    assert run_context.get(config_path) is context
+
+    mtime = os.path.getmtime(config_path)
+    os.utime(config_path, (mtime + 10, mtime + 10))
+    assert not context.is_current()
+    reloaded = run_context.get(config_path)
+    assert reloaded is not context
+    assert run_context.get(config_path) is reloaded
+    assert run_context.get(make_config()) is not reloaded
+
+
+def test_workers_read_the_shared_time_series(make_config):
+    config_path = make_config()
+    context = run_context.get(config_path)
+
+    with run_context.share(context) as shared:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+            initializer=run_context.attach, initargs=shared)
+        with executor:
+            worker_context = executor.submit(run_context.get,
+                                             config_path).result()
+
+        # Attached in this process, the time series is the shared memory
+        run_context.attach(*shared)
+        attached = run_context.get(config_path)
+        try:
+            assert attached is not context
+            assert not attached.data.to_numpy().flags.writeable
+            pd.testing.assert_frame_equal(attached.data, context.data)
+        finally:
+            del attached
+            run_context._context['context'] = None
+            run_context._context['shared_memory'].close()
+
+    pd.testing.assert_frame_equal(worker_context.data, context.data)
+    assert worker_context.cfg == context.cfg
+    pd.testing.assert_series_equal(worker_context.parameters(3),
+                                   context.parameters(3))
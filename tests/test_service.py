@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Design service: the answers over HTTP are valid JSON and a submitted
+design gets the KPIs of the optimisation of 'main.py'.
+
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import math
+
+import numpy as np
+import pytest
+
+import results_store
+import run_context
+
+pytest.importorskip('highspy')
+
+
+def _strict_json(data):
+    def reject(constant):
+        raise ValueError('{0} is not valid JSON'.format(constant))
+    return json.loads(data, parse_constant=reject)
+
+
+async def _request(port, method, target, body=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = b'' if body is None else json.dumps(body).encode()
+    writer.write('{0} {1} HTTP/1.1\r\nHost: localhost\r\n'
+                 'Content-Length: {2}\r\n\r\n'.format(
+                     method, target, len(data)).encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), _strict_json(body)
+
+
+def test_json_numbers():
+    import service
+
+    assert service._json_number(np.float64(2.5)) == 2.5
+    assert service._json_number(float('nan')) is None
+    assert service._json_number(-float('inf')) is None
+
+
+def test_design_gets_the_kpis_of_the_optimisation(make_config, tmp_path,
+                                                  monkeypatch):
+    import kpi
+    from model_energy_system import run_model
+    import service
+
+    monkeypatch.setattr(results_store, 'dump_path', str(tmp_path))
+    config_path = make_config(solver='highs', solver_backend='direct',
+                              number_of_time_steps=48,
+                              results_format='columnar')
+    context = run_context.get(config_path)
+
+    run_model(config_path, 2)
+    param_value = context.parameters(2)
+    stored = results_store.ColumnarResults(
+        results_store.results_file_path(2, 'columnar'))
+    reference = kpi.compute_kpis(
+        design=kpi.design_matrix([param_value]),
+        sums=kpi.annual_sums(stored)[np.newaxis], param_value=param_value)
+
+    solved = service.solve_design(config_path, param_value.to_dict())
+    assert solved['objective'] == pytest.approx(stored.meta['objective'],
+                                                rel=1e-6)
+    for name, values in reference.items():
+        if math.isfinite(values[0]):
+            assert solved['kpis'][name] == pytest.approx(values[0],
+                                                         rel=1e-6)
+        else:
+            assert solved['kpis'][name] is None
+    assert all(len(flow) == 48 for flow in solved['sequences'].values())
+    _strict_json(json.dumps(solved, allow_nan=False))
+
+
+def test_http_endpoints(make_config):
+    import service
+
+    config_path = make_config(solver='highs', solver_backend='direct',
+                              number_of_time_steps=48)
+    context = run_context.get(config_path)
+    design = {'number_of_chps': 3, 'number_of_boilers': 1}
+
+    async def session():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            design_service = service.DesignService(config_path, pool)
+            server = await asyncio.start_server(design_service.handle,
+                                                '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                answers = {'variables': await _request(port, 'GET',
+                                                       '/variables')}
+                status, job = await _request(
+                    port, 'POST', '/designs', {'team': 2, 'design': design})
+                answers['submitted'] = status, job
+                for _ in range(600):
+                    status, result = await _request(port, 'GET', job['url'])
+                    if result['status'] != 'pending':
+                        break
+                    await asyncio.sleep(0.05)
+                answers['result'] = status, result
+                answers['short'] = await _request(
+                    port, 'GET', job['url'] + '?sequences=false')
+                answers['again'] = await _request(
+                    port, 'POST', '/designs', {'team': 2, 'design': design})
+                answers['unknown'] = await _request(
+                    port, 'POST', '/designs', {'design': {'reactor': 1}})
+                answers['negative'] = await _request(
+                    port, 'POST', '/designs',
+                    {'design': {'number_of_chps': -1}})
+                answers['job'] = await _request(port, 'GET', '/jobs/x')
+                answers['method'] = await _request(port, 'GET', '/designs')
+            return answers
+
+    answers = asyncio.run(session())
+
+    status, variables = answers['variables']
+    assert status == 200
+    assert variables['variables'] == list(context.design_parameters(0).index)
+
+    status, job = answers['submitted']
+    assert status == 202 and job['status'] == 'pending'
+    status, result = answers['result']
+    assert status == 200 and result['status'] == 'done'
+
+    # The design of team 2 with the submitted changes
+    param_value = context.parameters(1).copy()
+    for name, value in design.items():
+        param_value[name] = value
+    assert result['design'] == {
+        name: float(param_value[name])
+        for name in context.design_parameters(1).index}
+    assert result['kpis'] == service.solve_design(
+        config_path, param_value.to_dict())['kpis']
+
+    assert 'sequences' not in answers['short'][1]
+    assert answers['again'] == (200, dict(job, status='done'))
+    assert answers['unknown'][0] == 400
+    assert 'reactor' in answers['unknown'][1]['error']
+    assert answers['negative'][0] == 400
+    assert answers['job'][0] == 404
+    assert answers['method'][0] == 405
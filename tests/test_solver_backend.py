@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+The in-memory backends against each other and against the LP file of the
+'shell' backend, and the warm started re-solve of the 'persistent' backend
+after the capacities changed.
+
+"""
+
+import shutil
+
+import pytest
+
+import run_context
+
+pytest.importorskip('highspy')
+
+
+def _model(make_config, team_number=0, number_of_time_steps=48):
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+
+    context = run_context.get(make_config())
+    return solph.Model(create_energy_system(
+        context.parameters(team_number), context.data,
+        number_of_time_steps))
+
+
+def test_backends_find_the_same_optimum(make_config):
+    import oemof.solph as solph
+
+    import solver_backend
+
+    objectives = {}
+    for backend in ['direct', 'persistent']:
+        model = _model(make_config)
+        info = solver_backend.solve(model, 'highs', backend)
+        assert info['termination'] == 'optimal'
+        assert info['variables'] > 0 and info['constraints'] > 0
+        # The results are read back like after 'solph.Model.solve'
+        results = solph.processing.results(model)
+        assert len(results) == len(model.FLOWS) + len(
+            model.GenericStorageBlock.STORAGES)
+        objectives[backend] = model.objective()
+
+    solver = next((s for s in ['cbc', 'glpk'] if shutil.which(
+        'glpsol' if s == 'glpk' else s)), None)
+    if solver is not None:
+        model = _model(make_config)
+        solver_backend.solve(model, solver, 'shell')
+        objectives['shell'] = model.objective()
+
+    for objective in objectives.values():
+        assert objective == pytest.approx(objectives['direct'], rel=1e-6)
+
+
+def test_persistent_resolve_sees_the_changed_bounds(make_config):
+    import solver_backend
+
+    model = _model(make_config)
+    solver_backend.solve(model, 'highs', 'persistent')
+    first = model.objective()
+
+    # Less CHP power: the persistent solve starts from the last basis, the
+    # cold solve of the same model is the reference
+    for o, i in model.FLOWS:
+        if (str(o), str(i)) == ('chp', 'heat'):
+            for t in model.TIMESTEPS:
+                model.flow[o, i, t].setub(0.2)
+    solver_backend.solve(model, 'highs', 'persistent')
+    warm = model.objective()
+    solver_backend.solve(model, 'highs', 'direct')
+    assert warm == pytest.approx(model.objective(), rel=1e-6)
+    assert warm > first
+
+
+def test_unknown_backend_and_solver(make_config):
+    import solver_backend
+
+    model = _model(make_config)
+    with pytest.raises(ValueError):
+        solver_backend.solve(model, 'highs', 'memory')
+    with pytest.raises(ValueError):
+        solver_backend.solve(model, 'cbc', 'direct')
+    assert solver_backend.supports_in_memory('highs')
+    assert not solver_backend.supports_in_memory('cbc')
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Designs of the sweep specification, the Pareto front of the results table
+and the rows of the designs against the solve of each design on its own.
+
+"""
+
+import numpy as np
+import pytest
+
+import sweep
+
+
+def test_parse_values():
+    assert sweep.parse_values([0, 1, 2, 4]) == [0, 1, 2, 4]
+    assert sweep.parse_values('0..3') == [0, 1, 2, 3]
+    assert sweep.parse_values('0..8:2') == [0, 2, 4, 6, 8]
+    assert sweep.parse_values('0.5..1:0.25') == [0.5, 0.75, 1]
+    assert sweep.parse_values(3) == [3]
+
+
+def test_generate_designs():
+    spec = {'parameters': {'number_of_chps': '0..8:2',
+                           'capacity_thermal_storage': [0, 1, 2]}}
+    designs = list(sweep.generate_designs(spec))
+    assert len(designs) == 15
+    assert {'number_of_chps': 8, 'capacity_thermal_storage': 2} in designs
+
+    spec.update(method='random', number_of_samples=7, random_seed=1)
+    samples = list(sweep.generate_designs(spec))
+    assert len(samples) == 7
+    assert samples == list(sweep.generate_designs(spec))
+    assert all(sample in designs for sample in samples)
+
+    with pytest.raises(ValueError):
+        list(sweep.generate_designs({'parameters': {'var_costs_gas': [1]}}))
+
+
+def test_pareto_front_keeps_the_designs_not_dominated():
+    rng = np.random.default_rng(3)
+    costs = rng.integers(0, 20, 200)
+    emissions = rng.integers(0, 20, 200)
+    mask = sweep.pareto_front(costs, emissions)
+
+    points = set(zip(costs, emissions))
+    not_dominated = {(c, e) for c, e in points
+                     if not any(c2 <= c and e2 <= e and (c2, e2) != (c, e)
+                                for c2, e2 in points)}
+    kept = [(costs[i], emissions[i]) for i in np.flatnonzero(mask)]
+    # Of equal designs only one is kept
+    assert sorted(kept) == sorted(not_dominated)
+
+
+def test_rows_match_the_solve_of_each_design(make_config):
+    pytest.importorskip('highspy')
+    import oemof.solph as solph
+
+    import kpi
+    from model_energy_system import create_energy_system, flow_sums
+    import run_context
+    import solver_backend
+
+    config_path = make_config(solver='highs', solver_backend='persistent')
+    context = run_context.get(config_path)
+    designs = [{'number_of_chps': 2, 'capacity_thermal_storage': 0},
+               {'number_of_chps': 6, 'capacity_thermal_storage': 2},
+               {'number_of_chps': 0, 'number_of_heat_pumps': 0,
+                'number_of_boilers': 0, 'capacity_thermal_storage': 0,
+                'capacity_electr_storage': 0}]
+
+    for engine in ['lp', 'merit_order']:
+        sweep._worker.clear()
+        sweep._init_worker(config_path, 'parameters_Team_01.csv', engine)
+        rows = sweep.evaluate_designs(designs)
+
+        for design, row in zip(designs, rows):
+            param_value = context.parameters(0).copy()
+            for name, value in design.items():
+                param_value[name] = value
+            model = solph.Model(create_energy_system(param_value,
+                                                     context.data, 168))
+            solver_backend.solve(model, 'highs', 'direct')
+            kpis = kpi.compute_kpis(
+                design=kpi.design_matrix([param_value]),
+                sums=kpi.sums_vector(flow_sums(model))[np.newaxis],
+                param_value=param_value)
+
+            if engine == 'lp' or row['termination'] == 'optimal':
+                assert row['termination'] == 'optimal'
+                assert row['objective'] == pytest.approx(model.objective(),
+                                                         rel=1e-6)
+                assert row['total_costs'] == pytest.approx(
+                    kpis['total_costs'][0], rel=1e-6)
+            else:
+                # An upper bound of the optimum
+                assert row['objective'] >= model.objective() * (1 - 1e-9)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Typical periods of the time series and the preview solve on them against
+the solve of the full time series.
+
+"""
+
+import numpy as np
+import pytest
+
+import run_context
+import time_series_aggregation
+
+
+def test_typical_periods_keep_the_sums_of_the_time_series(make_config):
+    data = run_context.get(make_config()).data
+    aggregation = time_series_aggregation.aggregate(data, 336, 5, 24)
+    assert len(aggregation['data']) == 5 * 24
+    assert aggregation['weights'].sum() == 336
+
+    # Cluster means keep the sum of every time series
+    error = time_series_aggregation.representation_error(data, aggregation)
+    assert np.abs(error['annual sum [%]'].fillna(0)).max() < 1e-9
+
+    # A last, incomplete period is assigned to a typical period
+    aggregation = time_series_aggregation.aggregate(data, 340, 5, 24)
+    assert aggregation['weights'].sum() == 340
+    assert len(time_series_aggregation.full_year_rows(aggregation)) == 340
+
+    with pytest.raises(ValueError):
+        time_series_aggregation.aggregate(data, 48, 3, 24)
+
+
+def _solve(make_config, param_value, number_of_typical_periods):
+    """Return the objectives of the full and the aggregated solve and the
+    results of the aggregated one."""
+    import oemof.solph as solph
+
+    import model_energy_system
+    import solver_backend
+
+    config_path = make_config(
+        number_of_time_steps=336, solver='highs', solver_backend='direct',
+        time_series_aggregation=True,
+        number_of_typical_periods=number_of_typical_periods,
+        hours_per_typical_period=24)
+    context = run_context.get(config_path)
+    model = solph.Model(model_energy_system.create_energy_system(
+        param_value, context.data, 336))
+    solver_backend.solve(model, 'highs', 'direct')
+    _, results, meta = model_energy_system.solve_design(
+        context.cfg, param_value, context.data)
+    return model.objective(), meta['objective'], results
+
+
+@pytest.mark.parametrize('team_number', [0, 5])
+def test_one_typical_period_per_period_is_the_full_solve(make_config,
+                                                         team_number):
+    pytest.importorskip('highspy')
+    param_value = run_context.get(make_config()).parameters(
+        team_number).copy()
+
+    # The storages of the typical periods cannot shift energy from one day
+    # to the next, otherwise the model is the same
+    full, aggregated, _ = _solve(make_config, param_value, 14)
+    assert aggregated >= full * (1 - 1e-9)
+
+    param_value['capacity_electr_storage'] = 0
+    param_value['capacity_thermal_storage'] = 0
+    full, aggregated, _ = _solve(make_config, param_value, 14)
+    assert aggregated == pytest.approx(full, rel=1e-6)
+
+
+@pytest.mark.parametrize('team_number', [0, 2, 5])
+def test_preview_is_close_to_the_full_solve(make_config, team_number):
+    pytest.importorskip('highspy')
+    context = run_context.get(make_config())
+    full, aggregated, results = _solve(
+        make_config, context.parameters(team_number), 7)
+    assert aggregated == pytest.approx(full, rel=1e-2)
+
+    # The results are expanded to every time step
+    demand = results[[key for key in results
+                      if str(key[1]) == 'demand_th'][0]]['sequences']
+    assert len(demand) == 337
+    assert demand['flow'].iloc[:336].sum() == pytest.approx(
+        context.data['Demand_th [MWh]'].iloc[:336].sum())
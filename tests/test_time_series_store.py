@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Binary cache of the time series against parsing the CSV file.
+
+"""
+
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import time_series_store
+
+data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                         'data')
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    file_path = str(tmp_path / 'time_series.csv')
+    pd.DataFrame({'demand_el': [1.5, 2.0, 0.25],
+                  'demand_th': [3, 4, 5]}).to_csv(file_path, index=False)
+    return file_path
+
+
+def _assert_same_as_csv(data, file_path):
+    pd.testing.assert_frame_equal(data, pd.read_csv(file_path),
+                                  check_dtype=False)
+
+
+def test_cached_time_series_equals_the_csv(csv_file):
+    first = time_series_store.read_time_series(csv_file)
+    assert os.path.exists(time_series_store.cache_file_path(csv_file))
+    cached = time_series_store.read_time_series(csv_file)
+
+    _assert_same_as_csv(first, csv_file)
+    _assert_same_as_csv(cached, csv_file)
+    assert not cached.to_numpy().flags.writeable
+    assert time_series_store.source_hash(csv_file) == (
+        time_series_store.file_hash(csv_file))
+
+
+def test_changed_csv_is_read_again(csv_file):
+    time_series_store.read_time_series(csv_file)
+    stat = os.stat(csv_file)
+    # Same size, only the hash shows the change
+    pd.DataFrame({'demand_el': [2.5, 3.0, 0.75],
+                  'demand_th': [6, 7, 8]}).to_csv(csv_file, index=False)
+    assert os.path.getsize(csv_file) == stat.st_size
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    _assert_same_as_csv(time_series_store.read_time_series(csv_file),
+                        csv_file)
+    _assert_same_as_csv(time_series_store.read_time_series(csv_file),
+                        csv_file)
+
+
+def test_copy_with_a_new_modification_time_keeps_the_cache(csv_file):
+    time_series_store.read_time_series(csv_file)
+    cache_mtime = os.path.getmtime(time_series_store.cache_file_path(
+        csv_file))
+    stat = os.stat(csv_file)
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    _assert_same_as_csv(time_series_store.read_time_series(csv_file),
+                        csv_file)
+    assert os.path.getmtime(time_series_store.cache_file_path(
+        csv_file)) == cache_mtime
+
+
+def test_csv_with_text_columns_is_not_cached(tmp_path):
+    file_path = str(tmp_path / 'names.csv')
+    pd.DataFrame({'name': ['a', 'b'], 'value': [1, 2]}).to_csv(
+        file_path, index=False)
+    pd.testing.assert_frame_equal(
+        time_series_store.read_time_series(file_path),
+        pd.read_csv(file_path))
+    assert not os.path.exists(time_series_store.cache_file_path(file_path))
+
+
+def test_workshop_time_series_round_trip(tmp_path):
+    import yaml
+
+    with open(os.path.join(data_path, '..', 'experiment_config',
+                           'config.yml'), 'r', encoding='utf-8') as ymlfile:
+        cfg = yaml.safe_load(ymlfile)
+    file_path = str(tmp_path / cfg['time_series_file_name'])
+    shutil.copy(os.path.join(data_path, cfg['time_series_file_name']),
+                file_path)
+
+    time_series_store.read_time_series(file_path)
+    _assert_same_as_csv(time_series_store.read_time_series(file_path),
+                        file_path)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+Watch mode: a saved design file is solved again, only for its team, and
+the new results are the optimum of the new design.
+
+"""
+
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+import detailed_analysis
+import pipeline
+import results_store
+import run_context
+
+pytest.importorskip('highspy')
+
+
+class _Polls:
+    """Stand-in of the module time of 'watch', runs the steps of a test
+    between the polls and stops the watch mode after the last one."""
+
+    def __init__(self, steps, timeout=120):
+        self.steps = list(steps)
+        self.deadline = time.monotonic() + timeout
+
+    def sleep(self, interval):
+        time.sleep(0.05)
+        if time.monotonic() > self.deadline:
+            raise RuntimeError('The watch mode did not finish in time')
+        if self.steps[0]():
+            self.steps.pop(0)
+        if not self.steps:
+            raise KeyboardInterrupt
+
+
+def test_saved_design_is_solved_again(make_config, tmp_path, monkeypatch):
+    import oemof.solph as solph
+
+    from model_energy_system import create_energy_system
+    import solver_backend
+    import watch
+
+    # Inputs and results in tmp_path, the workers are forked with them
+    shutil.copytree(run_context.abs_path + '/data', tmp_path / 'data')
+    for module in (run_context, watch):
+        monkeypatch.setattr(module, 'abs_path', str(tmp_path))
+    monkeypatch.setattr(results_store, 'dump_path', str(tmp_path))
+    monkeypatch.setattr(pipeline, 'manifest_path',
+                        str(tmp_path / 'pipeline.json'))
+    monkeypatch.setattr(pipeline, 'tables_path', str(tmp_path) + '/')
+    monkeypatch.setattr(detailed_analysis, 'results_table_path',
+                        str(tmp_path / 'results.csv'))
+    monkeypatch.setattr(
+        detailed_analysis, 'analyse_energy_system',
+        lambda config_path, team_number: pd.DataFrame({'team': [team_number]}))
+
+    def plot_team_results(config_path, df_basic_results_and_team_decision,
+                          preview=False):
+        file_path = tmp_path / 'results.png'
+        file_path.write_bytes(b'png')
+        return str(file_path)
+
+    monkeypatch.setattr(detailed_analysis, 'plot_team_results',
+                        plot_team_results)
+    solved = []
+    monkeypatch.setattr(watch, 'display_results',
+                        lambda config_path, team_number: solved.append(
+                            team_number))
+
+    config_path = make_config(solver='highs', solver_backend='direct',
+                              number_of_teams=2, number_of_time_steps=48,
+                              parallel_workers=2, results_format='columnar')
+    design_file_path = tmp_path / 'data' / 'parameters_Team_02.csv'
+
+    def save_design():
+        param_df = pd.read_csv(design_file_path)
+        param_df.loc[param_df['var_name'] == 'number_of_boilers',
+                     'value'] = 2
+        param_df.to_csv(design_file_path, index=False)
+        return True
+
+    monkeypatch.setattr(watch, 'time', _Polls([
+        lambda: sorted(solved) == [0, 1],
+        save_design,
+        lambda: len(solved) == 3]))
+    watch.watch(config_path, interval=0)
+
+    assert sorted(solved[:2]) == [0, 1] and solved[2:] == [1]
+
+    context = run_context.get(config_path)
+    for n in range(2):
+        model = solph.Model(create_energy_system(context.parameters(n),
+                                                 context.data, 48))
+        solver_backend.solve(model, 'highs', 'direct')
+        stored = results_store.ColumnarResults(
+            results_store.results_file_path(n, 'columnar'))
+        assert stored.meta['objective'] == pytest.approx(model.objective(),
+                                                         rel=1e-6)
+    assert context.parameters(1)['number_of_boilers'] == 2